@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+
+# 한도 초과 시 처리 방식
+# - defer: 메시지는 저장하고 배정 작업은 토큰이 생길 시각으로 미뤄 대기열에 등록 (max_defer_seconds를 넘으면 skip)
+# - skip: 메시지만 저장하고 LLM 배정은 하지 않음 (/assign-department/batch로 나중에 배정)
+ADMISSION_MODES = ("defer", "skip")
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 burst개까지 쌓이는 토큰 버킷"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        토큰 1개 사용
+        바로 쓸 수 있으면 0, 부족하면 토큰이 생길 때까지의 대기 시간(초)을 반환하며 미리 예약합니다.
+        대기 시간이 max_wait를 넘으면 예약하지 않고 None을 반환합니다. (max_wait=0이면 바로 쓸 수 있을 때만 사용)
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self) -> None:
+        """reserve로 사용한 토큰 1개 반환"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    """
+    webhook 배정 유입 제어
+    - 회사/채널별 토큰 버킷: 한 채널이 초당 rate건(순간 burst건)을 넘게 보내면 mode에 따라 배정을 미루거나 생략합니다.
+    - 전역 동시 실행 한도: LLM 배정을 동시에 max_in_flight건까지만 실행합니다.
+      webhook 동기 처리는 자리가 없으면 대기열로 넘기고, 작업 스레드는 자리가 날 때까지 기다립니다.
+    rate가 0 이하이면 토큰 버킷을, max_in_flight가 0 이하이면 동시 실행 한도를 사용하지 않습니다.
+    """
+
+    ADMIT = "admit"
+    DEFER = "defer"
+    SKIP = "skip"
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: float = 30.0,
+        max_in_flight: int = 16,
+        mode: str = "defer",
+        max_defer_seconds: float = 300.0,
+        max_buckets: int = 10000,
+    ) -> None:
+        if mode not in ADMISSION_MODES:
+            raise ValueError(f"지원하지 않는 처리 방식입니다: {mode} (지원: {', '.join(ADMISSION_MODES)})")
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_in_flight = max_in_flight
+        self.mode = mode
+        self.max_defer_seconds = max_defer_seconds
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._slot_released = threading.Condition(self._lock)
+        self.in_flight = 0
+        self.in_flight_peak = 0
+        self.counts = {self.ADMIT: 0, self.DEFER: 0, self.SKIP: 0, "in_flight_full": 0, "refunded": 0}
+        self.throttled_by_key: Counter = Counter()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        # self._lock을 잡은 상태에서 호출, 오래 안 쓴 버킷부터 제거
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def admit(self, key: Optional[str]) -> dict:
+        """
+        채널의 요청 한도 확인
+
+        Returns:
+            {"decision": "admit" | "defer" | "skip", "delay": 배정을 미룰 시간(초)}
+        """
+        key = key or "default"
+        with self._lock:
+            if self.rate <= 0:
+                wait = 0.0
+            else:
+                max_wait = self.max_defer_seconds if self.mode == self.DEFER else 0.0
+                wait = self._bucket(key).reserve(max_wait)
+            if wait == 0.0:
+                decision = self.ADMIT
+            elif wait is None:
+                decision, wait = self.SKIP, 0.0
+            else:
+                decision = self.DEFER
+            self.counts[decision] += 1
+            if decision != self.ADMIT:
+                self.throttled_by_key[key] += 1
+        return {"decision": decision, "delay": wait}
+
+    def refund(self, key: Optional[str], admission: dict) -> None:
+        """
+        admit으로 사용한 토큰 반환 (메시지 저장에 실패해 배정하지 않는 경우)
+        skip은 토큰을 사용하지 않으므로 반환하지 않습니다.
+        """
+        if self.rate <= 0 or admission["decision"] == self.SKIP:
+            return
+        key = key or "default"
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.refund()
+            self.counts["refunded"] += 1
+
+    def try_acquire(self) -> bool:
+        """동시 실행 자리 확보 (없으면 바로 False)"""
+        with self._lock:
+            if 0 < self.max_in_flight <= self.in_flight:
+                self.counts["in_flight_full"] += 1
+                return False
+            self._acquired()
+            return True
+
+    def _acquired(self) -> None:
+        # self._lock을 잡은 상태에서 호출
+        self.in_flight += 1
+        self.in_flight_peak = max(self.in_flight_peak, self.in_flight)
+
+    def release(self) -> None:
+        with self._slot_released:
+            self.in_flight -= 1
+            self._slot_released.notify()
+
+    @contextmanager
+    def slot(self):
+        """동시 실행 자리가 날 때까지 기다린 뒤 실행"""
+        with self._slot_released:
+            while 0 < self.max_in_flight <= self.in_flight:
+                self._slot_released.wait()
+            self._acquired()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counts,
+                "in_flight": self.in_flight,
+                "in_flight_peak": self.in_flight_peak,
+                "max_in_flight": self.max_in_flight,
+                "rate": self.rate,
+                "burst": self.burst,
+                "mode": self.mode,
+                "buckets": len(self._buckets),
+                "top_throttled": dict(self.throttled_by_key.most_common(10)),
+            }
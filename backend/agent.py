@@ -1,24 +1,42 @@
 import os
 import json
-from typing import List, Optional, TypedDict
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, TypedDict
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
 from openai import OpenAI
 import numpy as np
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import ToolMessage, SystemMessage, HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
+from dept_index import DepartmentIndex, DEFAULT_INDEX_DIR
+from dept_shards import ShardedDepartmentIndex, GLOBAL_SHARD, shard_name
+from resources import registry
+from embedding_cache import QueryEmbeddingCache
+from decision_cache import SemanticDecisionCache, ScopedDecisionCache
+from intent_gate import IntentGate, DEFAULT_INTENT_GATE_PATH
+from routing_policy import ConfidencePolicy
+from dept_classifier import DepartmentClassifier, DEFAULT_CLASSIFIER_PATH
+from embedding_backend import embedding_identity, get_embedding_backend, load_model
+from embedding_scheduler import EmbeddingScheduler
+from embedding_server import RemoteEmbeddingModel
+
+if TYPE_CHECKING:
+    # 임베딩 서버 클라이언트 모드에서는 torch/sentence-transformers를 import하지 않음
+    from sentence_transformers import SentenceTransformer
 
 
 # 환경변수 로드
 load_dotenv()
 
 # 전역 변수
-_embedding_model = None
-_supabase_client = None
-_openai_client = None
+# 모델/클라이언트/부서 인덱스/에이전트 런타임은 resources.registry에서 락으로 한 번만 생성
+EMBEDDING_MODEL_NAME = "nlpai-lab/KURE-v1"
 
 
 # ============================================================================
@@ -30,52 +48,484 @@ class AgentState(TypedDict, total=False):
     messages: List  # 메시지 리스트
     msg_id: str  # 메시지 ID
     top_k: int  # 검색할 부서 수
+    tenant: Optional[str]  # 회사(tenant) ID (없으면 전역 부서 인덱스)
+
+
+class AssignmentError(RuntimeError):
+    """OpenAI/Supabase 오류 등 다시 시도하면 성공할 수 있는 배정 실패 (작업 대기열이 재시도)"""
 
 
 # ============================================================================
 # Helper 함수들
 # ============================================================================
 
-def get_supabase_client() -> Client:
+def get_supabase_credentials() -> tuple:
     """
-    Supabase 클라이언트 초기화 및 반환
+    Supabase URL과 키 반환
     서버 사이드에서는 service_role key를 사용하여 RLS를 우회합니다.
     """
-    global _supabase_client
-    if _supabase_client is None:
-        url = os.getenv("SUPABASE_URL")
-        # service_role key를 우선 사용, 없으면 SUPABASE_KEY 사용
-        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
-        if not url:
-            raise ValueError("SUPABASE_URL 환경변수가 필요합니다.")
-        if not key:
-            raise ValueError(
-                "SUPABASE_SERVICE_ROLE_KEY 또는 SUPABASE_KEY 환경변수가 필요합니다. "
-                "서버 사이드에서는 SUPABASE_SERVICE_ROLE_KEY를 사용해야 RLS 정책을 우회할 수 있습니다."
-            )
-        _supabase_client = create_client(url, key)
-    return _supabase_client
+    url = os.getenv("SUPABASE_URL")
+    # service_role key를 우선 사용, 없으면 SUPABASE_KEY 사용
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+    if not url:
+        raise ValueError("SUPABASE_URL 환경변수가 필요합니다.")
+    if not key:
+        raise ValueError(
+            "SUPABASE_SERVICE_ROLE_KEY 또는 SUPABASE_KEY 환경변수가 필요합니다. "
+            "서버 사이드에서는 SUPABASE_SERVICE_ROLE_KEY를 사용해야 RLS 정책을 우회할 수 있습니다."
+        )
+    return url, key
+
+
+def get_openai_api_key() -> str:
+    """OpenAI API 키 반환"""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY 환경변수가 필요합니다.")
+    return api_key
+
+
+def _create_supabase_client() -> Client:
+    """Supabase 클라이언트 생성"""
+    url, key = get_supabase_credentials()
+    return create_client(url, key)
+
+
+def _create_openai_client() -> OpenAI:
+    """OpenAI 클라이언트 생성"""
+    return OpenAI(api_key=get_openai_api_key())
+
+
+def _create_embedding_model() -> "SentenceTransformer":
+    """
+    KURE-v1 임베딩 모델 로드 (EMBEDDING_BACKEND: torch / onnx / onnx-int8)
+    EMBEDDING_SERVICE_URL이 있으면 모델을 로드하지 않고 임베딩 서버 클라이언트를 사용합니다.
+    """
+    service_url = os.getenv("EMBEDDING_SERVICE_URL")
+    if service_url:
+        print(f"임베딩 서버 사용: {service_url}")
+        return RemoteEmbeddingModel(
+            service_url, timeout=float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "30"))
+        )
+    backend = get_embedding_backend()
+    print(f"KURE-v1 임베딩 모델을 로딩 중입니다... (backend: {backend})")
+    model = load_model(EMBEDDING_MODEL_NAME, backend)
+    print("모델 로딩 완료!")
+    return model
+
+
+def _create_embedding_scheduler() -> EmbeddingScheduler:
+    """문의 인코딩 마이크로 배칭 스케줄러 생성 (환경변수로 대기 시간/배치 크기/대기열 길이 설정)"""
+    return EmbeddingScheduler(
+        encode_texts,
+        max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5")),
+        max_batch=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+        max_queue=int(os.getenv("EMBEDDING_BATCH_MAX_QUEUE", "1000")),
+    )
+
+
+def _create_query_embedding_cache() -> QueryEmbeddingCache:
+    """
+    문의 임베딩 캐시 생성 (환경변수로 크기/만료/디스크 보관 설정)
+    키에 모델/백엔드(EMBEDDING_BACKEND, EMBEDDING_SERVICE_URL)를 포함해 설정이 바뀌면 이전 임베딩을 쓰지 않습니다.
+    """
+    return QueryEmbeddingCache(
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000")),
+        ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "86400")),
+        disk_path=os.getenv("QUERY_CACHE_DISK_PATH") or None,
+        namespace=embedding_identity(EMBEDDING_MODEL_NAME),
+    )
+
+
+def _create_decision_cache() -> ScopedDecisionCache:
+    """회사별 배정 결과 재사용 캐시 생성 (환경변수로 유사도 기준/만료 설정)"""
+    return ScopedDecisionCache(
+        threshold=float(os.getenv("DECISION_CACHE_THRESHOLD", "0.95")),
+        ttl_seconds=float(os.getenv("DECISION_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("DECISION_CACHE_MAX_ENTRIES", "5000")),
+    )
+
+
+def _create_department_index() -> ShardedDepartmentIndex:
+    """회사별 부서 인덱스 샤드 관리자 생성 (환경변수로 메모리 예산/최대 샤드 수 설정)"""
+    return ShardedDepartmentIndex(
+        build_department_index,
+        model_name=EMBEDDING_MODEL_NAME,
+        root_dir=DEFAULT_INDEX_DIR,
+        memory_budget_bytes=int(float(os.getenv("DEPT_SHARD_MEMORY_MB", "512")) * 1024 * 1024),
+        max_shards=int(os.getenv("DEPT_SHARD_MAX", "64")),
+        version_check_seconds=float(os.getenv("DEPT_SHARD_VERSION_CHECK_SECONDS", "1")),
+    )
+
+
+def _create_intent_gate() -> IntentGate:
+    """
+    로컬 의도 분류기 생성
+    INTENT_GATE_PATH에 학습된 중심 벡터(intent_gate.py로 학습)가 있으면 사용하고, 없으면 기본 예시 문장으로 생성합니다.
+    """
+    margins = {
+        "chat_margin": float(os.getenv("INTENT_GATE_CHAT_MARGIN", "0.15")),
+        "assign_margin": float(os.getenv("INTENT_GATE_ASSIGN_MARGIN", "0.15")),
+    }
+    if os.path.exists(DEFAULT_INTENT_GATE_PATH):
+        print(f"의도 분류기 로드: {DEFAULT_INTENT_GATE_PATH}")
+        return IntentGate.load(DEFAULT_INTENT_GATE_PATH, **margins)
+    print("[WARN] 학습된 의도 분류기가 없어 기본 예시 문장으로 생성합니다. (intent_gate.py로 학습/평가 권장)")
+    return IntentGate.from_examples(encode_texts, **margins)
+
+
+def _create_routing_policy() -> ConfidencePolicy:
+    """유사도 기반 직접 배정 정책 생성 (ROUTING_POLICY: off / score / margin / prob)"""
+    return ConfidencePolicy(
+        mode=os.getenv("ROUTING_POLICY", "off").lower(),
+        min_score=float(os.getenv("ROUTING_MIN_SCORE", "0.65")),
+        min_margin=float(os.getenv("ROUTING_MIN_MARGIN", "0.1")),
+        min_prob=float(os.getenv("ROUTING_MIN_PROB", "0.8")),
+        temperature=float(os.getenv("ROUTING_TEMPERATURE", "0.05")),
+        shadow_rate=float(os.getenv("ROUTING_SHADOW_RATE", "0")),
+        log_path=os.getenv("ROUTING_DECISION_LOG") or None,
+    )
+
+
+def _create_dept_classifier() -> Optional[DepartmentClassifier]:
+    """
+    배정 이력으로 학습한 부서 분류기 로드 (dept_classifier.py로 학습)
+    DEPT_CLASSIFIER_PATH에 학습된 파일이 없거나, 학습 때와 임베딩 모델/백엔드가 다르면 None (항상 검색 + LLM 경로)
+    """
+    if not os.path.exists(DEFAULT_CLASSIFIER_PATH):
+        return None
+    print(f"부서 분류기 로드: {DEFAULT_CLASSIFIER_PATH}")
+    classifier = DepartmentClassifier.load(
+        DEFAULT_CLASSIFIER_PATH,
+        min_confidence=float(os.getenv("DEPT_CLASSIFIER_MIN_CONFIDENCE", "0.9")),
+    )
+    identity = embedding_identity(EMBEDDING_MODEL_NAME)
+    if classifier.model_name != identity:
+        # 다른 임베딩 공간에서 학습한 가중치는 확률이 틀리므로 사용하지 않음
+        print(
+            f"[WARN] 부서 분류기의 학습 임베딩({classifier.model_name or '알 수 없음'})이 "
+            f"현재 임베딩({identity})과 달라 사용하지 않습니다. (dept_classifier.py로 다시 학습 필요)"
+        )
+        return None
+    return classifier
+
+
+def get_supabase_client() -> Client:
+    """Supabase 클라이언트 반환 (프로세스당 1회 생성)"""
+    return registry.get("supabase")
 
 
 def get_openai_client() -> OpenAI:
-    """OpenAI 클라이언트 초기화 및 반환"""
-    global _openai_client
-    if _openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY 환경변수가 필요합니다.")
-        _openai_client = OpenAI(api_key=api_key)
-    return _openai_client
-
-
-def load_embedding_model() -> SentenceTransformer:
-    """KURE-v1 임베딩 모델 로드"""
-    global _embedding_model
-    if _embedding_model is None:
-        print("KURE-v1 임베딩 모델을 로딩 중입니다...")
-        _embedding_model = SentenceTransformer("nlpai-lab/KURE-v1")
-        print("모델 로딩 완료!")
-    return _embedding_model
+    """OpenAI 클라이언트 반환 (프로세스당 1회 생성)"""
+    return registry.get("openai")
+
+
+def load_embedding_model() -> "SentenceTransformer":
+    """KURE-v1 임베딩 모델 반환 (동시 요청이 와도 한 번만 로드)"""
+    return registry.get("embedding_model")
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """텍스트 목록을 정규화된 KURE 임베딩 행렬로 변환"""
+    model = load_embedding_model()
+    return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    """문의 인코딩 스케줄러 반환 (동시에 들어온 문의를 한 번의 배치로 인코딩)"""
+    return registry.get("embedding_scheduler")
+
+
+def embedding_batching_enabled() -> bool:
+    return os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """문의 임베딩 캐시 반환 (문의를 인코딩하는 모든 경로가 공유)"""
+    return registry.get("query_embedding_cache")
+
+
+def encode_queries(queries: List[str]) -> np.ndarray:
+    """
+    고객 문의 목록을 임베딩 (캐시에 없는 문의만 한 번에 인코딩)
+    캐시 미스는 스케줄러를 거쳐 다른 요청의 문의와 함께 배치로 인코딩됩니다.
+    """
+    encode_fn = get_embedding_scheduler().encode if embedding_batching_enabled() else encode_texts
+    return get_query_embedding_cache().get_or_encode(queries, encode_fn)
+
+
+def encode_query(query: str) -> np.ndarray:
+    """고객 문의 하나를 임베딩 (캐시 사용)"""
+    return encode_queries([query])[0]
+
+
+def get_decision_cache(tenant: Optional[str] = None) -> SemanticDecisionCache:
+    """회사별 배정 결과 재사용 캐시 반환 (다른 회사의 배정은 재사용하지 않음)"""
+    return registry.get("decision_cache").for_scope(resolve_tenant(tenant))
+
+
+def decision_cache_enabled() -> bool:
+    return os.getenv("DECISION_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def get_intent_gate() -> IntentGate:
+    """로컬 의도 분류기 반환"""
+    return registry.get("intent_gate")
+
+
+def intent_gate_enabled() -> bool:
+    # 기본 꺼짐 (intent_gate.py로 중심 벡터를 학습하고 margin을 보정한 뒤 켬)
+    return os.getenv("INTENT_GATE_ENABLED", "false").lower() not in ("0", "false", "no")
+
+
+def get_routing_policy() -> ConfidencePolicy:
+    """유사도 기반 직접 배정 정책 반환"""
+    return registry.get("routing_policy")
+
+
+def get_dept_classifier() -> Optional[DepartmentClassifier]:
+    """부서 분류기 반환 (학습된 파일이 없으면 None)"""
+    return registry.get("dept_classifier")
+
+
+def dept_classifier_enabled() -> bool:
+    return os.getenv("DEPT_CLASSIFIER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def classify_department(query_embedding: np.ndarray, candidates: List[dict]) -> Optional[list]:
+    """
+    부서 분류기로 확신도가 높은 문의의 부서를 바로 결정
+    예측 부서가 검색 후보(해당 회사의 부서) 안에 있고 확률이 기준 이상일 때만 [부서 ID]를 반환하고,
+    그 외에는 None (유사도 정책/LLM으로 진행)
+    """
+    if not dept_classifier_enabled():
+        return None
+    classifier = get_dept_classifier()
+    if classifier is None:
+        return None
+    dept_id, probability = classifier.predict(query_embedding)
+    if probability >= classifier.min_confidence and any(dept["dept_id"] == dept_id for dept in candidates):
+        classifier.record("local")
+        print(f"부서 분류기 배정: {dept_id} (확률: {probability:.4f})")
+        return [dept_id]
+    classifier.record("fallback")
+    return None
+
+
+def lookup_cached_decision(content: str, tenant: Optional[str] = None) -> Optional[dict]:
+    """배정 결과 재사용 캐시에서 유사 문의의 배정 결과 조회 (없으면 None)"""
+    if not decision_cache_enabled():
+        return None
+    query_embedding = encode_query(content)
+    catalog_version = get_department_index(tenant).version
+    cached = get_decision_cache(tenant).lookup(query_embedding, catalog_version)
+    if cached:
+        print(
+            f"유사 문의 배정 재사용: msg_id={cached['source_msg_id']}, "
+            f"유사도={cached['similarity']:.4f}, 부서 ID={cached['dept_ids']}"
+        )
+    return cached
+
+
+def get_tenant_column() -> Optional[str]:
+    """
+    department 테이블에서 회사(tenant)를 구분하는 컬럼 (DEPT_TENANT_COLUMN 환경변수)
+    설정하지 않으면 모든 부서를 하나의 전역 인덱스로 검색합니다.
+    """
+    return os.getenv("DEPT_TENANT_COLUMN") or None
+
+
+def resolve_tenant(tenant: Optional[str]) -> Optional[str]:
+    """요청의 tenant를 샤드 키로 변환 (샤딩을 쓰지 않거나 tenant가 없으면 전역 샤드)"""
+    if tenant is None or tenant == "" or get_tenant_column() is None:
+        return GLOBAL_SHARD
+    return str(tenant)
+
+
+def fetch_departments(tenant: Optional[str] = None) -> List[dict]:
+    """Supabase department 테이블 조회 (tenant가 있으면 해당 회사의 부서만)"""
+    supabase = get_supabase_client()
+    query = supabase.table("department").select("dept_id, dept_name, dept_desc")
+    tenant = resolve_tenant(tenant)
+    if tenant is not GLOBAL_SHARD:
+        query = query.eq(get_tenant_column(), tenant)
+    response = query.execute()
+    return response.data or []
+
+
+def build_department_index(tenant: Optional[str] = None) -> DepartmentIndex:
+    """DB의 부서 정보로 회사별 인덱스 생성 (저장/버전 관리는 ShardedDepartmentIndex가 담당)"""
+    departments = fetch_departments(tenant)
+    print(f"부서 인덱스 생성 중... ({shard_name(tenant)}, 부서 수: {len(departments)})")
+    index = DepartmentIndex.build(departments, encode_texts, model_name=EMBEDDING_MODEL_NAME)
+    print("부서 인덱스 생성 완료!")
+    return index
+
+
+def get_department_shards() -> ShardedDepartmentIndex:
+    """회사별 부서 인덱스 샤드 관리자 반환"""
+    return registry.get("department_index")
+
+
+def rebuild_department_index(tenant: Optional[str] = None) -> DepartmentIndex:
+    """DB의 부서 정보로 인덱스를 새로 만들고 디스크에 저장"""
+    return get_department_shards().rebuild(resolve_tenant(tenant))
+
+
+def get_department_index(tenant: Optional[str] = None) -> DepartmentIndex:
+    """
+    회사별 부서 임베딩 인덱스 반환
+    메모리에 없으면 디스크에서 로드하고, 디스크에도 없으면 DB로부터 생성합니다.
+    다른 워커가 인덱스를 갱신하면(디스크 version 증가) 다시 로드합니다.
+    """
+    return get_department_shards().get(resolve_tenant(tenant))
+
+
+def sync_department_index(departments: List[dict], tenant: Optional[str] = None) -> dict:
+    """
+    추가/변경된 부서만 인덱스에 반영하고 디스크에 저장
+    내용 해시가 같은 부서는 다시 임베딩하지 않습니다.
+    tenant를 주지 않으면 부서의 DEPT_TENANT_COLUMN 값으로 회사별 샤드에 나눠 반영합니다.
+
+    Args:
+        departments: dept_id, dept_name, dept_desc를 포함한 부서 목록
+        tenant: 회사(tenant) ID
+
+    Returns:
+        {"added": int, "updated": int, "version": int | None, "versions": {샤드 이름: version}}
+        version은 갱신된 샤드가 하나일 때만 채워집니다.
+    """
+    column = get_tenant_column()
+    groups = {}
+    for dept in departments:
+        key = resolve_tenant(tenant if tenant is not None or column is None else dept.get(column))
+        groups.setdefault(key, []).append(dept)
+
+    result = {"added": 0, "updated": 0, "version": None, "versions": {}}
+    for key, group in groups.items():
+        shard_result = get_department_shards().upsert(key, group, encode_texts)
+        result["added"] += shard_result["added"]
+        result["updated"] += shard_result["updated"]
+        result["versions"][shard_name(key)] = shard_result["version"]
+        print(
+            f"부서 인덱스 갱신 ({shard_name(key)}): 추가 {shard_result['added']}개, "
+            f"변경 {shard_result['updated']}개, version {shard_result['version']}"
+        )
+    if len(result["versions"]) == 1:
+        result["version"] = next(iter(result["versions"].values()))
+    return result
+
+
+# message INSERT와 동시에 배정 중인 메시지 ({msg_id: INSERT Future})
+_pending_messages: Dict[str, Future] = {}
+_pending_messages_lock = threading.Lock()
+
+
+@contextmanager
+def pending_message(msg_id, saved: Future):
+    """
+    message INSERT가 끝나기 전에 배정을 시작할 때 사용
+    with 블록 안에서는 해당 msg_id의 배정 결과를 저장하기 직전에 INSERT 완료를 기다리며,
+    saved의 결과(실제 저장된 msg_id, 중복으로 재시도하면 바뀔 수 있음)로 저장합니다.
+
+    사용 예:
+        saved = executor.submit(insert_message, msg_id, content)
+        with pending_message(msg_id, saved):
+            assign_message(str(msg_id), content)
+    """
+    key = str(msg_id)
+    with _pending_messages_lock:
+        _pending_messages[key] = saved
+    try:
+        yield
+    finally:
+        with _pending_messages_lock:
+            _pending_messages.pop(key, None)
+
+
+def resolve_saved_msg_id(msg_id: str) -> str:
+    """저장 중인 메시지면 INSERT 완료를 기다린 뒤 실제 msg_id 반환 (INSERT 실패 시 예외)"""
+    with _pending_messages_lock:
+        saved = _pending_messages.get(str(msg_id))
+    if saved is None:
+        return msg_id
+    return str(saved.result(timeout=float(os.getenv("MESSAGE_SAVE_TIMEOUT_SECONDS", "30"))))
+
+
+def save_assignments(msg_id: str, dept_ids: list) -> List[dict]:
+    """
+    assigned_message 테이블에 배정 결과 저장
+    부서가 여러 개여도 한 번의 upsert로 저장하며, 이미 배정된 부서는 무시합니다.
+    message INSERT와 동시에 배정 중이면 INSERT가 끝난 뒤 저장합니다.
+
+    Returns:
+        새로 생성된 행 목록 (이미 배정되어 있던 부서는 빠짐)
+    """
+    msg_id = resolve_saved_msg_id(msg_id)
+    created = save_assignments_bulk([{"msg_id": msg_id, "dept_id": dept_id} for dept_id in dept_ids])
+    skipped = len(set(dept_ids)) - len(created)
+    if skipped:
+        print(f"  ⚠️  {skipped}개 부서는 이미 배정되어 있습니다. (스킵)")
+    return created
+
+
+def search_departments(query: str, top_k: int, tenant: Optional[str] = None) -> tuple:
+    """
+    문의와 유사한 부서 top_k개 검색 (tenant가 있으면 해당 회사의 부서만 점수화)
+
+    Returns:
+        (후보 부서 목록, 부서 인덱스 version)
+    """
+    # 쿼리만 임베딩 (부서 임베딩은 인덱스에 미리 계산되어 있음)
+    query_embedding = encode_query(query)
+    index = get_department_index(tenant)
+    return index.search(query_embedding, top_k), index.version
+
+
+def format_candidates(candidates: List[dict]) -> str:
+    """LLM 프롬프트용 후보 부서 목록 문자열"""
+    return "\n".join([
+        f"- ID: {dept['dept_id']}, 이름: {dept['dept_name']}, 설명: {dept['dept_desc']}"
+        for dept in candidates
+    ])
+
+
+def get_agent_mode() -> str:
+    """
+    에이전트 동작 모드 (AGENT_MODE 환경변수)
+    - graph: LangGraph 챗봇이 도구 호출 여부를 결정한 뒤 도구에서 부서 선택 (LLM 2회)
+    - single_call: 검색 후 한 번의 구조화 출력 요청으로 채팅/부서를 함께 결정 (LLM 1회)
+    """
+    mode = os.getenv("AGENT_MODE", "graph").lower()
+    return mode if mode in ("graph", "single_call") else "graph"
+
+
+def save_assignments_bulk(rows: List[dict]) -> List[dict]:
+    """
+    assigned_message 여러 행을 한 번의 upsert로 저장 (이미 있는 행은 무시)
+    on_conflict + ignore_duplicates(ON CONFLICT DO NOTHING)이므로 응답에는 새로 생성된 행만 담깁니다.
+
+    Returns:
+        새로 생성된 행 목록
+    """
+    # 같은 요청 안의 중복 행 제거
+    rows = list({(str(row["msg_id"]), row["dept_id"]): row for row in rows}.values())
+    if not rows:
+        return []
+    supabase = get_supabase_client()
+    response = supabase.table("assigned_message").upsert(
+        rows, on_conflict="msg_id,dept_id", ignore_duplicates=True
+    ).execute()
+    return response.data or []
+
+
+def get_message_contents(msg_ids: List[str]) -> dict:
+    """message 테이블에서 여러 msg_id의 content를 한 번에 조회 ({msg_id(str): content})"""
+    if not msg_ids:
+        return {}
+    supabase = get_supabase_client()
+    response = supabase.table("message").select("msg_id, content").in_("msg_id", msg_ids).execute()
+    return {str(row["msg_id"]): row["content"] for row in response.data or []}
 
 
 def get_message_content(msg_id: str) -> Optional[str]:
@@ -88,12 +538,118 @@ def get_message_content(msg_id: str) -> Optional[str]:
     return None
 
 
+def build_selection_messages(query: str, candidates: List[dict]) -> list:
+    """후보 부서 중 최적 부서를 고르는 LLM 요청 메시지"""
+    candidates_text = format_candidates(candidates)
+    
+    prompt = f"""당신은 고객 문의를 적절한 부서에 배정하는 AI 어시스턴트입니다.
+
+고객 문의 내용:
+{query}
+
+후보 부서 목록:
+{candidates_text}
+
+위 고객 문의를 처리하기에 가장 적합한 부서를 1개 이상 선택해주세요.
+여러 부서가 관련되어 있다면 모두 선택할 수 있습니다.
+
+응답은 반드시 다음 JSON 형식으로만 작성해주세요:
+{{"dept_ids": ["선택된_부서_ID1", "선택된_부서_ID2", ...]}}
+
+JSON만 응답하고 다른 설명은 포함하지 마세요."""
+
+    return [
+        {"role": "system", "content": "당신은 고객 문의를 적절한 부서에 배정하는 전문가입니다."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_selected_dept_ids(raw: str) -> Optional[list]:
+    """부서 선택 LLM 응답(JSON)에서 dept_ids 추출 (없으면 None)"""
+    parsed = json.loads(raw)
+    if "dept_ids" not in parsed or not parsed["dept_ids"]:
+        return None
+    return parsed["dept_ids"]
+
+
+def preselect_departments(
+    query_embedding: np.ndarray, candidates: List[dict], msg_id: Optional[str] = None
+) -> tuple:
+    """
+    LLM 없이 배정할 부서 결정 (graph 도구, single_call, 배치, 비동기 배정 공통)
+    부서 분류기가 확실하면 분류기의 부서를, 유사도 정책(ROUTING_POLICY) 기준을 넘으면 1위 부서를 반환합니다.
+    분류기와 유사도 정책은 로컬 의도 분류기 사용 여부와 관계없이 적용합니다.
+    
+    Returns:
+        (부서 ID 목록 또는 None, 유사도 정책 결정 또는 None)
+        부서 ID가 None이면 LLM으로 결정하고 record_policy_comparison으로 결과를 기록
+    """
+    classified = classify_department(query_embedding, candidates)
+    if classified:
+        return classified, None
+    
+    policy = get_routing_policy()
+    decision = policy.decide(candidates)
+    if decision["path"] == ConfidencePolicy.DIRECT:
+        print(f"유사도 기준 직접 배정: {decision['dept_ids']} ({policy.mode})")
+        policy.record(decision, msg_id)
+        return decision["dept_ids"], None
+    return None, decision
+
+
+def record_policy_comparison(
+    policy_decision: Optional[dict], msg_id: Optional[str], dept_ids: Optional[list], llm_seconds: float
+) -> None:
+    """유사도 정책을 거쳐 LLM으로 결정한 문의의 결과를 정책 통계/결정 로그에 기록"""
+    if policy_decision is not None:
+        get_routing_policy().record(policy_decision, msg_id, dept_ids or [], llm_seconds)
+
+
+def select_departments(query: str, candidates: List[dict], msg_id: Optional[str] = None) -> Optional[list]:
+    """
+    후보 부서 중 배정할 부서 선택
+    preselect_departments로 결정되지 않으면 LLM이 고른 부서를 반환합니다.
+    """
+    selected_dept_ids, policy_decision = preselect_departments(encode_query(query), candidates, msg_id)
+    if selected_dept_ids:
+        return selected_dept_ids
+    
+    started = time.perf_counter()
+    client = get_openai_client()
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=build_selection_messages(query, candidates),
+        temperature=0.3,
+        response_format={"type": "json_object"}
+    )
+    selected_dept_ids = parse_selected_dept_ids(response.choices[0].message.content)
+    record_policy_comparison(policy_decision, msg_id, selected_dept_ids, time.perf_counter() - started)
+    return selected_dept_ids
+
+
+def build_tool_result(candidates: List[dict], selected_dept_ids: list, catalog_version) -> dict:
+    """배정 도구의 성공 결과 (선택된 부서 정보 포함)"""
+    selected_depts = [d for d in candidates if d["dept_id"] in selected_dept_ids]
+    return {
+        "success": True,
+        "dept_ids": selected_dept_ids,
+        "catalog_version": catalog_version,
+        "assigned_departments": selected_depts,
+        "message": f"{len(selected_dept_ids)}개 부서에 배정되었습니다."
+    }
+
+
+def tool_error_result(error: Exception) -> dict:
+    """배정 도구의 예외 결과 (interpret_agent_result가 AssignmentError로 바꿔 재시도)"""
+    return {"error": f"부서 배정 중 오류 발생: {str(error)}", "retryable": True}
+
+
 # ============================================================================
 # LangChain Tools 정의
 # ============================================================================
 
 @tool
-def assign_department_tool(query: str, msg_id: str, top_k: int) -> dict:
+def assign_department_tool(query: str, msg_id: str, top_k: int, tenant: Optional[str] = None) -> dict:
     """
     고객 문의를 분석하여 적절한 부서에 배정합니다.
     
@@ -101,6 +657,7 @@ def assign_department_tool(query: str, msg_id: str, top_k: int) -> dict:
         query: 고객 문의 내용
         msg_id: 메시지 ID
         top_k: 검색할 최대 부서 수
+        tenant: 회사 ID
         
     Returns:
         배정 결과 (성공 시 배정된 부서 정보, 실패 시 오류 메시지)
@@ -108,127 +665,33 @@ def assign_department_tool(query: str, msg_id: str, top_k: int) -> dict:
     try:
         print(f"부서 배정 도구 실행: query='{query[:50]}...', top_k={top_k}")
         
-        # 임베딩 모델 로드
-        model = load_embedding_model()
-        
-        # content를 임베딩으로 변환
-        query_embedding = model.encode(query)
-        
-        supabase = get_supabase_client()
-        
-        # 부서 정보 조회
-        all_departments = supabase.table("department").select(
-            "dept_id, dept_name, dept_desc"
-        ).execute()
-        
-        if not all_departments.data:
+        # 부서 인덱스에서 top_k 검색
+        similar_departments, catalog_version = search_departments(query, top_k, tenant)
+        if not similar_departments:
             return {"error": "부서 정보가 없습니다."}
         
-        # 각 부서의 이름과 설명을 조합하여 임베딩 생성
-        dept_texts = [
-            f"{dept['dept_name']} {dept['dept_desc']}"
-            for dept in all_departments.data
-        ]
-        
-        # 모든 부서 텍스트를 KURE 모델로 임베딩
-        dept_embeddings = model.encode(dept_texts)
-        
-        # Cosine similarity 계산 (벡터화)
-        similarities = np.dot(dept_embeddings, query_embedding) / (
-            np.linalg.norm(dept_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        )
-        
-        # 모든 부서의 유사도를 계산
-        results = []
-        for i, dept in enumerate(all_departments.data):
-            similarity = float(similarities[i])
-            results.append({
-                "dept_id": dept["dept_id"],
-                "dept_name": dept["dept_name"],
-                "dept_desc": dept["dept_desc"],
-                "similarity": similarity
-            })
-        
-        # 유사도 순으로 정렬하고 top_k개만 선택
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        similar_departments = results[:top_k]
-        
         print(f"검색된 유사 부서 수: {len(similar_departments)}")
         for dept in similar_departments:
             print(f"  - {dept['dept_name']} (ID: {dept['dept_id']}, 유사도: {dept['similarity']:.4f})")
         
-        # LLM으로 최적 부서 선택
-        client = get_openai_client()
-        
-        candidates_text = "\n".join([
-            f"- ID: {dept['dept_id']}, 이름: {dept['dept_name']}, 설명: {dept['dept_desc']}"
-            for dept in similar_departments
-        ])
-        
-        prompt = f"""당신은 고객 문의를 적절한 부서에 배정하는 AI 어시스턴트입니다.
-
-고객 문의 내용:
-{query}
-
-후보 부서 목록:
-{candidates_text}
-
-위 고객 문의를 처리하기에 가장 적합한 부서를 1개 이상 선택해주세요.
-여러 부서가 관련되어 있다면 모두 선택할 수 있습니다.
-
-응답은 반드시 다음 JSON 형식으로만 작성해주세요:
-{{"dept_ids": ["선택된_부서_ID1", "선택된_부서_ID2", ...]}}
-
-JSON만 응답하고 다른 설명은 포함하지 마세요."""
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "당신은 고객 문의를 적절한 부서에 배정하는 전문가입니다."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        result = response.choices[0].message.content
-        parsed = json.loads(result)
-        
-        if "dept_ids" not in parsed or not parsed["dept_ids"]:
+        # 1위 부서가 확실하면 바로 배정, 아니면 LLM으로 최적 부서 선택
+        selected_dept_ids = select_departments(query, similar_departments, msg_id)
+        if not selected_dept_ids:
             return {"error": "LLM이 유효한 부서를 선택하지 못했습니다."}
         
-        selected_dept_ids = parsed["dept_ids"]
         print(f"선택된 부서 ID: {selected_dept_ids}")
         
         # DB에 저장 (중복 시 무시)
-        for dept_id in selected_dept_ids:
-            try:
-                supabase.table("assigned_message").insert({
-                    "msg_id": msg_id,
-                    "dept_id": dept_id
-                }).execute()
-            except Exception as e:
-                # 중복 키 에러는 무시하고 계속 진행
-                if "duplicate key" in str(e).lower() or "23505" in str(e):
-                    print(f"  ⚠️  부서 {dept_id}는 이미 배정되어 있습니다. (스킵)")
-                else:
-                    # 다른 에러는 다시 발생
-                    raise
+        save_assignments(msg_id, selected_dept_ids)
         
         # 선택된 부서 정보 반환
-        selected_depts = [d for d in similar_departments if d["dept_id"] in selected_dept_ids]
-        
-        return {
-            "success": True,
-            "assigned_departments": selected_depts,
-            "message": f"{len(selected_dept_ids)}개 부서에 배정되었습니다."
-        }
+        return build_tool_result(similar_departments, selected_dept_ids, catalog_version)
         
     except Exception as e:
         print(f"부서 배정 도구 오류: {e}")
         import traceback
         traceback.print_exc()
-        return {"error": f"부서 배정 중 오류 발생: {str(e)}"}
+        return tool_error_result(e)
 
 
 # ============================================================================
@@ -246,6 +709,7 @@ class CustomToolNode:
         messages = state.get("messages", [])
         msg_id = state.get("msg_id")
         top_k = state.get("top_k", 5)
+        tenant = state.get("tenant")
         
         if not messages:
             return state
@@ -284,6 +748,7 @@ class CustomToolNode:
                 if tool_name == "assign_department_tool":
                     final_args["msg_id"] = msg_id
                     final_args["top_k"] = top_k
+                    final_args["tenant"] = tenant
                     
                 result = tool.invoke(final_args)
                 
@@ -314,22 +779,15 @@ class CustomToolNode:
 # 노드 함수들
 # ============================================================================
 
-def create_chatbot_node(tools):
-    """챗봇 노드 생성"""
-    
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.1,
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+def build_chatbot_system_prompt(tools) -> str:
+    """챗봇 노드 시스템 프롬프트"""
     
     # Tool 설명 생성
     tool_descriptions = []
     for tool in tools:
         tool_descriptions.append(f"- {tool.name}: {tool.description}")
     
-    # 시스템 프롬프트
-    system_prompt = f"""당신은 친절한 고객 서비스 어시스턴트입니다.
+    return f"""당신은 친절한 고객 서비스 어시스턴트입니다.
 
 사용 가능한 도구:
 {chr(10).join(tool_descriptions)}
@@ -346,24 +804,81 @@ def create_chatbot_node(tools):
 
 **중요**: 도구가 필요한 경우에만 사용하세요. 간단한 대화는 직접 응답하세요."""
 
+
+def get_last_user_message(messages: list) -> Optional[str]:
+    """메시지 목록에서 마지막 사용자 메시지 추출"""
+    for msg in reversed(messages):
+        if isinstance(msg, dict) and msg.get("role") == "user":
+            return msg.get("content", "")
+        elif hasattr(msg, "role") and msg.role == "user":
+            if hasattr(msg, "content"):
+                return msg.content
+        elif isinstance(msg, HumanMessage):
+            return msg.content
+    return None
+
+
+def local_intent_response(text: str) -> Optional[AIMessage]:
+    """
+    로컬 의도 분류기로 확실한 인사/업무 요청을 LLM 없이 처리
+    
+    Returns:
+        인사면 일반 응답, 업무 요청이면 assign_department_tool 호출을 담은 AIMessage,
+        애매하거나 분류기를 쓰지 않으면 None (LLM 판단)
+    """
+    if not intent_gate_enabled() or not text:
+        return None
+    try:
+        gate = get_intent_gate()
+        label, margin = gate.classify(encode_query(text))
+        print(f"로컬 의도 분류: {label} (margin: {margin:.4f})")
+        if label == IntentGate.CHAT:
+            gate.record("local_chat")
+            return AIMessage(content="안녕하세요! 무엇을 도와드릴까요?")
+        if label == IntentGate.ASSIGN:
+            gate.record("local_assign")
+            return AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": "assign_department_tool",
+                    "args": {"query": text},
+                    "id": f"call_local_{uuid.uuid4().hex}",
+                }],
+            )
+        gate.record("llm")
+    except Exception as e:
+        # 로컬 분류 실패 시 LLM 경로로 진행
+        print(f"로컬 의도 분류 오류: {e}")
+    return None
+
+
+def create_chatbot_node(tools):
+    """챗봇 노드 생성"""
+    
+    llm = ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0.1,
+        openai_api_key=os.getenv("OPENAI_API_KEY")
+    )
+    
+    # 시스템 프롬프트
+    system_prompt = build_chatbot_system_prompt(tools)
+
     llm_with_tools = llm.bind_tools(tools)
     
     def chatbot(state: AgentState):
         messages = state["messages"]
         
         # 마지막 사용자 메시지 추출
-        last_user_message = None
-        for msg in reversed(messages):
-            if isinstance(msg, dict) and msg.get("role") == "user":
-                last_user_message = msg.get("content", "")
-                break
-            elif hasattr(msg, "role") and msg.role == "user":
-                if hasattr(msg, "content"):
-                    last_user_message = msg.content
-                    break
+        last_user_message = get_last_user_message(messages)
         
         print(f"처리 중인 메시지: {last_user_message}")
         
+        # 확실한 인사/업무 요청은 로컬 분류기로 바로 처리 (LLM 호출 생략)
+        local_response = local_intent_response(last_user_message)
+        if local_response is not None:
+            return {"messages": [local_response]}
+        
         # 시스템 메시지 추가
         system_msg = SystemMessage(content=system_prompt)
         messages_with_system = [system_msg] + messages
@@ -377,7 +892,7 @@ def create_chatbot_node(tools):
                 print(f"Tool calls: {response.tool_calls}")
         except Exception as e:
             print(f"LLM 호출 오류: {e}")
-            response = AIMessage(content="처리 중 오류가 발생했습니다. 다시 시도해 주세요.")
+            raise AssignmentError(f"LLM 호출 오류: {e}") from e
         
         return {"messages": [response]}
     
@@ -442,20 +957,398 @@ def build_agent_graph(tools):
     return workflow.compile()
 
 
+# ============================================================================
+# Agent Runtime
+# ============================================================================
+
+class AgentRuntime:
+    """
+    프로세스 전역에서 공유하는 에이전트 실행 환경
+    ChatOpenAI, 도구 바인딩, 시스템 프롬프트, 컴파일된 StateGraph를 한 번만 만들고
+    이후 요청에서는 그대로 재사용합니다. 컴파일된 그래프는 요청별 상태를 갖지 않으므로
+    Flask 스레드 간에 공유해도 안전합니다.
+    """
+    
+    def __init__(self, tools: Optional[list] = None) -> None:
+        self.tools = tools or [assign_department_tool]
+        self.graph = build_agent_graph(self.tools)
+        
+    def invoke(self, state: AgentState) -> dict:
+        return self.graph.invoke(state)
+
+
+def get_agent_runtime() -> AgentRuntime:
+    """AgentRuntime 싱글톤 반환 (최초 호출 시 생성)"""
+    return registry.get("agent_runtime")
+
+
+def _create_agent_runtime() -> AgentRuntime:
+    print("에이전트 그래프 컴파일 중...")
+    runtime = AgentRuntime()
+    print("에이전트 그래프 컴파일 완료!")
+    return runtime
+
+
+registry.register("supabase", _create_supabase_client)
+registry.register("openai", _create_openai_client, closer=lambda client: client.close())
+registry.register(
+    "embedding_model",
+    _create_embedding_model,
+    closer=lambda model: model.close() if isinstance(model, RemoteEmbeddingModel) else None,
+)
+# 모델보다 나중에 등록하여 종료 시 모델보다 먼저 정리
+registry.register("embedding_scheduler", _create_embedding_scheduler, closer=lambda scheduler: scheduler.close())
+registry.register(
+    "query_embedding_cache", _create_query_embedding_cache, closer=lambda cache: cache.close()
+)
+registry.register("decision_cache", _create_decision_cache)
+registry.register("department_index", _create_department_index)
+registry.register("intent_gate", _create_intent_gate)
+registry.register("routing_policy", _create_routing_policy, closer=lambda policy: policy.close())
+registry.register("dept_classifier", _create_dept_classifier)
+registry.register("agent_runtime", _create_agent_runtime)
+
+
+def warmup() -> None:
+    """
+    서버 부팅 시 무거운 초기화를 미리 수행
+    KURE-v1 로드 + 더미 인코딩, 부서 인덱스 로드, 에이전트 그래프 컴파일
+    """
+    print("에이전트 워밍업 시작...")
+    registry.init(["supabase", "openai", "embedding_model"])
+    if intent_gate_enabled():
+        get_intent_gate()
+    if dept_classifier_enabled():
+        get_dept_classifier()
+    model = load_embedding_model()
+    # 첫 forward pass의 지연(스레드 풀/메모리 할당)도 미리 처리
+    model.encode(["워밍업 문장입니다."], normalize_embeddings=True)
+    if embedding_batching_enabled():
+        get_embedding_scheduler()
+    # 회사별 샤딩 시 샤드는 첫 요청에서 지연 로드
+    if get_tenant_column() is None:
+        get_department_index()
+    if get_agent_mode() == "graph":
+        get_agent_runtime()
+    print(f"에이전트 워밍업 완료! (mode: {get_agent_mode()})")
+
+
+def get_agent_metrics() -> dict:
+    """에이전트 내부 캐시 등의 운영 지표"""
+    metrics = {}
+    if registry.is_initialized("embedding_scheduler"):
+        metrics["embedding_scheduler"] = get_embedding_scheduler().stats()
+    if registry.is_initialized("query_embedding_cache"):
+        metrics["query_embedding_cache"] = get_query_embedding_cache().stats()
+    if registry.is_initialized("decision_cache"):
+        metrics["decision_cache"] = registry.get("decision_cache").stats()
+    if registry.is_initialized("department_index"):
+        metrics["department_index"] = get_department_shards().stats()
+    if registry.is_initialized("intent_gate"):
+        metrics["intent_gate"] = get_intent_gate().stats()
+    if registry.is_initialized("routing_policy"):
+        metrics["routing_policy"] = get_routing_policy().stats()
+    if registry.is_initialized("dept_classifier") and get_dept_classifier() is not None:
+        metrics["dept_classifier"] = get_dept_classifier().stats()
+    return metrics
+
+
+def shutdown() -> None:
+    """프로세스 종료 시 리소스 해제"""
+    registry.close()
+
+
+# ============================================================================
+# Single-call 라우팅 (AGENT_MODE=single_call)
+# ============================================================================
+
+def build_single_call_request(query: str, candidates: List[dict]) -> tuple:
+    """
+    single-call 라우팅 요청 구성
+    dept_ids는 스키마 enum으로 후보 부서 ID만 허용합니다.
+    
+    Returns:
+        (chat.completions.create 인자, 문자열 ID -> 원래 dept_id 매핑)
+    """
+    # LLM 응답은 문자열이므로 원래 dept_id 타입으로 되돌리기 위한 매핑
+    id_map = {str(dept["dept_id"]): dept["dept_id"] for dept in candidates}
+    
+    prompt = f"""고객 문의를 읽고 처리 방식을 결정해주세요.
+
+고객 문의 내용:
+{query}
+
+후보 부서 목록:
+{format_candidates(candidates)}
+
+- 인사, 감사, 일반 질문처럼 부서 처리가 필요 없는 경우: action="chat", dept_ids=[]
+- 회사의 특정 부서에서 처리해야 할 실질적인 업무/문제가 있는 경우:
+  action="assign", dept_ids에 가장 적합한 부서를 1개 이상 선택 (여러 부서가 관련되면 모두 선택)"""
+
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "당신은 고객 문의를 분류하고 적절한 부서에 배정하는 전문가입니다."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.1,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "routing_decision",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {"type": "string", "enum": ["chat", "assign"]},
+                        "dept_ids": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": list(id_map)},
+                        },
+                    },
+                    "required": ["action", "dept_ids"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+    }
+    return request, id_map
+
+
+def parse_single_call_decision(raw: str, id_map: dict) -> dict:
+    """single-call 응답을 {"action": "chat"} 또는 {"action": "assign", "dept_ids": [...]}로 변환"""
+    parsed = json.loads(raw)
+    dept_ids = []
+    for dept_id in parsed.get("dept_ids", []):
+        if str(dept_id) in id_map and id_map[str(dept_id)] not in dept_ids:
+            dept_ids.append(id_map[str(dept_id)])
+    
+    if parsed.get("action") == "assign" and dept_ids:
+        return {"action": "assign", "dept_ids": dept_ids}
+    return {"action": "chat"}
+
+
+def route_single_call(query: str, candidates: List[dict]) -> dict:
+    """
+    한 번의 구조화 출력 요청으로 일반 채팅 여부와 배정 부서를 함께 결정
+
+    Returns:
+        {"action": "chat"} 또는 {"action": "assign", "dept_ids": [...]}
+    """
+    client = get_openai_client()
+    request, id_map = build_single_call_request(query, candidates)
+    response = client.chat.completions.create(**request)
+    return parse_single_call_decision(response.choices[0].message.content, id_map)
+
+
+def plan_single_call(msg_id: str, content: str, top_k: int, tenant: Optional[str] = None) -> dict:
+    """
+    single_call 배정에서 LLM 호출 전까지의 단계 (동기/비동기 배정 공통)
+    
+    Returns:
+        {"decision": 결정 또는 None, "candidates": [...], "catalog_version": int, "policy_decision": dict 또는 None}
+        decision이 None이면 route_single_call(LLM)로 결정하고 record_policy_comparison으로 결과를 기록
+    """
+    plan = {"decision": None, "candidates": [], "catalog_version": None, "policy_decision": None}
+    
+    # 확실한 인사는 검색/LLM 모두 생략
+    local_response = local_intent_response(content)
+    if local_response is not None and not local_response.tool_calls:
+        plan["decision"] = {"action": "chat"}
+        return plan
+    
+    plan["candidates"], plan["catalog_version"] = search_departments(content, top_k, tenant)
+    if not plan["candidates"]:
+        print("✗ 부서 배정 실패: 부서 정보가 없습니다.")
+        plan["decision"] = {"action": "chat"}
+        return plan
+    
+    for dept in plan["candidates"]:
+        print(f"  - {dept['dept_name']} (ID: {dept['dept_id']}, 유사도: {dept['similarity']:.4f})")
+    
+    # 분류기/1위 부서가 확실하면 LLM 없이 배정
+    dept_ids, plan["policy_decision"] = preselect_departments(encode_query(content), plan["candidates"], msg_id)
+    if dept_ids:
+        plan["decision"] = {"action": "assign", "dept_ids": dept_ids}
+    return plan
+
+
+def remember_decision(
+    content: str, tenant: Optional[str], dept_ids: list, catalog_version, msg_id: str
+) -> None:
+    """LLM/로컬 판단으로 배정한 결과를 유사 문의 재사용 캐시에 추가"""
+    if decision_cache_enabled():
+        get_decision_cache(tenant).add(encode_query(content), dept_ids, catalog_version, source_msg_id=msg_id)
+
+
+def _assign_single_call(msg_id: str, content: str, top_k: int, tenant: Optional[str] = None) -> int:
+    """검색 + 단일 LLM 호출로 배정 (assign_department와 같은 0/1 반환)"""
+    plan = plan_single_call(msg_id, content, top_k, tenant)
+    decision = plan["decision"]
+    if decision is None:
+        started = time.perf_counter()
+        decision = route_single_call(content, plan["candidates"])
+        record_policy_comparison(
+            plan["policy_decision"], msg_id, decision.get("dept_ids"), time.perf_counter() - started
+        )
+    if decision["action"] != "assign":
+        print("일반 채팅으로 처리되었습니다.")
+        return 0
+    
+    print(f"선택된 부서 ID: {decision['dept_ids']}")
+    save_assignments(msg_id, decision["dept_ids"])
+    remember_decision(content, tenant, decision["dept_ids"], plan["catalog_version"], msg_id)
+    print(f"✓ 부서 배정 완료!")
+    return 1
+
+
+# ============================================================================
+# 배치 배정
+# ============================================================================
+
+def assign_departments(msg_ids: List[str], top_k: int = 5, tenant: Optional[str] = None) -> List[dict]:
+    """
+    여러 메시지를 한 번에 부서 배정
+    message 조회 1회, 배치 임베딩 1회, 부서 행렬과의 행렬 곱 1회, assigned_message upsert 1회로 처리하며,
+    메시지별 채팅/부서 결정은 single-call 라우팅을 병렬로 호출합니다 (BATCH_LLM_CONCURRENCY).
+    
+    Args:
+        msg_ids: 메시지 ID 목록
+        top_k: 검색할 최대 부서 수 (기본값: 5)
+        tenant: 회사 ID (같은 회사의 메시지만 한 배치로 요청)
+        
+    Returns:
+        입력 순서대로 [{"msg_id": str, "status": 0|1, "dept_ids": list, "created_dept_ids": list, "error"?: str}, ...]
+        created_dept_ids는 이번 요청으로 새로 저장된 부서 (재요청 등으로 이미 배정되어 있던 부서는 빠짐)
+    """
+    msg_ids = [str(msg_id) for msg_id in msg_ids]
+    results = [{"msg_id": msg_id, "status": 0, "dept_ids": [], "created_dept_ids": []} for msg_id in msg_ids]
+    if not msg_ids:
+        return results
+    
+    # 1. 메시지 내용 한 번에 조회 (중복 ID는 한 번만 처리)
+    unique_ids = list(dict.fromkeys(msg_ids))
+    contents = get_message_contents(unique_ids)
+    targets = [msg_id for msg_id in unique_ids if contents.get(msg_id)]
+    decisions = {}
+    for msg_id in unique_ids:
+        if msg_id not in contents or not contents[msg_id]:
+            decisions[msg_id] = {"status": 0, "dept_ids": [], "error": "메시지를 찾을 수 없습니다."}
+    
+    print(f"배치 배정 시작: 요청 {len(msg_ids)}건, 대상 {len(targets)}건")
+    
+    if targets:
+        # 2. 배치 임베딩 + 행렬 곱 한 번으로 후보 검색
+        embeddings = encode_queries([contents[msg_id] for msg_id in targets])
+        index = get_department_index(tenant)
+        catalog_version = index.version
+        candidates_list = index.search_many(embeddings, top_k)
+        
+        # 3. 캐시/로컬 분류/유사도 정책으로 LLM이 필요 없는 메시지 먼저 처리
+        pending = []
+        for msg_id, embedding, candidates in zip(targets, embeddings, candidates_list):
+            if not candidates:
+                decisions[msg_id] = {"status": 0, "dept_ids": [], "error": "부서 정보가 없습니다."}
+                continue
+            if decision_cache_enabled():
+                cached = get_decision_cache(tenant).lookup(embedding, catalog_version)
+                if cached:
+                    decisions[msg_id] = {"status": 1, "dept_ids": cached["dept_ids"]}
+                    continue
+            if intent_gate_enabled():
+                # 의도 분류기 집계는 분류기 자신의 판단만 기록 (local_intent_response와 동일한 기준)
+                # 부서 분류기/유사도 정책의 직접 배정은 각자의 통계에 집계됨
+                gate = get_intent_gate()
+                label = gate.classify(embedding)[0]
+                if label == IntentGate.CHAT:
+                    gate.record("local_chat")
+                    decisions[msg_id] = {"status": 0, "dept_ids": []}
+                    continue
+                gate.record("local_assign" if label == IntentGate.ASSIGN else "llm")
+            # 인사로 처리되지 않은 모든 문의에 분류기/유사도 정책 적용
+            dept_ids, policy_decision = preselect_departments(embedding, candidates, msg_id)
+            if dept_ids:
+                decisions[msg_id] = {"status": 1, "dept_ids": dept_ids}
+                continue
+            pending.append((msg_id, embedding, candidates, policy_decision))
+        
+        # 4. 나머지는 single-call 라우팅을 병렬 호출
+        def route(item):
+            msg_id, _, candidates, policy_decision = item
+            try:
+                started = time.perf_counter()
+                decision = route_single_call(contents[msg_id], candidates)
+                record_policy_comparison(
+                    policy_decision, msg_id, decision.get("dept_ids"), time.perf_counter() - started
+                )
+                return decision, None
+            except Exception as e:
+                print(f"배치 배정 LLM 오류 (msg_id: {msg_id}): {e}")
+                return None, str(e)
+        
+        if pending:
+            max_workers = max(1, min(int(os.getenv("BATCH_LLM_CONCURRENCY", "8")), len(pending)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                routed = list(executor.map(route, pending))
+            for (msg_id, embedding, _, _), (decision, error) in zip(pending, routed):
+                if error is not None:
+                    decisions[msg_id] = {"status": 0, "dept_ids": [], "error": error}
+                elif decision["action"] == "assign":
+                    decisions[msg_id] = {"status": 1, "dept_ids": decision["dept_ids"]}
+                    if decision_cache_enabled():
+                        get_decision_cache(tenant).add(
+                            embedding, decision["dept_ids"], catalog_version, source_msg_id=msg_id
+                        )
+                else:
+                    decisions[msg_id] = {"status": 0, "dept_ids": []}
+        
+        # 5. 배정 결과를 한 번의 upsert로 저장
+        rows = [
+            {"msg_id": msg_id, "dept_id": dept_id}
+            for msg_id, decision in decisions.items()
+            if decision["status"] == 1
+            for dept_id in decision["dept_ids"]
+        ]
+        try:
+            created = save_assignments_bulk(rows)
+            for row in created:
+                decision = decisions.get(str(row["msg_id"]))
+                if decision is not None:
+                    decision.setdefault("created_dept_ids", []).append(row["dept_id"])
+            print(f"배정 저장: {len(created)}/{len(rows)}행 신규")
+        except Exception as e:
+            print(f"배치 배정 저장 오류: {e}")
+            for decision in decisions.values():
+                if decision["status"] == 1:
+                    decision["status"] = 0
+                    decision["error"] = f"배정 저장 실패: {str(e)}"
+    
+    # 입력 순서대로 결과 구성
+    for result in results:
+        result.update(decisions[result["msg_id"]])
+    
+    assigned = sum(1 for result in results if result["status"] == 1)
+    print(f"배치 배정 완료: {assigned}/{len(results)}건 배정")
+    return results
+
+
 # ============================================================================
 # 메인 함수
 # ============================================================================
 
 def assign_department(
     msg_id: str, 
-    top_k: int = 5
+    top_k: int = 5,
+    tenant: Optional[str] = None
 ) -> int:
     """
-    메시지를 분석하여 적절한 부서에 배정 (LangGraph 기반)
+    DB에 저장된 메시지를 조회하여 부서 배정 (재처리/백필용)
+    내용을 이미 가지고 있으면 assign_message를 사용하세요.
     
     Args:
         msg_id: 메시지 ID
         top_k: 검색할 최대 부서 수 (기본값: 5)
+        tenant: 회사 ID (DEPT_TENANT_COLUMN 설정 시 해당 회사의 부서만 검색)
         
     Returns:
         0: 일반 채팅
@@ -467,43 +1360,103 @@ def assign_department(
         print(f"메시지 ID {msg_id}를 찾을 수 없습니다.")
         return 0
     
+    return assign_message(msg_id, content, top_k=top_k, tenant=tenant)
+
+
+def assign_message(
+    msg_id: str,
+    content: str,
+    top_k: int = 5,
+    tenant: Optional[str] = None
+) -> int:
+    """
+    문의 내용을 받아 적절한 부서에 배정 (LangGraph 기반, AGENT_MODE=single_call이면 단일 LLM 호출)
+    webhook처럼 내용을 이미 가지고 있는 호출자는 message 테이블을 다시 조회하지 않습니다.
+    message INSERT와 동시에 실행하려면 pending_message 블록 안에서 호출하세요.
+    
+    Args:
+        msg_id: 메시지 ID (배정 결과 저장용)
+        content: 문의 내용
+        top_k: 검색할 최대 부서 수 (기본값: 5)
+        tenant: 회사 ID (DEPT_TENANT_COLUMN 설정 시 해당 회사의 부서만 검색)
+        
+    Returns:
+        0: 일반 채팅
+        1: 부서 배정 성공
+
+    Raises:
+        AssignmentError: OpenAI/Supabase 오류로 배정하지 못한 경우 (재시도 가능)
+    """
     print(f"문의 내용: {content}")
     
-    # 2. Tools 정의
-    tools = [assign_department_tool]
+    # 2. 과거에 배정된 유사 문의가 있으면 LLM 호출 없이 같은 부서에 배정
+    cached = lookup_cached_decision(content, tenant)
+    if cached:
+        save_assignments(msg_id, cached["dept_ids"])
+        print(f"✓ 부서 배정 완료!")
+        return 1
+    
+    # 단일 호출 모드: 검색 후 LLM 1회로 채팅/부서를 함께 결정
+    if get_agent_mode() == "single_call":
+        return _assign_single_call(msg_id, content, top_k, tenant)
     
-    # 3. 그래프 생성
-    agent = build_agent_graph(tools)
+    # 3. 공유 에이전트 (프로세스당 1회 컴파일)
+    agent = get_agent_runtime()
     
     # 4. 초기 상태
     initial_state = {
         "messages": [HumanMessage(content=content)],
         "msg_id": msg_id,
-        "top_k": top_k
+        "top_k": top_k,
+        "tenant": tenant
     }
     
     # 5. 에이전트 실행
     result = agent.invoke(initial_state)
     
     # 6. 결과 분석
-    messages = result.get("messages", [])
+    return interpret_agent_result(result.get("messages", []), msg_id, content, tenant)
+
+
+def interpret_agent_result(messages: list, msg_id: str, content: str, tenant: Optional[str] = None) -> int:
+    """
+    에이전트 실행 결과 메시지에서 배정 여부 판단
+    배정에 성공하면 배정 결과 재사용 캐시에도 등록합니다.
     
+    Returns:
+        0: 일반 채팅 또는 배정 실패
+        1: 부서 배정 성공
+
+    Raises:
+        AssignmentError: 도구 실행 중 일시적 오류가 발생한 경우
+    """
     # ToolMessage가 있는지 확인
     for msg in messages:
         if hasattr(msg, "__class__") and msg.__class__.__name__ == "ToolMessage":
             try:
-                content = json.loads(msg.content) if isinstance(msg.content, str) else msg.content
-                if content.get("success"):
+                tool_result = json.loads(msg.content) if isinstance(msg.content, str) else msg.content
+                if tool_result.get("retryable"):
+                    raise AssignmentError(tool_result["error"])
+                if tool_result.get("success"):
+                    if decision_cache_enabled():
+                        get_decision_cache(tenant).add(
+                            encode_query(content),
+                            tool_result.get("dept_ids", []),
+                            tool_result.get("catalog_version"),
+                            source_msg_id=msg_id,
+                        )
                     print(f"✓ 부서 배정 완료!")
                     return 1
-                elif content.get("error"):
-                    error_msg = content['error']
+                elif tool_result.get("error"):
+                    error_msg = tool_result['error']
                     print(f"✗ 부서 배정 실패: {error_msg}")
                     return 0
+            except AssignmentError:
+                raise
             except Exception as e:
                 print(f"⚠️  결과 파싱 오류: {e}")
                 pass
     
     # 일반 채팅으로 처리됨
     print("일반 채팅으로 처리되었습니다.")
-    return 0
\ No newline at end of file
+    return 0
@@ -4,10 +4,27 @@ from supabase import create_client, Client
 import os
 import csv
 import io
-import time
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from agent import assign_department
+from agent import (
+    assign_message,
+    assign_departments,
+    pending_message,
+    sync_department_index,
+    get_tenant_column,
+    warmup,
+    shutdown,
+    get_agent_metrics,
+)
+from resources import registry
+from jobs import JobManager
+from id_generator import next_message_id, get_id_generator
+from dedup import WebhookDeduplicator, webhook_dedup_key, DEFAULT_DEDUP_PATH
+from admission import AdmissionController
+from job_queue import DurableJobQueue, DEFAULT_QUEUE_PATH
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
@@ -51,8 +68,274 @@ def get_supabase_client() -> Client:
     return create_client(supabase_url, supabase_key)
 
 
-# Supabase 클라이언트 초기화
-supabase: Client = get_supabase_client()
+# 서버 리소스 (create_app에서 초기화)
+# import만으로는 모델 로드/작업 스레드 시작/대기열 복구가 일어나지 않습니다.
+supabase: Client = None
+_message_writer: ThreadPoolExecutor = None
+admission_control: AdmissionController = None
+job_manager: JobManager = None
+webhook_dedup: WebhookDeduplicator = None
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def extract_tenant(data: dict):
+    """
+    webhook 요청에서 회사(tenant) ID 추출
+    tenant 필드를 우선 사용하고, 없으면 채널톡 entity.channelId를 사용합니다.
+    (DEPT_TENANT_COLUMN 컬럼 값과 같아야 해당 회사의 부서만 검색됩니다)
+    """
+    if data.get('tenant'):
+        return str(data['tenant'])
+    entity = data.get('entity') or {}
+    if entity.get('channelId'):
+        return str(entity['channelId'])
+    return None
+
+
+class MessageSaveError(Exception):
+    """message 테이블 저장 실패 (webhook은 500으로 응답)"""
+
+
+def run_assignment_job(payload: dict) -> int:
+    """
+    배정 작업 실행 (작업 대기열 handler)
+    OpenAI/Supabase 오류는 예외로 던져 작업 대기열이 백오프 후 재시도하게 합니다.
+    동시 실행 한도(admission_control.slot)는 작업 관리자가 작업을 꺼내기 전에 잡습니다.
+    """
+    return assign_message(str(payload["msg_id"]), payload["content"], top_k=5, tenant=payload.get("tenant"))
+
+
+def create_app() -> Flask:
+    """
+    서버 리소스를 초기화하고 Flask 앱 반환 (여러 번 호출해도 한 번만 초기화)
+    서버를 실행하는 프로세스에서만 호출합니다. (python app.py 또는 wsgi.py를 지정한 WSGI 서버/flask run)
+    import 시점에 초기화하면 Werkzeug reloader의 감시 프로세스도 모델을 로드하고
+    같은 대기열을 처리하며, recover()가 서로의 실행 중인 작업을 다시 대기열에 넣습니다.
+    """
+    global supabase, _message_writer, admission_control, job_manager, webhook_dedup, _initialized
+    with _init_lock:
+        if _initialized:
+            return app
+
+        # Supabase 클라이언트 초기화
+        supabase = get_supabase_client()
+
+        # 에이전트 워밍업 (모델 로드/그래프 컴파일을 첫 webhook 전에 수행)
+        # AGENT_WARMUP=false로 비활성화 가능
+        if os.getenv("AGENT_WARMUP", "true").lower() not in ("0", "false", "no"):
+            try:
+                warmup()
+            except Exception as e:
+                import traceback
+                print(f"[ERROR] 에이전트 워밍업 실패: {str(e)}")
+                print(f"[ERROR] Traceback: {traceback.format_exc()}")
+
+        # 프로세스 종료 시 모델/클라이언트 해제
+        atexit.register(shutdown)
+
+        # webhook 메시지 INSERT를 배정과 동시에 실행하는 스레드 풀
+        _message_writer = ThreadPoolExecutor(
+            max_workers=int(os.getenv("WEBHOOK_INSERT_WORKERS", "4")),
+            thread_name_prefix="message-insert",
+        )
+        atexit.register(_message_writer.shutdown, wait=True)
+
+        # webhook 배정 유입 제어 (채널별 토큰 버킷 + 전역 동시 LLM 배정 한도)
+        admission_control = AdmissionController(
+            rate=float(os.getenv("ADMISSION_RATE_PER_SECOND", "5")),
+            burst=float(os.getenv("ADMISSION_BURST", "30")),
+            max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16")),
+            mode=os.getenv("ADMISSION_MODE", "defer"),
+            max_defer_seconds=float(os.getenv("ADMISSION_MAX_DEFER_SECONDS", "300")),
+        )
+
+        # webhook 부서 배정을 백그라운드에서 처리하는 작업 관리자 (작업은 디스크 대기열에 보관)
+        # 시작 시 이전 프로세스가 끝내지 못한 작업을 다시 실행합니다.
+        job_manager = JobManager(
+            run_assignment_job,
+            DurableJobQueue(
+                path=DEFAULT_QUEUE_PATH,
+                max_depth=int(os.getenv("ASSIGN_MAX_PENDING", "1000")),
+                max_attempts=int(os.getenv("ASSIGN_MAX_ATTEMPTS", "5")),
+                retry_base_seconds=float(os.getenv("ASSIGN_RETRY_BASE_SECONDS", "2")),
+                retry_max_seconds=float(os.getenv("ASSIGN_RETRY_MAX_SECONDS", "300")),
+                lease_seconds=float(os.getenv("ASSIGN_LEASE_SECONDS", "300")),
+            ),
+            workers=int(os.getenv("ASSIGN_WORKERS", "4")),
+            retention_seconds=float(os.getenv("ASSIGN_JOB_RETENTION_SECONDS", str(7 * 24 * 3600))),
+            # 동시 실행 자리를 잡은 뒤 작업을 꺼내므로 자리를 기다리는 동안 리스가 만료되지 않음
+            slot=admission_control.slot,
+        )
+        # atexit은 나중에 등록한 것부터 실행되므로 에이전트 리소스보다 먼저 종료 (실행 중인 작업 마무리)
+        atexit.register(job_manager.close)
+
+        # 채널톡 webhook 재전송 중복 제거 (처리한 이벤트 -> msg_id)
+        webhook_dedup = WebhookDeduplicator(
+            path=DEFAULT_DEDUP_PATH or None,
+            max_entries=int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "100000")),
+        )
+        atexit.register(webhook_dedup.close)
+
+        _initialized = True
+    return app
+
+
+def webhook_dedup_enabled() -> bool:
+    return os.getenv("WEBHOOK_DEDUP", "true").lower() not in ("0", "false", "no")
+
+
+def claim_webhook(data: dict, msg_content: str, tenant, msg_id: int) -> tuple:
+    """
+    webhook 중복 확인 및 키 선점
+
+    Returns:
+        (키, 이전 msg_id) - 처음 온 webhook이면 이전 msg_id는 None, 중복 확인을 끄면 (None, None)
+    """
+    if not webhook_dedup_enabled():
+        return None, None
+    key, kind = webhook_dedup_key(data, msg_content, tenant)
+    # 메시지 ID는 재전송 기간 동안, 내용 지문은 같은 내용을 다시 보낼 수 있으므로 짧은 시간 창 동안만 기억
+    if kind == "event":
+        ttl = float(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "86400"))
+    else:
+        ttl = float(os.getenv("WEBHOOK_DEDUP_WINDOW_SECONDS", "300"))
+    return key, webhook_dedup.claim(key, msg_id, ttl)
+
+
+def forget_webhook(key) -> None:
+    """메시지를 저장하지 못한 webhook의 키 삭제 (재전송 시 다시 처리)"""
+    if key is not None:
+        webhook_dedup.forget(key)
+
+
+def saved_message_id(saved):
+    """백그라운드 INSERT가 끝날 때까지 기다려 저장된 msg_id 반환 (저장 실패 시 None)"""
+    if saved is None:
+        return None
+    try:
+        return saved.result()
+    except Exception:
+        return None
+
+
+def update_webhook(key, msg_id: int, msg_id_saved: int) -> None:
+    """중복 키 재시도로 msg_id가 바뀌었으면 기록 갱신"""
+    if key is not None and msg_id_saved != msg_id:
+        webhook_dedup.update(key, msg_id_saved)
+
+
+def queue_assignment(msg_id_saved: int, msg_content: str, tenant, admission: dict):
+    """
+    저장된 메시지의 배정 작업을 대기열에 등록하고 202 응답 생성
+    유입 제어 결과가 skip이면 등록하지 않고, defer이면 delay초 뒤로 미뤄 등록합니다.
+    메시지를 저장한 뒤이므로 항상 202로 응답합니다. (대기열이 가득 차도 작업은 등록)
+    """
+    decision = admission["decision"]
+    if decision == AdmissionController.SKIP:
+        # 메시지는 저장되었으므로 나중에 /assign-department/batch로 배정할 수 있음
+        print(f"[WARN] 요청 한도 초과로 배정 생략 - msg_id: {msg_id_saved}, tenant: {tenant}")
+        return jsonify({
+            "status": "accepted",
+            "message": "요청 한도 초과로 배정 생략",
+            "msg_id": msg_id_saved,
+            "admission": decision
+        }), 202
+    # 메시지가 이미 저장되었으므로 대기열이 가득 차도 거절하지 않고 등록 (대기열 파일 오류 시 메모리에 보관 후 재등록)
+    # 여기서 429/503으로 응답하면 채널톡 재전송이 중복으로 처리되어 배정 작업이 영영 등록되지 않음
+    job_manager.submit(
+        msg_id_saved,
+        {"msg_id": str(msg_id_saved), "content": msg_content, "tenant": tenant},
+        delay_seconds=admission["delay"],
+        force=True,
+    )
+    if decision == AdmissionController.DEFER:
+        print(f"[WARN] 요청 한도 초과로 배정 {admission['delay']:.1f}초 지연 - msg_id: {msg_id_saved}, tenant: {tenant}")
+    return jsonify({
+        "status": "accepted",
+        "message": "배정 대기 중",
+        "msg_id": msg_id_saved,
+        "job": f"/jobs/{msg_id_saved}",
+        "admission": decision
+    }), 202
+
+
+def queue_full_response(message: str):
+    """배정 대기열이 가득 찼을 때 429 + Retry-After 응답 (메시지를 저장하기 전에만 사용)"""
+    response = jsonify({"status": "error", "message": message})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(job_manager.retry_after())
+    return response
+
+
+def webhook_async_enabled() -> bool:
+    return os.getenv("WEBHOOK_ASYNC", "true").lower() not in ("0", "false", "no")
+
+
+def webhook_parallel_insert_enabled() -> bool:
+    return os.getenv("WEBHOOK_PARALLEL_INSERT", "true").lower() not in ("0", "false", "no")
+
+
+def insert_message(msg_id: int, msg_content: str, current_timestamp: str) -> int:
+    """
+    message 테이블에 메시지 저장
+    msg_id는 Snowflake 생성기로 만들어 중복되지 않지만, 그래도 중복 키 오류가 나면
+    DB 조회 없이 새 ID를 발급받아 최대 3회 재시도합니다.
+
+    Returns:
+        실제 저장된 msg_id
+
+    Raises:
+        MessageSaveError: 저장 실패
+    """
+    max_retries = 3
+
+    for attempt in range(max_retries):
+        try:
+            print(f"[DEBUG] DB 저장 시도 {attempt + 1}/{max_retries} - msg_id: {msg_id}")
+            supabase.table('message').insert({
+                'msg_id': msg_id,
+                'content': msg_content,
+                'timestamp': current_timestamp
+            }).execute()
+            print(f"[DEBUG] 메시지 저장 성공 - msg_id: {msg_id}")
+            return msg_id
+
+        except Exception as e:
+            error_str = str(e)
+            print(f"[ERROR] DB 저장 실패 (시도 {attempt + 1}/{max_retries}): {error_str}")
+
+            # 중복 키 에러인 경우에만 재시도
+            if ('duplicate key' in error_str.lower() or
+                '23505' in error_str or
+                'unique constraint' in error_str.lower()):
+
+                if attempt < max_retries - 1:
+                    msg_id = next_message_id()
+                    print(f"[WARN] 중복 ID 발생, 재시도 {attempt + 1}/{max_retries}, 새 msg_id: {msg_id}")
+                    continue  # 재시도
+                # 최대 재시도 횟수 초과
+                raise MessageSaveError(f"메시지 저장 실패: 중복 ID가 계속 발생합니다. (재시도 {max_retries}회 실패)")
+            # 중복 키가 아닌 다른 에러는 즉시 실패
+            raise MessageSaveError(f"DB 저장 실패: {error_str}")
+
+    raise MessageSaveError("메시지 저장 실패")
+
+
+def run_webhook_assignment(msg_id: int, msg_content: str, tenant) -> None:
+    """webhook 메시지 부서 배정 (실패해도 메시지는 저장되므로 예외를 밖으로 던지지 않음)"""
+    print(f"[DEBUG] 부서 배정 시작 - msg_id: {msg_id}")
+    try:
+        assign_result = assign_message(str(msg_id), msg_content, top_k=5, tenant=tenant)
+        if assign_result == 1:
+            print(f"[DEBUG] 부서 배정 성공 - msg_id: {msg_id}")
+        else:
+            print(f"[DEBUG] 부서 배정 실패 또는 일반 채팅으로 처리됨 - msg_id: {msg_id}")
+    except Exception as e:
+        import traceback
+        print(f"[ERROR] 부서 배정 중 오류 발생: {str(e)}")
+        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -64,9 +347,12 @@ def health_check():
         "message": "ChannelTalk Hackaton API Server",
         "endpoints": {
             "webhook": "/webhook (POST)",
+            "job_status": "/jobs/{msg_id} (GET)",
+            "assign_department_batch": "/assign-department/batch (POST)",
             "csv_upload": "/csv/upload (POST)",
             "department_all": "/department/all (GET)",
-            "msg_all": "/msg/all?d_id={id} (GET)"
+            "msg_all": "/msg/all?d_id={id} (GET)",
+            "metrics": "/metrics (GET)"
         }
     }), 200
 
@@ -76,7 +362,15 @@ def webhook_handler():
     """
     채널톡 webhook API
     채널톡 webhook 형식의 JSON을 받아서 처리
+    재전송된 webhook은 처음 발급한 msg_id로 바로 응답합니다 (status: duplicate).
+    중복 확인 키는 메시지를 저장하지 못한 경우에만 삭제합니다. (저장된 메시지가 재전송으로 다시 저장되지 않도록)
     """
+    dedup_key = None
+    msg_id = None
+    msg_id_saved = None
+    saved = None
+    tenant = None
+    admission = None
     try:
         data = request.get_json()
         
@@ -120,94 +414,82 @@ def webhook_handler():
             }), 400
         
         # 1) msg를 DB에 저장 (table: message, field: msg_id, content, timestamp)
-        # msg_id는 int8이므로 숫자로 생성 (마이크로초 타임스탬프 사용)
-        msg_id = int(time.time() * 1000000)  # 마이크로초 타임스탬프 사용
+        # msg_id는 int8이므로 Snowflake 방식(타임스탬프 + 워커 ID + 시퀀스)으로 DB 조회 없이 생성
+        msg_id = next_message_id()
         # 현재 시간을 ISO 8601 형식으로 저장 (UTC)
         current_timestamp = datetime.now(timezone.utc).isoformat()
+        tenant = extract_tenant(data)
         
-        print(f"[DEBUG] 메시지 저장 시도 - msg_id: {msg_id}, content 길이: {len(msg_content)}")
-        
-        # 중복 ID 발생 시 재시도 로직
-        max_retries = 3
-        msg_id_saved = None
-        
-        for attempt in range(max_retries):
-            try:
-                print(f"[DEBUG] DB 저장 시도 {attempt + 1}/{max_retries} - msg_id: {msg_id}")
-                response = supabase.table('message').insert({
-                    'msg_id': msg_id,
-                    'content': msg_content,
-                    'timestamp': current_timestamp
-                }).execute()
-                msg_id_saved = msg_id
-                print(f"[DEBUG] 메시지 저장 성공 - msg_id: {msg_id}")
-                break  # 성공 시 루프 종료
-                
-            except Exception as e:
-                error_str = str(e)
-                print(f"[ERROR] DB 저장 실패 (시도 {attempt + 1}/{max_retries}): {error_str}")
-                
-                # 중복 키 에러인 경우에만 재시도
-                if ('duplicate key' in error_str.lower() or 
-                    '23505' in error_str or
-                    'unique constraint' in error_str.lower()):
-                    
-                    if attempt < max_retries - 1:
-                        # 실패했을 때만 max msg_id 조회
-                        try:
-                            max_result = supabase.table('message')\
-                                .select('msg_id')\
-                                .order('msg_id', desc=True)\
-                                .limit(1)\
-                                .execute()
-                            
-                            # 다음 ID 계산 (max + 1)
-                            if max_result.data:
-                                msg_id = max_result.data[0]['msg_id'] + 1
-                            else:
-                                msg_id = 1
-                            
-                            print(f"[WARN] 중복 ID 발생, 재시도 {attempt + 1}/{max_retries}, 새 msg_id: {msg_id}")
-                        except Exception as query_error:
-                            # max 조회 실패 시 타임스탬프 기반으로 재생성
-                            msg_id = int(time.time() * 1000000) + attempt + 1
-                            print(f"[WARN] max 조회 실패, 타임스탬프 기반 재생성: {msg_id}")
-                        
-                        continue  # 재시도
-                    else:
-                        # 최대 재시도 횟수 초과
-                        return jsonify({
-                            "status": "error",
-                            "message": f"메시지 저장 실패: 중복 ID가 계속 발생합니다. (재시도 {max_retries}회 실패)"
-                        }), 500
-                else:
-                    # 중복 키가 아닌 다른 에러는 즉시 반환
-                    return jsonify({
-                        "status": "error",
-                        "message": f"DB 저장 실패: {str(e)}"
-                    }), 500
-        
-        if not msg_id_saved:
+        # 재전송된 webhook이면 DB/모델을 거치지 않고 처음 발급한 msg_id로 바로 응답
+        dedup_key, original_msg_id = claim_webhook(data, msg_content, tenant, msg_id)
+        if original_msg_id is not None:
+            print(f"[DEBUG] 중복 webhook - 기존 msg_id: {original_msg_id}")
             return jsonify({
-                "status": "error",
-                "message": "메시지 저장 실패"
-            }), 500
+                "status": "duplicate",
+                "message": "이미 접수된 메시지",
+                "msg_id": original_msg_id,
+                "job": f"/jobs/{original_msg_id}"
+            }), 200
         
-        # 메시지 저장 완료 후 부서 배정 실행
-        print(f"[DEBUG] 메시지 저장 완료 - msg_id: {msg_id_saved}")
-        print(f"[DEBUG] 부서 배정 시작 - msg_id: {msg_id_saved}")
+        print(f"[DEBUG] 메시지 저장 시도 - msg_id: {msg_id}, content 길이: {len(msg_content)}")
         
+        # 2) 부서 배정은 DB 재조회 없이 받은 내용으로 실행
+        # 비동기 모드: 메시지 저장 후 배정 작업만 디스크 대기열에 등록하고 202로 바로 응답
+        if webhook_async_enabled():
+            # 대기열이 가득 차면 메시지도 저장하지 않고 429로 거절 (채널톡이 Retry-After 뒤 재전송)
+            if not job_manager.has_capacity():
+                print("[WARN] 배정 대기열이 가득 차 webhook을 거절합니다.")
+                forget_webhook(dedup_key)
+                return queue_full_response("배정 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요.")
+            try:
+                msg_id_saved = insert_message(msg_id, msg_content, current_timestamp)
+            except MessageSaveError as e:
+                forget_webhook(dedup_key)
+                return jsonify({"status": "error", "message": str(e)}), 500
+            update_webhook(dedup_key, msg_id, msg_id_saved)
+            # 채널 요청 한도 토큰은 메시지를 저장한 뒤에만 사용
+            return queue_assignment(msg_id_saved, msg_content, tenant, admission_control.admit(tenant))
+        
+        # 동기 모드: 채널 요청 한도나 동시 배정 한도를 넘으면 메시지만 저장하고 배정은 대기열로 넘기거나 생략
+        # 배정 방식을 INSERT 전에 정해야 하므로 토큰을 먼저 사용하고, 저장에 실패하면 반환합니다.
+        admission = admission_control.admit(tenant)
+        if admission["decision"] != AdmissionController.ADMIT or not admission_control.try_acquire():
+            if admission["decision"] == AdmissionController.ADMIT:
+                admission = {"decision": AdmissionController.DEFER, "delay": 0.0}
+            try:
+                msg_id_saved = insert_message(msg_id, msg_content, current_timestamp)
+            except MessageSaveError as e:
+                forget_webhook(dedup_key)
+                admission_control.refund(tenant, admission)
+                return jsonify({"status": "error", "message": str(e)}), 500
+            update_webhook(dedup_key, msg_id, msg_id_saved)
+            return queue_assignment(msg_id_saved, msg_content, tenant, admission)
+        
+        # 동시 실행 시 INSERT를 백그라운드로 보내고 바로 배정(임베딩/검색/LLM)을 시작하며,
+        # assigned_message 저장 직전에만 INSERT 완료를 기다립니다.
         try:
-            assign_result = assign_department(str(msg_id_saved), top_k=5)
-            if assign_result == 1:
-                print(f"[DEBUG] 부서 배정 성공 - msg_id: {msg_id_saved}")
+            if webhook_parallel_insert_enabled():
+                saved = _message_writer.submit(insert_message, msg_id, msg_content, current_timestamp)
+                with pending_message(msg_id, saved):
+                    run_webhook_assignment(msg_id, msg_content, tenant)
+                try:
+                    msg_id_saved = saved.result()
+                except MessageSaveError as e:
+                    forget_webhook(dedup_key)
+                    admission_control.refund(tenant, admission)
+                    return jsonify({"status": "error", "message": str(e)}), 500
+                update_webhook(dedup_key, msg_id, msg_id_saved)
             else:
-                print(f"[DEBUG] 부서 배정 실패 또는 일반 채팅으로 처리됨 - msg_id: {msg_id_saved}")
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] 부서 배정 중 오류 발생: {str(e)}")
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
-            # 부서 배정 실패해도 메시지는 저장되었으므로 성공으로 반환
+                try:
+                    msg_id_saved = insert_message(msg_id, msg_content, current_timestamp)
+                except MessageSaveError as e:
+                    forget_webhook(dedup_key)
+                    admission_control.refund(tenant, admission)
+                    return jsonify({"status": "error", "message": str(e)}), 500
+                update_webhook(dedup_key, msg_id, msg_id_saved)
+                run_webhook_assignment(msg_id_saved, msg_content, tenant)
+        finally:
+            admission_control.release()
         
         return jsonify({
             "status": "success",
@@ -220,6 +502,81 @@ def webhook_handler():
         error_trace = traceback.format_exc()
         print(f"[ERROR] Webhook handler exception: {str(e)}")
         print(f"[ERROR] Traceback: {error_trace}")
+        if msg_id_saved is None:
+            msg_id_saved = saved_message_id(saved)
+        if msg_id_saved is None:
+            forget_webhook(dedup_key)
+            if admission is not None:
+                admission_control.refund(tenant, admission)
+            return jsonify({
+                "status": "error",
+                "message": f"서버 오류: {str(e)}"
+            }), 500
+        # 메시지는 저장되었으므로 키를 남겨 두고 msg_id를 알려 줌 (/assign-department/batch로 다시 배정 가능)
+        update_webhook(dedup_key, msg_id, msg_id_saved)
+        return jsonify({
+            "status": "error",
+            "message": f"서버 오류: {str(e)}",
+            "msg_id": msg_id_saved
+        }), 500
+
+
+@app.route('/jobs/<msg_id>', methods=['GET'])
+def get_job(msg_id):
+    """
+    webhook 배정 작업 상태 조회
+    status: queued / running / done / failed, result: 0 (일반 채팅) 또는 1 (부서 배정)
+    attempts: 실행 횟수, error: 마지막 실패 사유 (queued면 next_run_at에 재시도)
+    queue_ms: 대기 시간, run_ms: 배정 실행 시간
+    """
+    job = job_manager.get(msg_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "작업을 찾을 수 없습니다."
+        }), 404
+    return jsonify({
+        "status": "success",
+        "data": job
+    }), 200
+
+
+@app.route('/assign-department/batch', methods=['POST'])
+def assign_department_batch():
+    """
+    여러 메시지 일괄 부서 배정 API
+    요청: {"msg_ids": [...], "top_k": 5, "tenant": "회사 ID (선택)"}
+    응답 data는 요청한 msg_ids 순서대로 메시지별 배정 결과
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('msg_ids'), list) or not data['msg_ids']:
+            return jsonify({
+                "status": "error",
+                "message": "msg_ids 목록이 필요합니다."
+            }), 400
+        
+        max_batch_size = int(os.getenv("BATCH_MAX_SIZE", "500"))
+        if len(data['msg_ids']) > max_batch_size:
+            return jsonify({
+                "status": "error",
+                "message": f"한 번에 최대 {max_batch_size}개의 메시지만 배정할 수 있습니다."
+            }), 400
+        
+        top_k = int(data.get('top_k', 5))
+        results = assign_departments(data['msg_ids'], top_k=top_k, tenant=data.get('tenant'))
+        
+        return jsonify({
+            "status": "success",
+            "data": results
+        }), 200
+        
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in assign_department_batch: {str(e)}")
+        print(f"Traceback: {error_trace}")
         return jsonify({
             "status": "error",
             "message": f"서버 오류: {str(e)}"
@@ -231,6 +588,7 @@ def upload_csv():
     """
     CSV 파일 업로드 API
     dept_id, dept_name, dept_desc 컬럼을 파싱하여 DB에 저장
+    DEPT_TENANT_COLUMN이 설정되어 있으면 같은 이름의 CSV 컬럼(없으면 form 필드) 값을 회사 ID로 저장
     """
     try:
         if 'file' not in request.files:
@@ -251,6 +609,9 @@ def upload_csv():
         stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
         csv_reader = csv.DictReader(stream)
         
+        tenant_column = get_tenant_column()
+        default_tenant = request.form.get(tenant_column) if tenant_column else None
+        
         departments = []
         for row in csv_reader:
             # dept_name과 dept_desc가 필수, dept_id는 선택적
@@ -272,6 +633,12 @@ def upload_csv():
                             # dept_id가 숫자가 아니면 무시
                             pass
                     
+                    # 회사별 부서 인덱스를 위한 tenant 컬럼
+                    if tenant_column:
+                        tenant = (row.get(tenant_column) or '').strip() or default_tenant
+                        if tenant:
+                            dept_data[tenant_column] = tenant
+                    
                     departments.append(dept_data)
         
         if not departments:
@@ -281,9 +648,11 @@ def upload_csv():
             }), 400
         
         # 2) 파싱한 결과를 DB에 저장 (table: department, field: dept_id, dept_name, dept_desc)
+        inserted_departments = []
         try:
             for dept in departments:
-                supabase.table('department').insert(dept).execute()
+                response = supabase.table('department').insert(dept).execute()
+                inserted_departments.extend(response.data or [])
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
@@ -303,10 +672,25 @@ def upload_csv():
                 "message": f"DB 저장 실패: {str(e)}"
             }), 500
         
+        # 3) 에이전트 부서 인덱스에 새로 추가/변경된 부서만 반영
+        index_version = None
+        index_versions = {}
+        try:
+            sync_result = sync_department_index(inserted_departments)
+            index_version = sync_result["version"]
+            index_versions = sync_result["versions"]
+        except Exception as e:
+            import traceback
+            # 인덱스 갱신 실패해도 DB 저장은 완료되었으므로 성공으로 반환
+            print(f"[ERROR] 부서 인덱스 갱신 실패: {str(e)}")
+            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        
         return jsonify({
             "status": "success",
             "message": f"{len(departments)}개의 부서가 저장되었습니다.",
-            "count": len(departments)
+            "count": len(departments),
+            "index_version": index_version,
+            "index_versions": index_versions
         }), 200
         
     except Exception as e:
@@ -402,6 +786,34 @@ def get_messages_by_department():
         }), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    운영 지표 조회
+    - resources: 모델/클라이언트별 초기화 여부와 생성 횟수
+    - query_embedding_cache: 문의 임베딩 캐시 적중/미스 횟수
+    - embedding_scheduler: 인코딩 대기열 길이와 배치 크기 분포
+    - jobs: webhook 배정 작업 대기/실행/완료/실패 건수와 평균 대기·실행 시간
+    - message_ids: 이 프로세스의 msg_id 워커 ID와 발급 건수
+    - webhook_dedup: 재전송으로 판단해 바로 응답한 webhook 건수
+    - admission: 채널 요청 한도로 미루거나(defer) 생략한(skip) 배정 건수, 동시 배정 수
+    - routing_policy: 직접 배정 비율, LLM과의 일치율, 절약한 LLM 지연
+    - dept_classifier: 부서 분류기로 바로 배정한 비율
+    """
+    return jsonify({
+        "status": "success",
+        "data": {
+            "resources": registry.stats(),
+            "jobs": job_manager.stats(),
+            "message_ids": get_id_generator().stats(),
+            "webhook_dedup": webhook_dedup.stats(),
+            "admission": admission_control.stats(),
+            **get_agent_metrics()
+        }
+    }), 200
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8000)
+    # reloader를 켜면 감시 프로세스와 실행 프로세스가 각각 모델을 로드하고 작업 대기열을 처리하므로 끔
+    create_app().run(debug=True, host='0.0.0.0', port=8000, use_reloader=False)
 
@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from openai import AsyncOpenAI
+from supabase import acreate_client, AsyncClient
+from langgraph.graph import StateGraph, END
+from langchain_core.messages import ToolMessage, SystemMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+
+import agent
+from agent import AgentState, assign_department_tool
+
+
+class AsyncAgentRuntime:
+    """
+    asyncio 기반 부서 배정 파이프라인
+    Supabase/OpenAI 호출은 비동기 클라이언트로 기다리는 동안 이벤트 루프를 양보하고,
+    CPU를 쓰는 KURE 인코딩/검색은 전용 스레드 풀에서 실행합니다.
+    모델, 인덱스, 캐시는 동기 에이전트(agent.py)와 같은 것을 공유합니다.
+
+    사용 예:
+        async with AsyncAgentRuntime() as runtime:
+            results = await runtime.assign_many(msg_ids)
+    """
+
+    def __init__(self, encode_workers: Optional[int] = None) -> None:
+        workers = encode_workers or int(os.getenv("ASYNC_ENCODE_WORKERS", "2"))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kure-encode")
+        self.supabase: Optional[AsyncClient] = None
+        self.openai: Optional[AsyncOpenAI] = None
+        self.graph = None
+
+    async def start(self) -> "AsyncAgentRuntime":
+        """비동기 클라이언트 생성 및 그래프 컴파일 (실행 중인 이벤트 루프 안에서 호출)"""
+        url, key = agent.get_supabase_credentials()
+        self.supabase = await acreate_client(url, key)
+        self.openai = AsyncOpenAI(api_key=agent.get_openai_api_key())
+        if agent.get_agent_mode() == "graph":
+            self.graph = self._build_graph()
+        return self
+
+    async def close(self) -> None:
+        if self.supabase is not None:
+            await self.supabase.postgrest.aclose()
+            await self.supabase.auth.close()
+        if self.openai is not None:
+            await self.openai.close()
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "AsyncAgentRuntime":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _run_cpu(self, fn, *args):
+        """CPU 작업(인코딩/검색)을 전용 스레드 풀에서 실행"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # ------------------------------------------------------------------
+    # DB / LLM 호출
+    # ------------------------------------------------------------------
+
+    async def get_message_content(self, msg_id: str) -> Optional[str]:
+        response = await self.supabase.table("message").select("content").eq("msg_id", msg_id).execute()
+        if response.data and len(response.data) > 0:
+            return response.data[0]["content"]
+        return None
+
+    async def save_assignments(self, msg_id: str, dept_ids: list) -> List[dict]:
+        """assigned_message 저장 (한 번의 upsert, 이미 있는 행은 무시하고 새로 생성된 행 반환)"""
+        rows = [{"msg_id": msg_id, "dept_id": dept_id} for dept_id in dict.fromkeys(dept_ids)]
+        if not rows:
+            return []
+        response = await self.supabase.table("assigned_message").upsert(
+            rows, on_conflict="msg_id,dept_id", ignore_duplicates=True
+        ).execute()
+        return response.data or []
+
+    async def select_departments(self, query: str, candidates: List[dict]) -> Optional[list]:
+        response = await self.openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=agent.build_selection_messages(query, candidates),
+            temperature=0.3,
+            response_format={"type": "json_object"}
+        )
+        return agent.parse_selected_dept_ids(response.choices[0].message.content)
+
+    async def route_single_call(self, query: str, candidates: List[dict]) -> dict:
+        request, id_map = agent.build_single_call_request(query, candidates)
+        response = await self.openai.chat.completions.create(**request)
+        return agent.parse_single_call_decision(response.choices[0].message.content, id_map)
+
+    # ------------------------------------------------------------------
+    # 그래프
+    # ------------------------------------------------------------------
+
+    async def assign_department_tool(
+        self, query: str, msg_id: str, top_k: int, tenant: Optional[str] = None
+    ) -> dict:
+        """assign_department_tool의 비동기 버전 (같은 결과 형식)"""
+        try:
+            print(f"부서 배정 도구 실행(async): query='{query[:50]}...', top_k={top_k}")
+            similar_departments, catalog_version = await self._run_cpu(
+                agent.search_departments, query, top_k, tenant
+            )
+            if not similar_departments:
+                return {"error": "부서 정보가 없습니다."}
+
+            # 분류기/1위 부서가 확실하면 LLM 없이 배정 (agent.select_departments와 같은 순서)
+            embedding = await self._run_cpu(agent.encode_query, query)
+            selected_dept_ids, policy_decision = await self._run_cpu(
+                agent.preselect_departments, embedding, similar_departments, msg_id
+            )
+            if not selected_dept_ids:
+                started = time.perf_counter()
+                selected_dept_ids = await self.select_departments(query, similar_departments)
+                agent.record_policy_comparison(
+                    policy_decision, msg_id, selected_dept_ids, time.perf_counter() - started
+                )
+            if not selected_dept_ids:
+                return {"error": "LLM이 유효한 부서를 선택하지 못했습니다."}
+            print(f"선택된 부서 ID: {selected_dept_ids}")
+
+            await self.save_assignments(msg_id, selected_dept_ids)
+            return agent.build_tool_result(similar_departments, selected_dept_ids, catalog_version)
+        except Exception as e:
+            print(f"부서 배정 도구 오류(async): {e}")
+            return agent.tool_error_result(e)
+
+    def _build_graph(self):
+        """비동기 노드로 구성한 LangGraph (구조는 build_agent_graph와 동일)"""
+        tools = [assign_department_tool]
+        llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.1,
+            openai_api_key=agent.get_openai_api_key()
+        )
+        llm_with_tools = llm.bind_tools(tools)
+        system_prompt = agent.build_chatbot_system_prompt(tools)
+
+        async def chatbot(state: AgentState):
+            messages = state["messages"]
+            last_user_message = agent.get_last_user_message(messages)
+
+            local_response = await self._run_cpu(agent.local_intent_response, last_user_message)
+            if local_response is not None:
+                return {"messages": [local_response]}
+
+            try:
+                response = await llm_with_tools.ainvoke([SystemMessage(content=system_prompt)] + messages)
+            except Exception as e:
+                print(f"LLM 호출 오류(async): {e}")
+                raise agent.AssignmentError(f"LLM 호출 오류: {e}") from e
+            return {"messages": [response]}
+
+        async def tools_node(state: AgentState):
+            messages = state.get("messages", [])
+            tool_calls = getattr(messages[-1], "tool_calls", None) if messages else None
+            if not tool_calls:
+                return {"messages": []}
+
+            results = []
+            for tool_call in tool_calls:
+                if tool_call["name"] != "assign_department_tool":
+                    print(f"도구를 찾을 수 없음: {tool_call['name']}")
+                    continue
+                result = await self.assign_department_tool(
+                    tool_call["args"].get("query", ""),
+                    state.get("msg_id"),
+                    state.get("top_k", 5),
+                    state.get("tenant"),
+                )
+                results.append(
+                    ToolMessage(
+                        content=json.dumps(result, ensure_ascii=False),
+                        name=tool_call["name"],
+                        tool_call_id=tool_call["id"],
+                    )
+                )
+            return {"messages": results}
+
+        workflow = StateGraph(AgentState)
+        workflow.add_node("chatbot", chatbot)
+        workflow.add_node("tools", tools_node)
+        workflow.set_entry_point("chatbot")
+        workflow.add_conditional_edges(
+            "chatbot",
+            agent.llm_tool_router,
+            {
+                "tools": "tools",
+                "end": END
+            }
+        )
+        workflow.add_edge("tools", END)
+        return workflow.compile()
+
+    # ------------------------------------------------------------------
+    # 배정
+    # ------------------------------------------------------------------
+
+    async def assign_department(
+        self,
+        msg_id: str,
+        top_k: int = 5,
+        content: Optional[str] = None,
+        tenant: Optional[str] = None,
+    ) -> int:
+        """
+        agent.assign_department의 비동기 버전 (같은 0/1 반환)
+
+        Returns:
+            0: 일반 채팅
+            1: 부서 배정 성공
+        """
+        if content is None:
+            content = await self.get_message_content(msg_id)
+        if not content:
+            print(f"메시지 ID {msg_id}를 찾을 수 없습니다.")
+            return 0
+
+        cached = await self._run_cpu(agent.lookup_cached_decision, content, tenant)
+        if cached:
+            await self.save_assignments(msg_id, cached["dept_ids"])
+            return 1
+
+        if agent.get_agent_mode() == "single_call":
+            return await self._assign_single_call(msg_id, content, top_k, tenant)
+
+        result = await self.graph.ainvoke({
+            "messages": [HumanMessage(content=content)],
+            "msg_id": msg_id,
+            "top_k": top_k,
+            "tenant": tenant
+        })
+        return await self._run_cpu(
+            agent.interpret_agent_result, result.get("messages", []), msg_id, content, tenant
+        )
+
+    async def _assign_single_call(
+        self, msg_id: str, content: str, top_k: int, tenant: Optional[str] = None
+    ) -> int:
+        """agent._assign_single_call의 비동기 버전 (LLM 호출 전후 단계는 agent.py와 공유)"""
+        plan = await self._run_cpu(agent.plan_single_call, msg_id, content, top_k, tenant)
+        decision = plan["decision"]
+        if decision is None:
+            started = time.perf_counter()
+            decision = await self.route_single_call(content, plan["candidates"])
+            agent.record_policy_comparison(
+                plan["policy_decision"], msg_id, decision.get("dept_ids"), time.perf_counter() - started
+            )
+        if decision["action"] != "assign":
+            return 0
+
+        await self.save_assignments(msg_id, decision["dept_ids"])
+        await self._run_cpu(
+            agent.remember_decision, content, tenant, decision["dept_ids"], plan["catalog_version"], msg_id
+        )
+        return 1
+
+    async def assign_many(
+        self,
+        msg_ids: List[str],
+        top_k: int = 5,
+        concurrency: Optional[int] = None,
+        tenant: Optional[str] = None,
+    ) -> List[int]:
+        """여러 메시지를 동시에 배정 (최대 concurrency건 동시 진행, 입력 순서대로 0/1 반환)"""
+        limit = asyncio.Semaphore(concurrency or int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200")))
+
+        async def run(msg_id: str) -> int:
+            async with limit:
+                try:
+                    return await self.assign_department(str(msg_id), top_k=top_k, tenant=tenant)
+                except Exception as e:
+                    print(f"비동기 배정 오류 (msg_id: {msg_id}): {e}")
+                    return 0
+
+        return await asyncio.gather(*(run(msg_id) for msg_id in msg_ids))
+
+
+def run_assignments(msg_ids: List[str], top_k: int = 5, concurrency: Optional[int] = None) -> List[int]:
+    """동기 코드에서 비동기 파이프라인으로 여러 메시지를 배정"""
+    async def main() -> List[int]:
+        async with AsyncAgentRuntime() as runtime:
+            return await runtime.assign_many(msg_ids, top_k=top_k, concurrency=concurrency)
+
+    return asyncio.run(main())
+
+
+if __name__ == "__main__":
+    # 사용 예: python async_agent.py 12345 12346 ...
+    results = run_assignments(sys.argv[1:])
+    for msg_id, status in zip(sys.argv[1:], results):
+        print(f"{msg_id}: {status}")
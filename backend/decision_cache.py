@@ -0,0 +1,174 @@
+import time
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from dept_index import normalize_rows
+
+
+class SemanticDecisionCache:
+    """
+    배정 결과 재사용 캐시
+    이전에 배정된 문의의 임베딩과 배정 부서를 보관하고, 새 문의가 코사인 유사도 threshold 이상으로
+    가까우면 그 배정 결과를 그대로 돌려줍니다. 항목은 ttl_seconds 후 만료되며,
+    부서 카탈로그(인덱스 version)가 바뀌면 전체가 무효화됩니다.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 5000,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._catalog_version = None
+        self._reset()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _reset(self) -> None:
+        # 고정 크기 링 버퍼 (가득 차면 가장 오래된 항목을 덮어씀)
+        self._embeddings: Optional[np.ndarray] = None
+        self._created_at = np.zeros(self.max_entries, dtype=np.float64)
+        self._dept_ids: List[Optional[list]] = [None] * self.max_entries
+        self._source_msg_ids: List[Optional[str]] = [None] * self.max_entries
+        self._size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _check_catalog(self, catalog_version) -> None:
+        # self._lock을 잡은 상태에서 호출
+        if self._catalog_version != catalog_version:
+            if self._size:
+                self.invalidations += 1
+            self._reset()
+            self._catalog_version = catalog_version
+
+    def lookup(self, embedding: np.ndarray, catalog_version) -> Optional[dict]:
+        """
+        가장 가까운 과거 배정을 찾아 threshold 이상이면 반환
+
+        Returns:
+            {"dept_ids": list, "source_msg_id": str, "similarity": float} 또는 None
+        """
+        query = normalize_rows(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_catalog(catalog_version)
+            if self._size == 0 or self._embeddings is None:
+                self.misses += 1
+                return None
+
+            similarities = self._embeddings[:self._size] @ query
+            if self.ttl_seconds > 0:
+                expired = now - self._created_at[:self._size] > self.ttl_seconds
+                similarities = np.where(expired, -np.inf, similarities)
+
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return {
+                "dept_ids": list(self._dept_ids[best]),
+                "source_msg_id": self._source_msg_ids[best],
+                "similarity": similarity,
+            }
+
+    def add(
+        self,
+        embedding: np.ndarray,
+        dept_ids: list,
+        catalog_version,
+        source_msg_id: Optional[str] = None,
+    ) -> None:
+        """배정 결과 저장"""
+        if not dept_ids or self.max_entries <= 0:
+            return
+        vector = normalize_rows(embedding)
+        with self._lock:
+            self._check_catalog(catalog_version)
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._embeddings[slot] = vector
+            self._created_at[slot] = time.time()
+            self._dept_ids[slot] = list(dept_ids)
+            self._source_msg_ids[slot] = source_msg_id
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def invalidate(self) -> None:
+        """전체 항목 무효화"""
+        with self._lock:
+            if self._size:
+                self.invalidations += 1
+            self._reset()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "catalog_version": self._catalog_version,
+            }
+
+
+class ScopedDecisionCache:
+    """
+    회사(tenant)별 배정 결과 재사용 캐시
+    다른 회사의 배정 결과가 재사용되지 않도록 scope마다 SemanticDecisionCache를 따로 두며,
+    scope별 캐시는 처음 사용할 때 생성합니다.
+    """
+
+    def __init__(self, **cache_kwargs) -> None:
+        self.cache_kwargs = cache_kwargs
+        self._lock = threading.Lock()
+        self._caches = {}
+
+    def for_scope(self, scope=None) -> SemanticDecisionCache:
+        with self._lock:
+            cache = self._caches.get(scope)
+            if cache is None:
+                cache = self._caches[scope] = SemanticDecisionCache(**self.cache_kwargs)
+            return cache
+
+    def invalidate(self) -> None:
+        with self._lock:
+            caches = list(self._caches.values())
+        for cache in caches:
+            cache.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            caches = dict(self._caches)
+        per_scope = {("_global" if scope is None else str(scope)): cache.stats() for scope, cache in caches.items()}
+        hits = sum(stats["hits"] for stats in per_scope.values())
+        misses = sum(stats["misses"] for stats in per_scope.values())
+        lookups = hits + misses
+        return {
+            "scopes": len(per_scope),
+            "size": sum(stats["size"] for stats in per_scope.values()),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "invalidations": sum(stats["invalidations"] for stats in per_scope.values()),
+            "per_scope": per_scope,
+        }
+
@@ -0,0 +1,152 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from embedding_cache import normalize_query
+
+
+DEFAULT_DEDUP_PATH = os.getenv("WEBHOOK_DEDUP_PATH", os.path.join("data", "webhook_dedup.sqlite3"))
+
+
+def webhook_dedup_key(data: dict, content: str, tenant: Optional[str]) -> tuple:
+    """
+    webhook 중복 판별 키
+    채널톡 메시지 ID(entity.id)가 있으면 그 값을, 없으면 채팅방(entity.chatId) + 문의 내용 지문을 사용합니다.
+
+    Returns:
+        (키, 종류) - 종류는 "event"(메시지 ID) 또는 "fingerprint"(내용 지문, 짧은 시간 창에서만 중복으로 봄)
+    """
+    entity = data.get("entity") or {}
+    scope = tenant or ""
+    if entity.get("id"):
+        return f"event:{scope}:{entity['id']}", "event"
+    chat = entity.get("chatId") or entity.get("personId") or ""
+    digest = hashlib.sha256(
+        f"{scope}\x1f{chat}\x1f{normalize_query(content)}".encode("utf-8")
+    ).hexdigest()
+    return f"fp:{digest}", "fingerprint"
+
+
+class WebhookDeduplicator:
+    """
+    채널톡 webhook 재전송 중복 제거
+    처리한 webhook의 키 -> msg_id를 TTL 동안 기억하여, 같은 이벤트가 다시 오면 DB/모델을 거치지 않고
+    처음 발급한 msg_id를 돌려줍니다.
+
+    메모리 LRU(max_entries)를 먼저 보고, 없으면 SQLite(WAL) 파일을 확인합니다.
+    파일은 재시작 후에도, 같은 파일을 쓰는 다른 프로세스 사이에서도 공유됩니다. (path가 None이면 메모리만 사용)
+    msg_id를 먼저 발급한 뒤 claim으로 키를 선점하므로, 동시에 도착한 재전송도 한 건만 처리됩니다.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DEDUP_PATH, max_entries: int = 100000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS webhook_seen ("
+                "key TEXT PRIMARY KEY, msg_id INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _remember(self, key: str, msg_id: int, expires_at: float) -> None:
+        # self._lock을 잡은 상태에서 호출
+        self._entries[key] = (msg_id, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def claim(self, key: str, msg_id: int, ttl_seconds: float) -> Optional[int]:
+        """
+        키 선점
+        처음 보는 키면 msg_id를 기록하고 None, 이미 처리한 키면 처음 기록한 msg_id를 반환합니다.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+
+            expires_at = now + ttl_seconds
+            if self._conn is not None:
+                self._purge(now)
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._conn.execute(
+                        "SELECT msg_id, expires_at FROM webhook_seen WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and row[1] > now:
+                        self._conn.execute("COMMIT")
+                        self._remember(key, row[0], row[1])
+                        self.hits += 1
+                        return row[0]
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO webhook_seen (key, msg_id, expires_at) VALUES (?, ?, ?)",
+                        (key, msg_id, expires_at),
+                    )
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            self._remember(key, msg_id, expires_at)
+            self.misses += 1
+            return None
+
+    def update(self, key: str, msg_id: int) -> None:
+        """저장 중 msg_id가 바뀐 경우(중복 키 재시도) 기록 갱신"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries[key] = (msg_id, cached[1])
+            if self._conn is not None:
+                self._conn.execute("UPDATE webhook_seen SET msg_id = ? WHERE key = ?", (msg_id, key))
+
+    def forget(self, key: str) -> None:
+        """처리에 실패한 키 삭제 (재전송 시 다시 처리되도록)"""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM webhook_seen WHERE key = ?", (key,))
+
+    def _purge(self, now: float) -> None:
+        # self._lock을 잡은 상태에서 호출, 만료된 키를 최대 1분에 한 번 정리
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        self._conn.execute("DELETE FROM webhook_seen WHERE expires_at <= ?", (now,))
+        for key in [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "duplicate_rate": self.hits / total if total else 0.0,
+                "persistent": bool(self.path),
+            }
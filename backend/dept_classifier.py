@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from dept_index import normalize_rows
+from embedding_backend import embedding_identity
+
+
+# 분류기 종류
+# - centroid: 부서별 평균 임베딩과의 코사인 유사도를 온도 softmax로 확률화
+# - logreg: 다항 로지스틱 회귀 (NumPy 경사하강법, L2 정규화)
+CLASSIFIER_KINDS = ("centroid", "logreg")
+
+DEFAULT_CLASSIFIER_PATH = os.getenv("DEPT_CLASSIFIER_PATH", os.path.join("data", "dept_classifier.npz"))
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class DepartmentClassifier:
+    """
+    배정 이력으로 학습한 부서 분류기
+    문의 임베딩 x에 대해 logits = x @ W.T + b 한 번으로 부서별 확률을 계산하므로
+    부서 수백 개 규모에서도 1ms 이내로 예측합니다.
+    확률이 min_confidence 이상이면 에이전트가 LLM 없이 바로 배정하고, 낮으면 LLM에 넘깁니다.
+    """
+
+    def __init__(
+        self,
+        dept_ids: list,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        kind: str = "centroid",
+        model_name: str = "",
+        min_confidence: float = 0.9,
+    ) -> None:
+        if kind not in CLASSIFIER_KINDS:
+            raise ValueError(f"지원하지 않는 분류기입니다: {kind} (지원: {', '.join(CLASSIFIER_KINDS)})")
+        if weights.shape[0] != len(dept_ids) or bias.shape[0] != len(dept_ids):
+            raise ValueError("부서 수와 분류기 가중치 행 수가 일치하지 않습니다.")
+        self.dept_ids = list(dept_ids)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.kind = kind
+        self.model_name = model_name
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.counts = {"local": 0, "fallback": 0}
+
+    def __len__(self) -> int:
+        return len(self.dept_ids)
+
+    # ------------------------------------------------------------------
+    # 학습
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def fit(
+        cls,
+        embeddings: np.ndarray,
+        labels: list,
+        kind: str = "centroid",
+        temperature: float = 0.05,
+        l2: float = 1e-4,
+        epochs: int = 300,
+        learning_rate: float = 50.0,
+        **kwargs,
+    ) -> "DepartmentClassifier":
+        """
+        (임베딩, 부서 ID) 쌍으로 학습
+        여러 부서에 배정된 메시지는 부서마다 한 행씩 넣으면 됩니다.
+        """
+        embeddings = normalize_rows(embeddings)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(labels) or len(labels) == 0:
+            raise ValueError("학습 데이터가 비어 있거나 임베딩 수와 라벨 수가 일치하지 않습니다.")
+        dept_ids = list(dict.fromkeys(labels))
+        row_of = {dept_id: i for i, dept_id in enumerate(dept_ids)}
+        targets = np.array([row_of[label] for label in labels])
+
+        if kind == "centroid":
+            centroids = np.zeros((len(dept_ids), embeddings.shape[1]), dtype=np.float32)
+            np.add.at(centroids, targets, embeddings)
+            weights = normalize_rows(centroids) / temperature
+            bias = np.zeros(len(dept_ids), dtype=np.float32)
+        elif kind == "logreg":
+            weights, bias = cls._fit_logreg(embeddings, targets, len(dept_ids), l2, epochs, learning_rate)
+        else:
+            raise ValueError(f"지원하지 않는 분류기입니다: {kind} (지원: {', '.join(CLASSIFIER_KINDS)})")
+        return cls(dept_ids, weights, bias, kind=kind, **kwargs)
+
+    @staticmethod
+    def _fit_logreg(
+        embeddings: np.ndarray,
+        targets: np.ndarray,
+        n_classes: int,
+        l2: float,
+        epochs: int,
+        learning_rate: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """다항 로지스틱 회귀 (전체 배치 경사하강법)"""
+        n, dim = embeddings.shape
+        weights = np.zeros((n_classes, dim), dtype=np.float32)
+        bias = np.zeros(n_classes, dtype=np.float32)
+        one_hot = np.zeros((n, n_classes), dtype=np.float32)
+        one_hot[np.arange(n), targets] = 1.0
+        # 정규화된 임베딩은 내적 범위가 좁아 기울기가 작으므로 큰 학습률 사용
+        for _ in range(epochs):
+            probs = _softmax(embeddings @ weights.T + bias)
+            error = (probs - one_hot) / n
+            weights -= learning_rate * (error.T @ embeddings + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return weights, bias
+
+    # ------------------------------------------------------------------
+    # 예측
+    # ------------------------------------------------------------------
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """(n, dim) 임베딩 -> (n, 부서 수) 확률"""
+        queries = normalize_rows(np.atleast_2d(embeddings))
+        return _softmax(queries @ self.weights.T + self.bias)
+
+    def predict(self, embedding: np.ndarray) -> Tuple[object, float]:
+        """문의 임베딩 하나의 (부서 ID, 확률)"""
+        probs = self.predict_proba(embedding)[0]
+        row = int(np.argmax(probs))
+        return self.dept_ids[row], float(probs[row])
+
+    def record(self, path: str) -> None:
+        """처리 경로(local / fallback)별 건수 집계"""
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "local_rate": counts["local"] / total if total else 0.0,
+            "kind": self.kind,
+            "departments": len(self.dept_ids),
+            "min_confidence": self.min_confidence,
+        }
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+
+    def save(self, path: str = DEFAULT_CLASSIFIER_PATH) -> None:
+        """npz로 저장 (부서 ID는 원래 타입을 유지하도록 JSON으로 보관, 임시 파일에 쓴 뒤 교체)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        meta = {"kind": self.kind, "model_name": self.model_name, "dept_ids": self.dept_ids}
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, weights=self.weights, bias=self.bias, meta=json.dumps(meta, ensure_ascii=False))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CLASSIFIER_PATH, **kwargs) -> "DepartmentClassifier":
+        data = np.load(path)
+        meta = json.loads(str(data["meta"]))
+        return cls(
+            meta["dept_ids"],
+            data["weights"],
+            data["bias"],
+            kind=meta["kind"],
+            model_name=meta.get("model_name", ""),
+            **kwargs,
+        )
+
+
+# ============================================================================
+# 오프라인 평가
+# ============================================================================
+
+def evaluate(
+    classifier: DepartmentClassifier,
+    embeddings: np.ndarray,
+    true_dept_ids: List[list],
+    thresholds: Tuple[float, ...] = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95),
+) -> dict:
+    """
+    메시지별 정답 부서 목록에 대한 정확도 리포트
+    예측 부서가 정답 목록에 있으면 정답으로 보며, 확신도 기준별로 바로 배정되는 비율(coverage)과
+    그 중 정확도를 함께 계산합니다. 지연은 메시지 1건씩 예측한 시간입니다.
+    """
+    predictions = []
+    latencies = []
+    for embedding in embeddings:
+        started = time.perf_counter()
+        predictions.append(classifier.predict(embedding))
+        latencies.append(time.perf_counter() - started)
+
+    correct = np.array([dept_id in truth for (dept_id, _), truth in zip(predictions, true_dept_ids)])
+    confidences = np.array([prob for _, prob in predictions])
+    by_threshold = []
+    for threshold in thresholds:
+        covered = confidences >= threshold
+        by_threshold.append({
+            "min_confidence": threshold,
+            "coverage": float(covered.mean()) if len(covered) else 0.0,
+            "accuracy": float(correct[covered].mean()) if covered.any() else None,
+        })
+    return {
+        "kind": classifier.kind,
+        "samples": len(true_dept_ids),
+        "departments": len(classifier),
+        "accuracy": float(correct.mean()) if len(correct) else None,
+        "p50_us": float(np.percentile(latencies, 50) * 1e6) if latencies else 0.0,
+        "p95_us": float(np.percentile(latencies, 95) * 1e6) if latencies else 0.0,
+        "by_confidence": by_threshold,
+    }
+
+
+def fetch_assignment_history(page_size: int = 1000) -> dict:
+    """assigned_message + message에서 {msg_id(str): {"content": str, "dept_ids": [...]}} 조회"""
+    import agent
+
+    supabase = agent.get_supabase_client()
+    dept_ids_by_msg = {}
+    start = 0
+    while True:
+        response = (
+            supabase.table("assigned_message")
+            .select("msg_id, dept_id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = response.data or []
+        for row in rows:
+            dept_ids_by_msg.setdefault(str(row["msg_id"]), []).append(row["dept_id"])
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+    history = {}
+    msg_ids = list(dept_ids_by_msg)
+    for i in range(0, len(msg_ids), page_size):
+        contents = agent.get_message_contents(msg_ids[i:i + page_size])
+        for msg_id, content in contents.items():
+            if content:
+                history[msg_id] = {"content": content, "dept_ids": dept_ids_by_msg[msg_id]}
+    return history
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    배정 이력으로 분류기를 학습하고 평가 리포트 출력 후 저장
+    학습/평가는 메시지 단위로 나누며, 평가 후에는 전체 이력으로 다시 학습하여 저장합니다.
+
+    사용 예:
+        python dept_classifier.py
+        python dept_classifier.py --kind logreg --kind centroid --out data/dept_classifier.npz
+    """
+    parser = argparse.ArgumentParser(description="배정 이력 기반 부서 분류기 학습/평가")
+    parser.add_argument("--kind", action="append", choices=list(CLASSIFIER_KINDS),
+                        help="학습할 분류기 (여러 개면 평가 정확도가 가장 높은 것을 저장, 기본: 전체)")
+    parser.add_argument("--out", default=DEFAULT_CLASSIFIER_PATH)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--temperature", type=float, default=0.05, help="centroid 분류기의 softmax 온도")
+    parser.add_argument("--epochs", type=int, default=300, help="logreg 학습 반복 수")
+    parser.add_argument("--dry-run", action="store_true", help="평가만 하고 저장하지 않음")
+    args = parser.parse_args(argv)
+
+    import agent
+
+    history = fetch_assignment_history()
+    if not history:
+        print("배정 이력이 없습니다.")
+        sys.exit(1)
+    msg_ids = sorted(history)
+    print(f"배정 이력 {len(msg_ids)}건 임베딩 중...")
+    embeddings = agent.encode_texts([history[msg_id]["content"] for msg_id in msg_ids])
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(msg_ids))
+    n_test = int(len(msg_ids) * args.test_ratio)
+    test_rows, train_rows = order[:n_test], order[n_test:]
+
+    def expand(rows):
+        # 메시지 한 건이 여러 부서에 배정되었으면 부서마다 한 행
+        pairs = [(row, dept_id) for row in rows for dept_id in history[msg_ids[row]]["dept_ids"]]
+        return embeddings[[row for row, _ in pairs]], [dept_id for _, dept_id in pairs]
+
+    # 로드 시 현재 임베딩 모델/백엔드와 비교하도록 학습에 쓴 임베딩 식별자를 함께 저장
+    fit_params = {
+        "temperature": args.temperature,
+        "epochs": args.epochs,
+        "model_name": embedding_identity(agent.EMBEDDING_MODEL_NAME),
+    }
+    best_kind, best_accuracy = None, -1.0
+    for kind in args.kind or CLASSIFIER_KINDS:
+        train_x, train_y = expand(train_rows)
+        started = time.perf_counter()
+        classifier = DepartmentClassifier.fit(train_x, train_y, kind=kind, **fit_params)
+        report = {"train_seconds": time.perf_counter() - started, "train_samples": len(train_y)}
+        if n_test:
+            report.update(evaluate(
+                classifier,
+                embeddings[test_rows],
+                [history[msg_ids[row]]["dept_ids"] for row in test_rows],
+            ))
+        print(json.dumps(report, ensure_ascii=False))
+        accuracy = report.get("accuracy") or 0.0
+        if accuracy > best_accuracy:
+            best_kind, best_accuracy = kind, accuracy
+
+    if args.dry_run:
+        return
+    all_x, all_y = expand(np.arange(len(msg_ids)))
+    classifier = DepartmentClassifier.fit(all_x, all_y, kind=best_kind, **fit_params)
+    classifier.save(args.out)
+    print(f"부서 분류기 저장 완료: {args.out} ({best_kind}, 부서 {len(classifier)}개)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,370 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from retrieval import BACKEND_META_FILE, RetrievalBackend, backend_from_env
+from vector_store import VectorStore
+
+
+# 부서 인덱스 저장 경로 (data/ 는 .gitignore 대상)
+DEFAULT_INDEX_DIR = os.getenv("DEPT_INDEX_DIR", os.path.join("data", "dept_index"))
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.json"
+VERSION_FILE = "version"
+LOCK_FILE = ".lock"
+BACKEND_DIR = "backend"
+# 저장할 때마다 snapshots/<version>-<id>/ 에 새로 쓰고, version 파일("<version> <스냅샷 이름>")만 교체
+SNAPSHOTS_DIR = "snapshots"
+# 현재 스냅샷 외에 남겨 둘 이전 스냅샷 수 (교체 직전에 경로를 읽었거나 mmap 중인 워커용)
+KEEP_SNAPSHOTS = 2
+
+# 임베딩 저장 형식 (float32 / float16 / int8)과 로드 시 mmap 사용 여부
+STORAGE_DTYPE = os.getenv("DEPT_INDEX_DTYPE", "float32")
+USE_MMAP = os.getenv("DEPT_INDEX_MMAP", "true").lower() not in ("0", "false", "no")
+
+
+def department_text(dept: dict) -> str:
+    """부서 이름과 설명을 임베딩용 텍스트로 조합"""
+    return f"{dept['dept_name']} {dept['dept_desc']}"
+
+
+def content_hash(dept: dict) -> str:
+    """부서 이름 + 설명의 내용 해시 (변경 감지용)"""
+    return hashlib.sha256(department_text(dept).encode("utf-8")).hexdigest()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """행 단위 L2 정규화 (0 벡터는 그대로 둠)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        norm = np.linalg.norm(matrix)
+        return matrix / norm if norm > 0 else matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _read_pointer(index_dir: str) -> Optional[tuple]:
+    """version 파일 읽기 → (version, 스냅샷 이름 또는 None), 없거나 손상되면 None"""
+    try:
+        with open(os.path.join(index_dir, VERSION_FILE), "r", encoding="utf-8") as f:
+            parts = f.read().split()
+        return int(parts[0]), (parts[1] if len(parts) > 1 else None)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def snapshot_dir(index_dir: str = DEFAULT_INDEX_DIR) -> str:
+    """현재 version의 파일이 있는 디렉토리 (스냅샷 이전 형식으로 저장된 인덱스는 index_dir)"""
+    pointer = _read_pointer(index_dir)
+    if pointer is None or pointer[1] is None:
+        return index_dir
+    return os.path.join(index_dir, SNAPSHOTS_DIR, pointer[1])
+
+
+@contextmanager
+def index_write_lock(index_dir: str = DEFAULT_INDEX_DIR):
+    """
+    인덱스 디렉토리 쓰기 잠금 (index_dir/.lock 배타 잠금)
+    여러 프로세스가 같은 인덱스를 읽고-갱신하고-저장할 때 겹쳐서 한쪽 변경과 version이 사라지지 않도록 합니다.
+    같은 프로세스에서 중첩해 잡으면 교착되므로 호출하는 쪽에서 한 번만 잡아야 합니다.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(index_dir, LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _department_entry(dept: dict) -> dict:
+    """인덱스에 보관할 부서 정보 (내용 해시 포함)"""
+    return {
+        "dept_id": dept["dept_id"],
+        "dept_name": dept["dept_name"],
+        "dept_desc": dept["dept_desc"],
+        "content_hash": content_hash(dept),
+    }
+
+
+class DepartmentIndex:
+    """
+    부서 임베딩 인덱스
+    정규화된 임베딩 행렬(또는 디스크에서 mmap으로 연 VectorStore)과 행 번호 -> 부서 정보 매핑을 보관하며,
+    top-k 조회는 검색 백엔드(retrieval.py)에 맡깁니다.
+    기본은 전수 검색(exact)이고, 부서가 많은 카탈로그는 DEPT_INDEX_BACKEND=ivf|hnsw로 근사 검색을 씁니다.
+    """
+
+    def __init__(
+        self,
+        departments: List[dict],
+        embeddings,
+        model_name: str = "",
+        version: int = 0,
+        backend: Optional[RetrievalBackend] = None,
+    ) -> None:
+        # 디스크의 VectorStore는 정규화된 상태로 저장되어 있으므로 mmap 그대로 사용
+        if not isinstance(embeddings, VectorStore):
+            embeddings = normalize_rows(embeddings)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(departments):
+            raise ValueError("부서 수와 임베딩 행 수가 일치하지 않습니다.")
+        self.model_name = model_name
+        self.version = version
+        self._lock = threading.Lock()
+        # upsert끼리는 직렬화 (조회는 _lock으로 스냅샷만 잡음)
+        self._write_lock = threading.Lock()
+        self.departments = [_department_entry(dept) for dept in departments]
+        self.embeddings = embeddings
+        self.id_to_row = {dept["dept_id"]: i for i, dept in enumerate(self.departments)}
+        self.backend = backend if backend is not None else backend_from_env().build(embeddings)
+
+    def __len__(self) -> int:
+        return len(self.departments)
+
+    @property
+    def dim(self) -> int:
+        return int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        """임베딩이 차지하는 메모리 (샤드 메모리 예산 계산용, mmap이면 저장 형식 기준)"""
+        return int(self.embeddings.nbytes)
+
+    @classmethod
+    def build(
+        cls,
+        departments: List[dict],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        model_name: str = "",
+    ) -> "DepartmentIndex":
+        """부서 목록 전체를 임베딩하여 인덱스 생성"""
+        texts = [department_text(dept) for dept in departments]
+        embeddings = encode_fn(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+        return cls(departments, embeddings, model_name=model_name)
+
+    def upsert(
+        self,
+        departments: List[dict],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        batch_size: int = 32,
+        base_version: Optional[int] = None,
+    ) -> dict:
+        """
+        새로 추가되었거나 내용이 바뀐 부서만 배치로 임베딩하여 인덱스를 갱신
+        변경 여부는 dept_name + dept_desc 내용 해시로 판단하며,
+        변경이 있으면 version을 1 올립니다. (base_version이 더 크면 base_version + 1)
+
+        Returns:
+            {"added": int, "updated": int, "version": int}
+        """
+        with self._write_lock:
+            return self._upsert(departments, encode_fn, batch_size, base_version)
+
+    def _upsert(
+        self,
+        departments: List[dict],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        batch_size: int,
+        base_version: Optional[int],
+    ) -> dict:
+        with self._lock:
+            id_to_row = dict(self.id_to_row)
+            known_hashes = [dept["content_hash"] for dept in self.departments]
+
+        # 같은 dept_id가 여러 번 들어오면 마지막 값 기준
+        incoming = {}
+        for dept in departments:
+            incoming[dept["dept_id"]] = _department_entry(dept)
+
+        changed = [
+            entry for dept_id, entry in incoming.items()
+            if dept_id not in id_to_row or known_hashes[id_to_row[dept_id]] != entry["content_hash"]
+        ]
+        if not changed:
+            return {"added": 0, "updated": 0, "version": self.version}
+
+        # 변경분만 배치 단위로 임베딩
+        texts = [department_text(entry) for entry in changed]
+        batches = [
+            np.asarray(encode_fn(texts[i:i + batch_size]), dtype=np.float32)
+            for i in range(0, len(texts), batch_size)
+        ]
+        new_embeddings = normalize_rows(np.vstack(batches))
+
+        with self._lock:
+            departments_copy = list(self.departments)
+            id_to_row = dict(self.id_to_row)
+            embeddings = self.embeddings
+            backend = self.backend
+
+        if embeddings.shape[0] == 0:
+            embeddings = np.zeros((0, new_embeddings.shape[1]), dtype=np.float32)
+
+        appended_rows = []
+        updated = 0
+        # mmap/양자화된 저장소도 갱신 시에는 float32 사본으로 수정 (다음 저장 때 다시 변환)
+        embeddings = np.array(embeddings, dtype=np.float32)
+        for entry, vector in zip(changed, new_embeddings):
+            row = id_to_row.get(entry["dept_id"])
+            if row is None:
+                appended_rows.append(vector)
+                id_to_row[entry["dept_id"]] = len(departments_copy)
+                departments_copy.append(entry)
+            else:
+                embeddings[row] = vector
+                departments_copy[row] = entry
+                updated += 1
+        if appended_rows:
+            embeddings = np.vstack([embeddings, np.asarray(appended_rows, dtype=np.float32)])
+
+        # 색인 재구성은 락 밖에서 (upsert끼리는 _write_lock으로 직렬화되어 있음)
+        backend = backend.rebuild(embeddings)
+
+        with self._lock:
+            # 조회 쪽은 (backend, departments)를 한 번에 읽으므로 교체도 함께 수행
+            self.embeddings = embeddings
+            self.departments = departments_copy
+            self.id_to_row = id_to_row
+            self.backend = backend
+            self.version = max(self.version, base_version or 0) + 1
+            version = self.version
+
+        return {"added": len(appended_rows), "updated": updated, "version": version}
+
+    def search(self, query_embedding: np.ndarray, top_k: int) -> List[dict]:
+        """쿼리 임베딩과 가장 유사한 부서 top_k개 반환 (유사도 내림차순)"""
+        return self.search_many(np.atleast_2d(query_embedding), top_k)[0]
+
+    def search_many(self, query_embeddings: np.ndarray, top_k: int) -> List[List[dict]]:
+        """
+        여러 쿼리를 한 번에 검색
+        (n_queries, dim) 쿼리 행렬에 대해 쿼리별 top_k 부서 목록을 반환합니다.
+        """
+        with self._lock:
+            backend = self.backend
+            departments = self.departments
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if len(departments) == 0 or top_k <= 0 or queries.shape[0] == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        return [
+            [
+                {
+                    "dept_id": departments[row]["dept_id"],
+                    "dept_name": departments[row]["dept_name"],
+                    "dept_desc": departments[row]["dept_desc"],
+                    "similarity": float(score),
+                }
+                for row, score in zip(rows, scores)
+            ]
+            for rows, scores in backend.search(normalize_rows(queries), top_k)
+        ]
+
+    # ------------------------------------------------------------------
+    # 디스크 저장 / 로드
+    # ------------------------------------------------------------------
+
+    def save(self, index_dir: str = DEFAULT_INDEX_DIR) -> None:
+        """
+        인덱스를 새 스냅샷 디렉토리에 저장한 뒤 version 파일 하나만 교체
+        임베딩/scale/meta/검색 색인 파일을 제자리에서 하나씩 바꾸지 않으므로, 잠금 없이 읽는 워커도
+        서로 다른 저장의 파일을 섞어 읽지 않습니다.
+        """
+        with self._lock:
+            embeddings = self.embeddings
+            backend = self.backend
+            meta = {
+                "model_name": self.model_name,
+                "version": self.version,
+                "departments": self.departments,
+            }
+
+        name = f"{meta['version']}-{uuid.uuid4().hex[:8]}"
+        directory = os.path.join(index_dir, SNAPSHOTS_DIR, name)
+        os.makedirs(directory)
+
+        store = VectorStore.from_array(embeddings, STORAGE_DTYPE)
+        meta["dtype"] = store.dtype
+        store.save(os.path.join(directory, EMBEDDINGS_FILE))
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        backend.save(os.path.join(directory, BACKEND_DIR))
+
+        # 다른 워커는 version 파일을 보고 재로드 여부와 스냅샷 경로를 판단하므로 마지막에 한 번에 교체
+        version_path = os.path.join(index_dir, VERSION_FILE)
+        with open(f"{version_path}.{name}.tmp", "w", encoding="utf-8") as f:
+            f.write(f"{meta['version']} {name}")
+        os.replace(f"{version_path}.{name}.tmp", version_path)
+        self._prune_snapshots(index_dir, current=name)
+
+    @staticmethod
+    def _prune_snapshots(index_dir: str, current: str) -> None:
+        """현재 스냅샷과 최근 KEEP_SNAPSHOTS개를 남기고 이전 스냅샷 삭제"""
+        root = os.path.join(index_dir, SNAPSHOTS_DIR)
+        try:
+            names = [name for name in os.listdir(root) if name != current]
+            names.sort(key=lambda name: os.path.getmtime(os.path.join(root, name)), reverse=True)
+        except OSError:
+            return
+        for name in names[KEEP_SNAPSHOTS:]:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    @staticmethod
+    def read_version(index_dir: str = DEFAULT_INDEX_DIR) -> Optional[int]:
+        """디스크에 저장된 인덱스 버전 조회 (없으면 None)"""
+        pointer = _read_pointer(index_dir)
+        return pointer[0] if pointer is not None else None
+
+    @classmethod
+    def load(cls, index_dir: str = DEFAULT_INDEX_DIR) -> Optional["DepartmentIndex"]:
+        """디렉토리에서 현재 스냅샷의 인덱스 로드 (없거나 손상된 경우 None)"""
+        directory = snapshot_dir(index_dir)
+        emb_path = os.path.join(directory, EMBEDDINGS_FILE)
+        meta_path = os.path.join(directory, META_FILE)
+        if not (os.path.exists(emb_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            embeddings = VectorStore.load(emb_path, mmap=USE_MMAP)
+            return cls(
+                meta["departments"],
+                embeddings,
+                model_name=meta.get("model_name", ""),
+                version=meta.get("version", 0),
+                backend=cls._load_backend(os.path.join(directory, BACKEND_DIR), embeddings),
+            )
+        except Exception as e:
+            print(f"부서 인덱스 로드 실패 ({index_dir}): {e}")
+            return None
+
+    @staticmethod
+    def _load_backend(backend_dir: str, embeddings: VectorStore) -> RetrievalBackend:
+        """저장된 검색 색인 로드 (설정된 백엔드/색인 파라미터와 다르거나 없으면 새로 생성)"""
+        backend = backend_from_env()
+        try:
+            with open(os.path.join(backend_dir, BACKEND_META_FILE), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if backend.matches(saved) and backend.load(backend_dir, embeddings):
+                return backend
+        except (OSError, ValueError):
+            pass
+        return backend.build(embeddings)
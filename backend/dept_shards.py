@@ -0,0 +1,241 @@
+import os
+import re
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from dept_index import DepartmentIndex, DEFAULT_INDEX_DIR, index_write_lock
+
+
+# 회사(tenant)별 샤드는 DEFAULT_INDEX_DIR/tenants/<tenant>/ 에 저장
+TENANTS_DIR = "tenants"
+
+# tenant가 없는 전역 샤드 (기존 단일 인덱스와 같은 경로 사용)
+GLOBAL_SHARD = None
+
+
+def shard_name(tenant: Optional[str]) -> str:
+    """지표/응답용 샤드 이름"""
+    return "_global" if tenant is GLOBAL_SHARD else str(tenant)
+
+
+def shard_dir(tenant: Optional[str], root_dir: str = DEFAULT_INDEX_DIR) -> str:
+    """샤드 저장 경로 (tenant 값은 경로에 안전한 문자만 남기고 해시를 붙임)"""
+    if tenant is GLOBAL_SHARD:
+        return root_dir
+    tenant = str(tenant)
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", tenant)[:64]
+    digest = hashlib.sha1(tenant.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(root_dir, TENANTS_DIR, f"{safe}-{digest}")
+
+
+class ShardedDepartmentIndex:
+    """
+    회사(tenant)별 부서 인덱스 샤드 관리
+    샤드는 첫 조회 시 디스크에서 로드하고(없으면 build_fn으로 생성), 메모리 예산이나
+    최대 샤드 수를 넘으면 가장 오래 조회되지 않은 샤드부터 메모리에서 내립니다.
+    내려간 샤드는 디스크에 남아 있으므로 다음 조회 때 다시 로드됩니다.
+    다른 워커가 샤드를 갱신하면(디스크 version 증가) 조회 시 다시 로드합니다.
+    디스크 version 확인은 샤드마다 version_check_seconds에 한 번만 하므로 다른 워커의 갱신은 그만큼 늦게 반영됩니다.
+    샤드 생성/갱신은 샤드 디렉토리 파일 잠금으로 다른 프로세스와도 직렬화하고, 잠금을 잡은 뒤
+    디스크의 최신 샤드에 반영하므로 두 프로세스가 동시에 갱신해도 변경이나 version이 사라지지 않습니다.
+    """
+
+    def __init__(
+        self,
+        build_fn: Callable[[Optional[str]], DepartmentIndex],
+        model_name: str = "",
+        root_dir: str = DEFAULT_INDEX_DIR,
+        memory_budget_bytes: int = 512 * 1024 * 1024,
+        max_shards: int = 64,
+        version_check_seconds: float = 1.0,
+    ) -> None:
+        self.build_fn = build_fn
+        self.model_name = model_name
+        self.root_dir = root_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_shards = max_shards
+        self.version_check_seconds = version_check_seconds
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[Optional[str], DepartmentIndex]" = OrderedDict()
+        # 같은 샤드의 로드/생성/갱신은 샤드별 락으로 직렬화 (다른 샤드는 동시에 진행)
+        self._shard_locks = {}
+        # 이 프로세스가 파일 잠금을 잡고 있는 샤드 (잡은 스레드만 추가/삭제)
+        self._file_locked = set()
+        # 샤드별 마지막 디스크 version 확인 시각 (time.monotonic)
+        self._checked_at = {}
+        self.hits = 0
+        self.loads = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def _shard_lock(self, tenant: Optional[str]) -> threading.RLock:
+        with self._lock:
+            lock = self._shard_locks.get(tenant)
+            if lock is None:
+                lock = self._shard_locks[tenant] = threading.RLock()
+            return lock
+
+    @contextmanager
+    def _write_lock(self, tenant: Optional[str]):
+        """
+        샤드 쓰기 잠금 (프로세스 안에서는 샤드별 RLock, 프로세스 사이에서는 디렉토리 파일 잠금)
+        같은 스레드에서 중첩해 잡으면(upsert -> get -> rebuild) 파일 잠금은 한 번만 겁니다.
+        """
+        with self._shard_lock(tenant):
+            if tenant in self._file_locked:
+                yield
+                return
+            with index_write_lock(shard_dir(tenant, self.root_dir)):
+                self._file_locked.add(tenant)
+                try:
+                    yield
+                finally:
+                    self._file_locked.discard(tenant)
+
+    def _cached(self, tenant: Optional[str], refresh: bool = False) -> Optional[DepartmentIndex]:
+        """
+        메모리에 있고 디스크보다 오래되지 않은 샤드 반환 (LRU 순서 갱신)
+        디스크 version은 version_check_seconds에 한 번만 확인하며, refresh=True이면 바로 확인합니다.
+        """
+        now = time.monotonic()
+        with self._lock:
+            index = self._shards.get(tenant)
+            if index is None:
+                return None
+            self._shards.move_to_end(tenant)
+            if not refresh and now - self._checked_at.get(tenant, float("-inf")) < self.version_check_seconds:
+                return index
+        disk_version = DepartmentIndex.read_version(shard_dir(tenant, self.root_dir))
+        if disk_version is not None and disk_version > index.version:
+            return None
+        with self._lock:
+            self._checked_at[tenant] = now
+        return index
+
+    def get(self, tenant: Optional[str] = GLOBAL_SHARD, refresh: bool = False) -> DepartmentIndex:
+        """
+        샤드 반환 (메모리 -> 디스크 -> build_fn 순)
+        refresh=True이면 확인 주기와 관계없이 디스크 version을 확인합니다. (갱신 전 최신 샤드 확보용)
+        """
+        index = self._cached(tenant, refresh)
+        if index is not None:
+            with self._lock:
+                self.hits += 1
+            return index
+
+        with self._shard_lock(tenant):
+            index = self._cached(tenant, refresh=True)
+            if index is not None:
+                return index
+
+            with self._lock:
+                existing = self._shards.get(tenant)
+            # 부서가 없는 샤드도 저장된 그대로 사용 (다른 워커가 비운/새로 만든 샤드를 놓치지 않음)
+            index = DepartmentIndex.load(shard_dir(tenant, self.root_dir))
+            if (
+                index is not None
+                and index.model_name == self.model_name
+                and (existing is None or index.version >= existing.version)
+            ):
+                print(
+                    f"부서 인덱스 샤드 로드 완료 ({shard_name(tenant)}, "
+                    f"부서 수: {len(index)}, version: {index.version})"
+                )
+                with self._lock:
+                    self.loads += 1
+                self._install(tenant, index)
+                return index
+
+            if existing is not None and (index is None or index.model_name == self.model_name):
+                return existing
+            return self.rebuild(tenant)
+
+    def rebuild(self, tenant: Optional[str] = GLOBAL_SHARD) -> DepartmentIndex:
+        """build_fn으로 샤드를 새로 만들고 디스크에 저장"""
+        with self._write_lock(tenant):
+            directory = shard_dir(tenant, self.root_dir)
+            index = self.build_fn(tenant)
+            # 기존 샤드보다 version을 올려 다른 워커도 새 샤드를 로드하도록 함
+            with self._lock:
+                existing = self._shards.get(tenant)
+            previous_version = max(
+                existing.version if existing is not None else 0,
+                DepartmentIndex.read_version(directory) or 0,
+            )
+            index.version = previous_version + 1
+            index.save(directory)
+            with self._lock:
+                self.builds += 1
+            self._install(tenant, index)
+            return index
+
+    def upsert(
+        self,
+        tenant: Optional[str],
+        departments: List[dict],
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> dict:
+        """샤드에 추가/변경된 부서만 반영하고 디스크에 저장"""
+        with self._write_lock(tenant):
+            # 잠금을 잡은 뒤 조회하므로 다른 프로세스가 먼저 저장한 샤드를 다시 로드해 그 위에 반영
+            index = self.get(tenant, refresh=True)
+            directory = shard_dir(tenant, self.root_dir)
+            # 다음 version은 항상 디스크 version 기준 (메모리 샤드가 뒤처져 있어도 version이 겹치지 않음)
+            result = index.upsert(departments, encode_fn, base_version=DepartmentIndex.read_version(directory))
+            if result["added"] or result["updated"]:
+                index.save(directory)
+            # 부서가 늘어난 만큼 메모리 예산 다시 확인
+            self._install(tenant, index)
+            return result
+
+    def _install(self, tenant: Optional[str], index: DepartmentIndex) -> None:
+        with self._lock:
+            self._shards[tenant] = index
+            self._checked_at[tenant] = time.monotonic()
+            self._shards.move_to_end(tenant)
+            self._evict()
+
+    def _evict(self) -> None:
+        # self._lock을 잡은 상태에서 호출 (방금 사용한 샤드 하나는 항상 남김)
+        while len(self._shards) > 1 and (
+            len(self._shards) > self.max_shards
+            or self._memory_bytes() > self.memory_budget_bytes
+        ):
+            tenant, _ = self._shards.popitem(last=False)
+            self._checked_at.pop(tenant, None)
+            self.evictions += 1
+            print(f"부서 인덱스 샤드 메모리 해제: {shard_name(tenant)}")
+
+    def _memory_bytes(self) -> int:
+        return sum(index.nbytes for index in self._shards.values())
+
+    def evict(self, tenant: Optional[str] = GLOBAL_SHARD) -> None:
+        """샤드를 메모리에서 내림 (디스크 파일은 유지)"""
+        with self._lock:
+            self._checked_at.pop(tenant, None)
+            if self._shards.pop(tenant, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            shards = {
+                shard_name(tenant): {"departments": len(index), "version": index.version, "bytes": index.nbytes}
+                for tenant, index in self._shards.items()
+            }
+            return {
+                "loaded_shards": len(shards),
+                "max_shards": self.max_shards,
+                "memory_bytes": sum(shard["bytes"] for shard in shards.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "builds": self.builds,
+                "evictions": self.evictions,
+                "shards": shards,
+            }
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Optional
+
+import numpy as np
+
+
+# 임베딩 추론 백엔드
+# - torch: PyTorch SentenceTransformer (기본)
+# - onnx: ONNX Runtime (최초 1회 ONNX로 변환하여 EMBEDDING_ONNX_DIR에 저장)
+# - onnx-int8: ONNX 모델에 동적 int8 양자화를 적용 (CPU에서 가장 빠름, 약간의 오차)
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+EMBEDDING_MODEL_NAME = "nlpai-lab/KURE-v1"
+
+DEFAULT_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join("data", "onnx", "kure-v1"))
+
+# 양자화 설정 (CPU 명령어 집합에 맞게 선택: arm64 / avx2 / avx512 / avx512_vnni)
+DEFAULT_QUANTIZATION_CONFIG = os.getenv("EMBEDDING_ONNX_QUANT_CONFIG", "avx2")
+
+ONNX_MODEL_FILE = os.path.join("onnx", "model.onnx")
+
+ONNX_INSTALL_HINT = (
+    "ONNX 백엔드는 optimum/onnxruntime 패키지가 필요합니다. "
+    "`pip install \"sentence-transformers[onnx]\"`로 설치해주세요."
+)
+
+
+def get_embedding_backend() -> str:
+    """EMBEDDING_BACKEND 환경변수 (torch / onnx / onnx-int8)"""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"지원하지 않는 임베딩 백엔드입니다: {backend} (지원: {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return backend
+
+
+def embedding_identity(model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """
+    임베딩을 만드는 모델/백엔드 식별자 (문의 임베딩 캐시 키, 부서 분류기 호환 확인에 사용)
+    EMBEDDING_SERVICE_URL이 있으면 임베딩 서버 주소를, 없으면 EMBEDDING_BACKEND를 포함합니다.
+    """
+    service_url = os.getenv("EMBEDDING_SERVICE_URL")
+    if service_url:
+        return f"{model_name}|service|{service_url}"
+    return f"{model_name}|{get_embedding_backend()}"
+
+
+def quantized_file_name(quantization_config: str = DEFAULT_QUANTIZATION_CONFIG) -> str:
+    """export_dynamic_quantized_onnx_model이 만드는 파일 경로 (모델 디렉토리 기준)"""
+    return os.path.join("onnx", f"model_qint8_{quantization_config}.onnx")
+
+
+def _export_onnx(model_name: str, onnx_dir: str):
+    """허깅페이스 모델을 ONNX로 변환하여 onnx_dir에 저장하고 ONNX 모델 반환"""
+    from sentence_transformers import SentenceTransformer
+
+    print(f"{model_name} ONNX 변환 중... ({onnx_dir})")
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save(onnx_dir)
+    print("ONNX 변환 완료!")
+    return model
+
+
+def load_model(
+    model_name: str,
+    backend: str = "torch",
+    onnx_dir: str = DEFAULT_ONNX_DIR,
+    quantization_config: str = DEFAULT_QUANTIZATION_CONFIG,
+):
+    """
+    임베딩 모델 로드
+    ONNX 백엔드는 onnx_dir에 변환된 모델이 없으면 최초 1회 변환(및 양자화)하여 저장하고,
+    이후에는 저장된 파일을 바로 로드합니다.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("sentence-transformers 패키지가 필요합니다. `pip install sentence-transformers`로 설치해주세요.")
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"지원하지 않는 임베딩 백엔드입니다: {backend} (지원: {', '.join(EMBEDDING_BACKENDS)})"
+        )
+
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        raise ImportError(ONNX_INSTALL_HINT)
+
+    model = None
+    if not os.path.exists(os.path.join(onnx_dir, ONNX_MODEL_FILE)):
+        model = _export_onnx(model_name, onnx_dir)
+
+    if backend == "onnx":
+        if model is not None:
+            return model
+        return SentenceTransformer(onnx_dir, backend="onnx", model_kwargs={"file_name": ONNX_MODEL_FILE})
+
+    # onnx-int8
+    file_name = quantized_file_name(quantization_config)
+    if not os.path.exists(os.path.join(onnx_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        if model is None:
+            model = SentenceTransformer(onnx_dir, backend="onnx", model_kwargs={"file_name": ONNX_MODEL_FILE})
+        print(f"ONNX 동적 int8 양자화 중... ({quantization_config})")
+        export_dynamic_quantized_onnx_model(model, quantization_config, onnx_dir)
+        print("양자화 완료!")
+    return SentenceTransformer(onnx_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+# ============================================================================
+# 백엔드 비교 리포트
+# ============================================================================
+
+# 비교용 문장 (실제 문의와 비슷한 길이/형태)
+SAMPLE_TEXTS = [
+    "안녕하세요",
+    "급여 명세서가 아직 안 나왔는데 언제 확인할 수 있나요?",
+    "제품을 받았는데 포장이 찢어져 있고 안쪽 부품 하나가 깨져 있었습니다. 교환 가능할까요?",
+    "로그인하려고 하면 계속 비밀번호가 틀렸다고 나오는데 비밀번호 재설정 메일도 오지 않아요.",
+    "지난달 결제 내역에 같은 금액이 두 번 청구되어 있어서 환불 부탁드립니다.",
+    "배송 조회를 해보니 일주일째 같은 지역 물류센터에 머물러 있다고 나옵니다.",
+    "법인 계약서 갱신 관련해서 담당자분과 통화하고 싶습니다.",
+    "감사합니다 좋은 하루 보내세요",
+]
+
+
+def _percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+
+def compare_backends(
+    model_name: str,
+    backends: tuple = EMBEDDING_BACKENDS,
+    texts: Optional[List[str]] = None,
+    batch_size: int = 32,
+    repeats: int = 20,
+    onnx_dir: str = DEFAULT_ONNX_DIR,
+    quantization_config: str = DEFAULT_QUANTIZATION_CONFIG,
+) -> List[dict]:
+    """
+    백엔드별 로드 시간, 문장 1개 지연(p50/p95), 배치 처리량, torch 대비 코사인 유사도 비교
+    첫 번째 백엔드의 임베딩을 기준으로 코사인 유사도를 계산합니다.
+    """
+    texts = texts or SAMPLE_TEXTS
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    reference = None
+    reports = []
+
+    for backend in backends:
+        started = time.perf_counter()
+        model = load_model(model_name, backend, onnx_dir=onnx_dir, quantization_config=quantization_config)
+        load_seconds = time.perf_counter() - started
+
+        # 첫 호출(세션/스레드 풀 초기화)은 측정에서 제외
+        model.encode(texts[:1], normalize_embeddings=True)
+
+        single = []
+        for i in range(repeats):
+            started = time.perf_counter()
+            model.encode([texts[i % len(texts)]], normalize_embeddings=True)
+            single.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        model.encode(batch, batch_size=batch_size, normalize_embeddings=True)
+        batch_seconds = time.perf_counter() - started
+
+        embeddings = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        if reference is None:
+            reference = embeddings
+        cosine = np.sum(reference * embeddings, axis=1)
+
+        reports.append({
+            "backend": backend,
+            "load_seconds": load_seconds,
+            "single_p50_ms": _percentile_ms(single, 50),
+            "single_p95_ms": _percentile_ms(single, 95),
+            "batch_texts_per_second": len(batch) / batch_seconds if batch_seconds > 0 else None,
+            "min_cosine_vs_reference": float(cosine.min()),
+            "mean_cosine_vs_reference": float(cosine.mean()),
+        })
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    사용 예:
+        python embedding_backend.py
+        python embedding_backend.py --backend torch --backend onnx-int8 --min-cosine 0.99
+    """
+    parser = argparse.ArgumentParser(description="임베딩 추론 백엔드 지연/처리량/정확도 비교")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backend", action="append", choices=list(EMBEDDING_BACKENDS),
+                        help="비교할 백엔드 (첫 번째가 기준, 기본: 전체)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="기준 백엔드와의 최소 코사인 유사도 (미달 시 종료 코드 1)")
+    args = parser.parse_args(argv)
+
+    reports = compare_backends(
+        args.model,
+        backends=tuple(args.backend or EMBEDDING_BACKENDS),
+        batch_size=args.batch_size,
+        repeats=args.repeats,
+    )
+    compatible = True
+    for report in reports:
+        report["compatible"] = report["min_cosine_vs_reference"] >= args.min_cosine
+        compatible = compatible and report["compatible"]
+        print(json.dumps(report, ensure_ascii=False))
+    if not compatible:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,232 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 문의 정규화 (유니코드 NFKC + 공백 정리)"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def query_cache_key(text: str, namespace: str = "") -> str:
+    """
+    정규화된 문의 텍스트의 해시
+    namespace(임베딩 모델/백엔드 식별자)를 함께 해시하여 모델이 바뀌면 이전 임베딩을 쓰지 않습니다.
+    """
+    return hashlib.sha256(f"{namespace}\x1f{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+class _DiskStore:
+    """메모리에서 밀려난 임베딩을 보관하는 SQLite 저장소"""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embedding ("
+            " key TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str, min_created_at: float) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, vector FROM query_embedding WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] < min_created_at:
+                self._conn.execute("DELETE FROM query_embedding WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[0], np.frombuffer(row[1], dtype=np.float32).copy()
+
+    def put(self, key: str, created_at: float, vector: np.ndarray) -> None:
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embedding (key, created_at, vector) VALUES (?, ?, ?)",
+                (key, created_at, blob),
+            )
+            self._writes += 1
+            # 일정 횟수마다 오래된 항목부터 정리
+            if self._writes % 256 == 0:
+                self._conn.execute(
+                    "DELETE FROM query_embedding WHERE key IN ("
+                    " SELECT key FROM query_embedding ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM query_embedding")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class QueryEmbeddingCache:
+    """
+    문의 임베딩 LRU 캐시
+    임베딩 모델/백엔드 식별자(namespace)와 정규화된 문의 텍스트의 해시를 키로 임베딩을 보관합니다.
+    디스크 파일을 다른 모델 설정과 공유하거나 모델을 바꿔 재시작해도 다른 모델의 임베딩을 돌려주지 않습니다.
+    max_entries를 넘으면 가장 오래 사용되지 않은 항목부터, ttl_seconds가 지나면 나이순으로 만료되며,
+    disk_path를 지정하면 메모리에서 밀려난 항목을 SQLite에 보관했다가 다시 올립니다.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100000,
+        namespace: str = "",
+    ) -> None:
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (created_at, embedding)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk = _DiskStore(disk_path, disk_max_entries) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """캐시된 임베딩 반환 (없거나 만료되었으면 None)"""
+        key = query_cache_key(text, self.namespace)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+        if self._disk is not None:
+            min_created_at = now - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+            stored = self._disk.get(key, min_created_at)
+            if stored is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    evicted = self._insert(key, stored[0], stored[1])
+                self._spill(evicted)
+                return stored[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, embedding: np.ndarray) -> None:
+        """임베딩 저장"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            evicted = self._insert(query_cache_key(text, self.namespace), time.time(), vector)
+        self._spill(evicted)
+
+    def _insert(self, key: str, created_at: float, vector: np.ndarray) -> list:
+        # self._lock을 잡은 상태에서 호출, 밀려난 항목 목록 반환
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted_key, entry = self._entries.popitem(last=False)
+            self.evictions += 1
+            evicted.append((evicted_key, entry))
+        return evicted
+
+    def _spill(self, evicted: list) -> None:
+        """밀려난 항목을 디스크에 보관 (락 밖에서 호출)"""
+        if self._disk is None:
+            return
+        for key, (created_at, vector) in evicted:
+            self._disk.put(key, created_at, vector)
+
+    def get_or_encode(
+        self,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        캐시에 없는 문의만 한 번의 배치로 인코딩하여 (len(texts), dim) 행렬 반환
+        같은 배치 안의 중복 문의도 한 번만 인코딩합니다.
+        """
+        results: List[Optional[np.ndarray]] = [self.get(text) for text in texts]
+
+        pending = OrderedDict()
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                pending.setdefault(normalize_query(text), []).append(i)
+
+        if pending:
+            normalized_texts = list(pending)
+            encoded = np.asarray(encode_fn(normalized_texts), dtype=np.float32)
+            for normalized, vector in zip(normalized_texts, encoded):
+                self.put(normalized, vector)
+                for i in pending[normalized]:
+                    results[i] = vector
+
+        return np.vstack(results) if results else np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_enabled": self._disk is not None,
+            }
@@ -0,0 +1,189 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class EmbeddingQueueFull(RuntimeError):
+    """인코딩 대기열이 가득 찬 경우"""
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingScheduler:
+    """
+    동시 인코딩 요청 마이크로 배칭
+    여러 스레드의 encode 요청을 대기열에 모았다가, 첫 요청 후 max_wait_ms가 지나거나
+    모인 문장 수가 max_batch에 도달하면 한 번의 배치 forward pass로 처리하고
+    요청별 Future에 결과 행을 나눠 돌려줍니다.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_wait_ms: float = 5.0,
+        max_batch: int = 32,
+        max_queue: int = 1000,
+    ) -> None:
+        self.encode_fn = encode_fn
+        self.max_wait_ms = max_wait_ms
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop = threading.Event()
+        self.requests = 0
+        self.completed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_encode_seconds = 0.0
+        # 배치 크기 분포 (1, 2-4, 5-8, 9-16, 17-32, 33+)
+        self.batch_size_histogram = {"1": 0, "2-4": 0, "5-8": 0, "9-16": 0, "17-32": 0, "33+": 0}
+        self._worker = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """인코딩 요청 등록 (Future 결과는 (len(texts), dim) 행렬)"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        if self._closed:
+            raise RuntimeError("임베딩 스케줄러가 종료되었습니다.")
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise EmbeddingQueueFull(f"임베딩 대기열이 가득 찼습니다. (max_queue={self.max_queue})")
+        with self._lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return request.future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """submit 후 결과를 기다림 (encode_fn과 같은 형태로 사용)"""
+        return self.submit(texts).result(timeout=timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        """첫 요청 이후 max_wait_ms 동안 max_batch개 문장까지 모음"""
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # 종료 신호: 모은 배치를 처리한 뒤 _run에서 남은 요청을 마저 처리하고 종료
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        # close() 이후에도 대기열이 빌 때까지 처리
+        while not (self._stop.is_set() and self._queue.empty()):
+            first = self._queue.get()
+            if first is None:
+                continue
+            batch = self._collect(first)
+            texts = [text for request in batch for text in request.texts]
+
+            started = time.perf_counter()
+            try:
+                embeddings = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for request in batch:
+                count = len(request.texts)
+                request.future.set_result(embeddings[offset:offset + count])
+                offset += count
+            self._record(batch, len(texts), started, finished)
+
+    def _record(self, batch: List[_Request], size: int, started: float, finished: float) -> None:
+        if size == 1:
+            bucket = "1"
+        elif size <= 4:
+            bucket = "2-4"
+        elif size <= 8:
+            bucket = "5-8"
+        elif size <= 16:
+            bucket = "9-16"
+        elif size <= 32:
+            bucket = "17-32"
+        else:
+            bucket = "33+"
+        with self._lock:
+            self.batches += 1
+            self.completed += len(batch)
+            self.batched_texts += size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.batch_size_histogram[bucket] += 1
+            self.total_wait_seconds += sum(started - request.enqueued_at for request in batch)
+            self.total_encode_seconds += finished - started
+
+    def close(self, timeout: float = 5.0) -> None:
+        """대기 중인 요청을 처리한 뒤 작업 스레드 종료"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        # 대기 중인 작업 스레드를 깨움 (대기열이 가득 차 있으면 작업 스레드가 처리 중이므로
+        # 비운 뒤 _stop을 보고 종료하며, 여기서 막히지 않음)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._worker.join(timeout=timeout)
+        if not self._worker.is_alive():
+            # 종료 직전 submit과 경합해 남은 요청은 실패 처리
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    request.future.set_exception(RuntimeError("임베딩 스케줄러가 종료되었습니다."))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "max_queue": self.max_queue,
+                "max_wait_ms": self.max_wait_ms,
+                "max_batch": self.max_batch,
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "batches": self.batches,
+                "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "batch_size_histogram": dict(self.batch_size_histogram),
+                "avg_queue_wait_ms": self.total_wait_seconds * 1000 / self.completed if self.completed else 0.0,
+                "avg_encode_ms": self.total_encode_seconds * 1000 / self.batches if self.batches else 0.0,
+            }
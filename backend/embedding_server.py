@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import threading
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_backend import EMBEDDING_MODEL_NAME, get_embedding_backend, load_model
+from embedding_scheduler import EmbeddingScheduler, EmbeddingQueueFull
+
+
+# 환경변수 로드
+load_dotenv()
+
+# 응답 본문은 float32 little-endian 행렬 바이트, 크기는 헤더로 전달
+ROWS_HEADER = "X-Embedding-Rows"
+DIM_HEADER = "X-Embedding-Dim"
+
+
+# ============================================================================
+# 서버
+# ============================================================================
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    """
+    POST /encode  {"texts": [...]} -> 정규화된 float32 임베딩 행렬 (바이너리)
+    GET  /health
+    GET  /metrics -> 배칭 스케줄러 지표
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "success", "model": EMBEDDING_MODEL_NAME, "dim": self.server.dim})
+        elif self.path == "/metrics":
+            self._send_json(200, {"status": "success", "data": self.server.scheduler.stats()})
+        else:
+            self._send_json(404, {"status": "error", "message": "없는 경로입니다."})
+
+    def do_POST(self) -> None:
+        if self.path != "/encode":
+            self._send_json(404, {"status": "error", "message": "없는 경로입니다."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            texts = json.loads(self.rfile.read(length) or b"{}").get("texts")
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                self._send_json(400, {"status": "error", "message": "texts 문자열 목록이 필요합니다."})
+                return
+            embeddings = self.server.scheduler.encode(texts)
+        except EmbeddingQueueFull as e:
+            self._send_json(503, {"status": "error", "message": str(e)})
+            return
+        except Exception as e:
+            print(f"[ERROR] 임베딩 서버 인코딩 오류: {e}")
+            self._send_json(500, {"status": "error", "message": f"인코딩 실패: {str(e)}"})
+            return
+
+        if texts:
+            embeddings = np.ascontiguousarray(embeddings, dtype="<f4").reshape(len(texts), -1)
+        else:
+            embeddings = np.zeros((0, self.server.dim), dtype="<f4")
+        body = embeddings.tobytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(ROWS_HEADER, str(embeddings.shape[0]))
+        self.send_header(DIM_HEADER, str(embeddings.shape[1]))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        # 요청마다 로그를 남기지 않음 (Unix 소켓은 client_address도 없음)
+        pass
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    # 여러 워커가 동시에 연결하므로 listen 대기열을 넉넉히 (기본 5)
+    request_queue_size = 128
+
+
+class _UnixHTTPServer(_TCPHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self) -> None:
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def create_server(
+    scheduler: EmbeddingScheduler,
+    dim: int,
+    host: str = "127.0.0.1",
+    port: int = 8100,
+    socket_path: Optional[str] = None,
+) -> ThreadingHTTPServer:
+    """임베딩 HTTP 서버 생성 (socket_path가 있으면 Unix 소켓, 없으면 TCP)"""
+    if socket_path:
+        server = _UnixHTTPServer(socket_path, _EmbeddingHandler)
+    else:
+        server = _TCPHTTPServer((host, port), _EmbeddingHandler)
+    server.daemon_threads = True
+    server.scheduler = scheduler
+    server.dim = dim
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    사용 예:
+        python embedding_server.py --socket /tmp/kure.sock
+        python embedding_server.py --host 127.0.0.1 --port 8100
+    API 워커는 EMBEDDING_SERVICE_URL=unix:///tmp/kure.sock (또는 http://127.0.0.1:8100)로 연결합니다.
+    """
+    parser = argparse.ArgumentParser(description="KURE-v1 임베딩 서버")
+    parser.add_argument("--host", default=os.getenv("EMBEDDING_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBEDDING_SERVER_PORT", "8100")))
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVER_SOCKET"), help="Unix 소켓 경로")
+    args = parser.parse_args(argv)
+
+    backend = get_embedding_backend()
+    print(f"KURE-v1 임베딩 모델을 로딩 중입니다... (backend: {backend})")
+    model = load_model(EMBEDDING_MODEL_NAME, backend)
+    model.encode(["워밍업 문장입니다."], normalize_embeddings=True)
+    print("모델 로딩 완료!")
+
+    def encode_texts(texts: List[str]) -> np.ndarray:
+        return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    scheduler = EmbeddingScheduler(
+        encode_texts,
+        max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5")),
+        max_batch=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+        max_queue=int(os.getenv("EMBEDDING_BATCH_MAX_QUEUE", "1000")),
+    )
+    server = create_server(
+        scheduler,
+        dim=model.get_sentence_embedding_dimension(),
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+    )
+    address = f"unix://{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f"임베딩 서버 시작: {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+# ============================================================================
+# 클라이언트
+# ============================================================================
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RemoteEmbeddingModel:
+    """
+    임베딩 서버 클라이언트
+    SentenceTransformer.encode와 같은 방식으로 호출할 수 있어 agent.py에서 모델 대신 사용합니다.
+    서버는 항상 L2 정규화된 임베딩을 반환합니다.
+
+    url:
+        unix:///tmp/kure.sock 또는 http://127.0.0.1:8100
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("unix", "http"):
+            raise ValueError(f"지원하지 않는 임베딩 서버 주소입니다: {url} (unix:// 또는 http://)")
+        self.url = url
+        self.timeout = timeout
+        self._socket_path = parsed.path if parsed.scheme == "unix" else None
+        self._host = parsed.hostname
+        self._port = parsed.port or 80
+        # 스레드마다 keep-alive 연결 하나씩 사용
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._socket_path:
+                connection = _UnixHTTPConnection(self._socket_path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> tuple:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                return response, response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                # 서버 재시작 등으로 끊긴 keep-alive 연결은 한 번만 다시 연결
+                connection.close()
+                self._local.connection = None
+                if attempt == 1:
+                    raise
+
+    def encode(
+        self,
+        sentences,
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        convert_to_numpy: bool = True,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        response, body = self._request("POST", "/encode", json.dumps({"texts": texts}).encode("utf-8"))
+        if response.status != 200:
+            try:
+                message = json.loads(body).get("message", "")
+            except ValueError:
+                message = body[:200].decode("utf-8", "replace")
+            raise RuntimeError(f"임베딩 서버 오류 ({response.status}): {message}")
+
+        rows = int(response.getheader(ROWS_HEADER, "0"))
+        dim = int(response.getheader(DIM_HEADER, "0"))
+        embeddings = np.frombuffer(body, dtype="<f4").reshape(rows, dim).astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+    def health(self) -> dict:
+        response, body = self._request("GET", "/health")
+        return json.loads(body)
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
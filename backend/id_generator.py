@@ -0,0 +1,171 @@
+import os
+import time
+import weakref
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# 비트 구성 (부호 비트 제외 63비트, Postgres int8에 들어감)
+# | 타임스탬프 41비트 (ID_EPOCH_MS 기준 ms, 약 69년) | 워커 ID 10비트 | 시퀀스 12비트 |
+# 2024-01-01 UTC 기준이라 기존 마이크로초 타임스탬프 msg_id(약 1.7e15)보다 항상 큼 (현재 약 3.7e17)
+ID_EPOCH_MS = 1704067200000
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+DEFAULT_WORKER_LOCK_DIR = os.getenv("MSG_ID_WORKER_LOCK_DIR", os.path.join("data", "id_workers"))
+
+# fork 후 자식에서 잠금 파일을 정리할 생성기 목록
+_generators: "weakref.WeakSet[SnowflakeGenerator]" = weakref.WeakSet()
+
+
+def claim_worker_id(lock_dir: str = DEFAULT_WORKER_LOCK_DIR) -> tuple:
+    """
+    같은 호스트의 다른 프로세스와 겹치지 않는 워커 ID 확보
+    lock_dir/<id>.lock 파일에 배타 잠금을 걸고 프로세스가 끝날 때까지 유지합니다.
+    (프로세스가 죽으면 OS가 잠금을 풀어 ID를 재사용)
+
+    Returns:
+        (워커 ID, 잠금 파일 객체)
+    """
+    if fcntl is None:
+        return os.getpid() & MAX_WORKER_ID, None
+    os.makedirs(lock_dir, exist_ok=True)
+    for worker_id in range(MAX_WORKER_ID + 1):
+        lock_file = open(os.path.join(lock_dir, f"{worker_id}.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return worker_id, lock_file
+    raise RuntimeError(f"사용 가능한 워커 ID가 없습니다. (최대 {MAX_WORKER_ID + 1}개)")
+
+
+class SnowflakeGenerator:
+    """
+    Snowflake 방식 64비트 ID 생성기
+    DB 조회 없이 (타임스탬프, 워커 ID, 시퀀스)로 ID를 만들며, 같은 워커에서는 항상 증가합니다.
+
+    - 스레드: 내부 잠금으로 같은 ms 안에서 시퀀스를 순서대로 발급합니다.
+    - 프로세스: 워커 ID를 프로세스마다 따로 확보하고(MSG_ID_WORKER_ID 또는 잠금 파일),
+      fork된 자식 프로세스는 부모의 잠금 파일을 닫고 다음 호출 때 새 워커 ID를 확보합니다.
+      여러 호스트에서 실행하면 호스트마다 다른 MSG_ID_WORKER_ID 범위를 지정하세요.
+    - 시계가 뒤로 가거나 1ms에 4096개를 넘게 발급하면 마지막 타임스탬프를 이어서 사용합니다.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None, lock_dir: str = DEFAULT_WORKER_LOCK_DIR) -> None:
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"워커 ID는 0~{MAX_WORKER_ID} 범위여야 합니다: {worker_id}")
+        self._fixed_worker_id = worker_id
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._worker_id: Optional[int] = None
+        self._lock_file = None
+        self._pid: Optional[int] = None
+        self._last_ms = -1
+        self._sequence = 0
+        self.issued = 0
+        _generators.add(self)
+
+    @property
+    def worker_id(self) -> int:
+        with self._lock:
+            self._ensure_worker()
+            return self._worker_id
+
+    def _ensure_worker(self) -> None:
+        # self._lock을 잡은 상태에서 호출, fork 이후에는 부모의 워커 ID/시퀀스를 이어 쓰지 않음
+        if self._pid == os.getpid():
+            return
+        if self._fixed_worker_id is not None:
+            self._worker_id = self._fixed_worker_id
+        else:
+            self._worker_id, self._lock_file = claim_worker_id(self.lock_dir)
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ensure_worker()
+            now_ms = int(time.time() * 1000) - ID_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # 시퀀스 소진: 다음 ms를 미리 사용 (단조 증가 유지)
+                self._last_ms += 1
+                self._sequence = 0
+            self.issued += 1
+            return (self._last_ms << (WORKER_ID_BITS + SEQUENCE_BITS)) | (self._worker_id << SEQUENCE_BITS) | self._sequence
+
+    def _after_fork_in_child(self) -> None:
+        """
+        fork된 자식에서 부모의 잠금 파일 fd를 닫음 (os.register_at_fork에서 호출)
+        flock 잠금은 fd를 공유하는 모든 프로세스가 닫아야 풀리므로, 자식이 fd를 들고 있으면
+        부모가 끝나도 워커 ID가 반환되지 않습니다. LOCK_UN은 부모의 잠금까지 풀기 때문에 닫기만 합니다.
+        """
+        # fork 시점에 다른 스레드가 잡고 있던 잠금은 자식에서 풀리지 않으므로 새로 만듦
+        self._lock = threading.Lock()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self._pid = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self._pid = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"worker_id": self._worker_id, "issued": self.issued}
+
+
+def parse_id(value: int) -> dict:
+    """ID를 (생성 시각, 워커 ID, 시퀀스)로 분해 (디버깅용)"""
+    return {
+        "timestamp_ms": (value >> (WORKER_ID_BITS + SEQUENCE_BITS)) + ID_EPOCH_MS,
+        "worker_id": (value >> SEQUENCE_BITS) & MAX_WORKER_ID,
+        "sequence": value & MAX_SEQUENCE,
+    }
+
+
+_default_generator: Optional[SnowflakeGenerator] = None
+_default_lock = threading.Lock()
+
+
+def _after_fork_in_child() -> None:
+    global _default_lock
+    _default_lock = threading.Lock()
+    for generator in list(_generators):
+        generator._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_id_generator() -> SnowflakeGenerator:
+    """프로세스 공용 ID 생성기 (MSG_ID_WORKER_ID가 있으면 해당 워커 ID 사용)"""
+    global _default_generator
+    with _default_lock:
+        if _default_generator is None:
+            worker_id = os.getenv("MSG_ID_WORKER_ID")
+            _default_generator = SnowflakeGenerator(int(worker_id) if worker_id else None)
+        return _default_generator
+
+
+def next_message_id() -> int:
+    return get_id_generator().next_id()
@@ -0,0 +1,299 @@
+import os
+import csv
+import sys
+import json
+import argparse
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from dept_index import normalize_rows
+
+
+DEFAULT_INTENT_GATE_PATH = os.getenv("INTENT_GATE_PATH", os.path.join("data", "intent_gate.npz"))
+
+# 오프라인 평가에서 비교할 margin 구간
+DEFAULT_MARGINS = (0.0, 0.02, 0.05, 0.08, 0.1, 0.15, 0.2, 0.3)
+
+
+# 인사/감사 등 도구가 필요 없는 대화 예시 (학습 파일이 없을 때의 기본값, 보정되지 않았으므로 평가 후 사용)
+DEFAULT_CHAT_EXAMPLES = [
+    "안녕하세요",
+    "안녕하세요~ 반갑습니다",
+    "감사합니다",
+    "고맙습니다",
+    "감사해요 좋은 하루 되세요",
+    "수고하세요",
+    "안녕히 계세요",
+    "네 알겠습니다",
+    "확인했습니다 감사합니다",
+    "좋은 하루 보내세요",
+]
+
+# 부서 처리가 필요한 업무 요청 예시
+DEFAULT_ASSIGN_EXAMPLES = [
+    "급여 관련 문의입니다",
+    "제품 불량이 발생했습니다",
+    "시스템 오류가 있어요",
+    "환불 문의드립니다",
+    "로그인이 안돼요",
+    "배송이 아직 도착하지 않았어요",
+    "결제가 두 번 되었습니다",
+    "주문을 취소하고 싶습니다",
+    "계정이 잠겨서 접속이 안 됩니다",
+    "교환 신청은 어떻게 하나요",
+]
+
+
+class IntentGate:
+    """
+    임베딩 기반 로컬 의도 분류기
+    문의 임베딩과 '일반 대화' / '업무 요청' 중심 벡터의 코사인 유사도 차이(margin)로
+    확실한 경우만 바로 분류하고, 애매한 구간은 LLM에 넘깁니다.
+
+    margin = sim(업무 요청) - sim(일반 대화)
+      margin >= assign_margin  -> "assign"
+      margin <= -chat_margin   -> "chat"
+      그 외                     -> "uncertain" (LLM 판단)
+    """
+
+    CHAT = "chat"
+    ASSIGN = "assign"
+    UNCERTAIN = "uncertain"
+
+    def __init__(
+        self,
+        chat_centroid: np.ndarray,
+        assign_centroid: np.ndarray,
+        chat_margin: float = 0.15,
+        assign_margin: float = 0.15,
+    ) -> None:
+        self.chat_centroid = normalize_rows(chat_centroid)
+        self.assign_centroid = normalize_rows(assign_centroid)
+        self.chat_margin = chat_margin
+        self.assign_margin = assign_margin
+        self._lock = threading.Lock()
+        self.counts = {"local_chat": 0, "local_assign": 0, "llm": 0}
+
+    @classmethod
+    def fit(
+        cls,
+        embeddings: np.ndarray,
+        labels: List[str],
+        **kwargs,
+    ) -> "IntentGate":
+        """라벨("chat"/"assign")이 붙은 임베딩으로 중심 벡터 학습"""
+        embeddings = normalize_rows(embeddings)
+        labels = np.asarray(labels)
+        if not np.any(labels == cls.CHAT) or not np.any(labels == cls.ASSIGN):
+            raise ValueError("chat / assign 라벨이 각각 1개 이상 필요합니다.")
+        chat_centroid = embeddings[labels == cls.CHAT].mean(axis=0)
+        assign_centroid = embeddings[labels == cls.ASSIGN].mean(axis=0)
+        return cls(chat_centroid, assign_centroid, **kwargs)
+
+    @classmethod
+    def from_examples(
+        cls,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        chat_examples: Optional[List[str]] = None,
+        assign_examples: Optional[List[str]] = None,
+        **kwargs,
+    ) -> "IntentGate":
+        """예시 문장을 임베딩하여 중심 벡터 생성"""
+        chat_examples = chat_examples or DEFAULT_CHAT_EXAMPLES
+        assign_examples = assign_examples or DEFAULT_ASSIGN_EXAMPLES
+        embeddings = encode_fn(chat_examples + assign_examples)
+        labels = [cls.CHAT] * len(chat_examples) + [cls.ASSIGN] * len(assign_examples)
+        return cls.fit(embeddings, labels, **kwargs)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                chat_centroid=self.chat_centroid,
+                assign_centroid=self.assign_centroid,
+            )
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "IntentGate":
+        data = np.load(path)
+        return cls(data["chat_centroid"], data["assign_centroid"], **kwargs)
+
+    def classify(self, embedding: np.ndarray) -> Tuple[str, float]:
+        """문의 임베딩을 분류하여 (label, margin) 반환"""
+        query = normalize_rows(embedding)
+        margin = float(query @ self.assign_centroid - query @ self.chat_centroid)
+        if margin >= self.assign_margin:
+            label = self.ASSIGN
+        elif margin <= -self.chat_margin:
+            label = self.CHAT
+        else:
+            label = self.UNCERTAIN
+        return label, margin
+
+    def record(self, path: str) -> None:
+        """처리 경로(local_chat / local_assign / llm)별 건수 집계"""
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "local_rate": (counts["local_chat"] + counts["local_assign"]) / total if total else 0.0,
+            "chat_margin": self.chat_margin,
+            "assign_margin": self.assign_margin,
+        }
+
+
+# ============================================================================
+# 오프라인 학습 / 평가
+# ============================================================================
+
+def evaluate(
+    gate: IntentGate,
+    embeddings: np.ndarray,
+    labels: List[str],
+    margins: Tuple[float, ...] = DEFAULT_MARGINS,
+) -> dict:
+    """
+    라벨("chat"/"assign")에 대한 margin 기준별 리포트
+    chat 쪽은 margin <= -기준, assign 쪽은 margin >= 기준인 문의가 LLM 없이 처리되며,
+    각각 처리 비율(coverage)과 그 중 라벨과 일치한 비율(precision)을 계산합니다.
+    """
+    queries = normalize_rows(embeddings)
+    scores = queries @ gate.assign_centroid - queries @ gate.chat_centroid
+    labels = np.asarray(labels)
+    by_margin = []
+    for margin in margins:
+        row = {"margin": margin}
+        for label, covered in ((IntentGate.CHAT, scores <= -margin), (IntentGate.ASSIGN, scores >= margin)):
+            row[f"{label}_coverage"] = float(covered.mean()) if len(covered) else 0.0
+            row[f"{label}_precision"] = float((labels[covered] == label).mean()) if covered.any() else None
+        by_margin.append(row)
+    return {
+        "samples": len(labels),
+        "chat_samples": int((labels == IntentGate.CHAT).sum()),
+        "assign_samples": int((labels == IntentGate.ASSIGN).sum()),
+        "by_margin": by_margin,
+    }
+
+
+def recommend_margins(report: dict, min_precision: float = 0.98) -> dict:
+    """
+    precision이 min_precision 이상인 가장 작은 margin (chat/assign 각각, 없으면 None)
+    margin이 작을수록 LLM을 생략하는 문의가 많아집니다.
+    """
+    recommended = {"chat_margin": None, "assign_margin": None}
+    for label in (IntentGate.CHAT, IntentGate.ASSIGN):
+        for row in sorted(report["by_margin"], key=lambda row: row["margin"]):
+            precision = row[f"{label}_precision"]
+            if precision is not None and precision >= min_precision:
+                recommended[f"{label}_margin"] = row["margin"]
+                break
+    return recommended
+
+
+def load_labeled_csv(path: str) -> Tuple[List[str], List[str]]:
+    """text, label(chat/assign) 컬럼의 CSV 로드"""
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            label = (row.get("label") or "").strip().lower()
+            text = (row.get("text") or "").strip()
+            if text and label in (IntentGate.CHAT, IntentGate.ASSIGN):
+                texts.append(text)
+                labels.append(label)
+    return texts, labels
+
+
+def fetch_intent_history(page_size: int = 1000) -> Tuple[List[str], List[str]]:
+    """
+    message + assigned_message에서 (문의, 라벨) 조회
+    부서에 배정된 메시지는 assign, 배정되지 않은 메시지는 LLM이 일반 대화로 본 것으로 보고 chat 라벨을 붙입니다.
+    (배정 실패/대기 중인 메시지도 chat에 섞이므로 정확한 라벨이 있으면 --csv를 사용)
+    """
+    import agent
+
+    supabase = agent.get_supabase_client()
+
+    def fetch_all(table: str, columns: str) -> list:
+        rows, start = [], 0
+        while True:
+            response = supabase.table(table).select(columns).range(start, start + page_size - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            start += page_size
+
+    assigned = {str(row["msg_id"]) for row in fetch_all("assigned_message", "msg_id")}
+    texts, labels = [], []
+    for row in fetch_all("message", "msg_id, content"):
+        if row.get("content"):
+            texts.append(row["content"])
+            labels.append(IntentGate.ASSIGN if str(row["msg_id"]) in assigned else IntentGate.CHAT)
+    return texts, labels
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    라벨이 붙은 문의로 의도 중심 벡터를 학습하고 margin 기준별 리포트 출력 후 저장
+    문의의 test-ratio만큼을 떼어 평가하고, 평가 후에는 전체 문의로 다시 학습하여 저장합니다.
+
+    사용 예:
+        python intent_gate.py --dry-run
+        python intent_gate.py --csv labeled.csv --min-precision 0.99 --out data/intent_gate.npz
+    """
+    parser = argparse.ArgumentParser(description="로컬 의도 분류기 학습/평가")
+    parser.add_argument("--csv", help="text, label(chat/assign) 컬럼의 CSV (기본: 배정 이력에서 라벨 생성)")
+    parser.add_argument("--out", default=DEFAULT_INTENT_GATE_PATH)
+    parser.add_argument("--test-ratio", type=float, default=0.2)
+    parser.add_argument("--margin", action="append", type=float, help="평가할 margin (기본: 0~0.3 구간)")
+    parser.add_argument("--min-precision", type=float, default=0.98, help="추천 margin의 최소 precision")
+    parser.add_argument("--dry-run", action="store_true", help="평가만 하고 저장하지 않음")
+    args = parser.parse_args(argv)
+
+    import agent
+
+    texts, labels = load_labeled_csv(args.csv) if args.csv else fetch_intent_history()
+    if IntentGate.CHAT not in labels or IntentGate.ASSIGN not in labels:
+        print("chat / assign 라벨이 각각 1건 이상 필요합니다.")
+        sys.exit(1)
+    print(f"문의 {len(texts)}건 임베딩 중...")
+    embeddings = agent.encode_texts(texts)
+    labels = np.asarray(labels)
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(texts))
+    n_test = int(len(texts) * args.test_ratio)
+    test_rows, train_rows = order[:n_test], order[n_test:]
+    margins = tuple(args.margin) if args.margin else DEFAULT_MARGINS
+
+    gate = IntentGate.fit(embeddings[train_rows], list(labels[train_rows]))
+    if n_test:
+        report = evaluate(gate, embeddings[test_rows], list(labels[test_rows]), margins)
+        report["recommended"] = recommend_margins(report, args.min_precision)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        recommended = report["recommended"]
+        if None not in recommended.values():
+            print(
+                f"INTENT_GATE_CHAT_MARGIN={recommended['chat_margin']} "
+                f"INTENT_GATE_ASSIGN_MARGIN={recommended['assign_margin']}"
+            )
+
+    if args.dry_run:
+        return
+    IntentGate.fit(embeddings, list(labels)).save(args.out)
+    print(f"의도 분류기 저장 완료: {args.out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
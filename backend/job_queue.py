@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import errno
+import random
+import socket
+import sqlite3
+import threading
+from typing import Optional
+
+
+DEFAULT_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join("data", "jobs.sqlite3"))
+
+
+class JobQueueFull(RuntimeError):
+    """배정 작업 대기열이 가득 찬 경우"""
+
+
+def current_owner() -> str:
+    """작업을 가져간 프로세스 식별자 (호스트명:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """
+    같은 호스트의 프로세스가 아직 살아 있는지 확인
+    다른 호스트의 작업은 판단할 수 없으므로 살아 있다고 보고 리스 만료를 기다립니다.
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class DurableJobQueue:
+    """
+    SQLite(WAL) 기반 배정 작업 대기열
+    작업은 등록 시점에 디스크에 기록되므로 프로세스가 죽어도 사라지지 않습니다.
+
+    - 최소 1회 전달: claim한 작업은 lease_until까지 해당 프로세스가 소유하며,
+      완료 전에 프로세스가 죽으면 리스가 만료되거나 재시작 시 recover()로 다시 대기열에 들어갑니다.
+    - 재시도: 실패한 작업은 retry_base_seconds * 2^(시도 횟수 - 1) (최대 retry_max_seconds, ±20% 지터) 뒤
+      다시 실행되며, max_attempts회 실패하면 failed로 남습니다.
+    - 배압: queued + running 작업이 max_depth 이상이면 enqueue가 JobQueueFull을 던집니다.
+      유입 제어로 미뤄 등록한 작업(아직 한 번도 실행하지 않았고 실행 시각 전인 작업)은 세지 않습니다.
+      (한 채널이 미룬 작업으로 대기열을 채워 다른 채널의 webhook까지 429를 받지 않도록, 재시도 대기 작업은 포함)
+
+    여러 프로세스가 같은 파일을 공유해도 되도록 상태 변경은 BEGIN IMMEDIATE 트랜잭션으로 처리합니다.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        path: str = DEFAULT_QUEUE_PATH,
+        max_depth: int = 1000,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2.0,
+        retry_max_seconds: float = 300.0,
+        lease_seconds: float = 300.0,
+    ) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = current_owner()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS assign_job ("
+            "job_id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_run_at REAL NOT NULL, "
+            "lease_until REAL, owner TEXT, result TEXT, error TEXT, "
+            "enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS assign_job_status ON assign_job (status, next_run_at)"
+        )
+
+    def _transaction(self):
+        # self._lock을 잡은 상태에서 사용, 다른 프로세스와의 경쟁을 막기 위해 쓰기 잠금을 먼저 획득
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def depth(self) -> int:
+        """아직 끝나지 않은 작업 수 (queued + running, 실행 시각 전인 미뤄진 작업 제외)"""
+        with self._lock:
+            return self._depth()
+
+    def _depth(self) -> int:
+        row = self._conn.execute(
+            "SELECT COUNT(*) FROM assign_job WHERE status = ? "
+            "OR (status = ? AND (attempts > 0 OR next_run_at <= ?))",
+            (self.RUNNING, self.QUEUED, time.time()),
+        ).fetchone()
+        return row[0]
+
+    def deferred(self) -> int:
+        """실행 시각을 기다리는 미뤄진 작업 수 (depth에 포함되지 않음)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM assign_job WHERE status = ? AND attempts = 0 AND next_run_at > ?",
+                (self.QUEUED, time.time()),
+            ).fetchone()
+        return row[0]
+
+    def has_capacity(self) -> bool:
+        return self.depth() < self.max_depth
+
+    def enqueue(self, job_id: str, payload: dict, delay_seconds: float = 0.0, force: bool = False) -> bool:
+        """
+        작업 등록 (delay_seconds 뒤부터 실행)
+        같은 job_id가 이미 대기/실행 중이면 새로 등록하지 않고 False, 끝난 작업이면 다시 등록합니다.
+        force=True이면 max_depth를 넘어도 등록합니다. (이미 저장된 메시지의 작업을 잃지 않기 위해 사용)
+
+        Raises:
+            JobQueueFull: 대기열이 max_depth에 도달한 경우 (force=False)
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._transaction()
+            try:
+                row = conn.execute("SELECT status FROM assign_job WHERE job_id = ?", (job_id,)).fetchone()
+                if row is not None and row["status"] in (self.QUEUED, self.RUNNING):
+                    conn.execute("COMMIT")
+                    return False
+                if not force and self._depth() >= self.max_depth:
+                    conn.execute("ROLLBACK")
+                    raise JobQueueFull(f"배정 작업 대기열이 가득 찼습니다. (max_depth={self.max_depth})")
+                conn.execute(
+                    "INSERT OR REPLACE INTO assign_job "
+                    "(job_id, payload, status, attempts, next_run_at, enqueued_at) VALUES (?, ?, ?, 0, ?, ?)",
+                    (job_id, json.dumps(payload, ensure_ascii=False), self.QUEUED, now + delay_seconds, now),
+                )
+                conn.execute("COMMIT")
+                return True
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+
+    def claim(self) -> Optional[dict]:
+        """
+        실행할 작업 하나를 가져와 running으로 표시 (없으면 None)
+        실행 시각이 된 queued 작업과, 리스가 만료된 running 작업(소유 프로세스가 죽은 경우)이 대상입니다.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._transaction()
+            try:
+                row = conn.execute(
+                    "SELECT job_id, payload, attempts, enqueued_at FROM assign_job "
+                    "WHERE (status = ? AND next_run_at <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY next_run_at LIMIT 1",
+                    (self.QUEUED, now, self.RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                attempts = row["attempts"] + 1
+                conn.execute(
+                    "UPDATE assign_job SET status = ?, attempts = ?, lease_until = ?, owner = ?, "
+                    "started_at = ?, finished_at = NULL WHERE job_id = ?",
+                    (self.RUNNING, attempts, now + self.lease_seconds, self.owner, now, row["job_id"]),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        return {
+            "job_id": row["job_id"],
+            "payload": json.loads(row["payload"]),
+            "attempts": attempts,
+            "enqueued_at": row["enqueued_at"],
+        }
+
+    def next_due_in(self) -> Optional[float]:
+        """다음 queued 작업 실행까지 남은 시간 (초, 없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_run_at) FROM assign_job WHERE status = ?", (self.QUEUED,)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def complete(self, job_id: str, result=None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE assign_job SET status = ?, result = ?, error = NULL, lease_until = NULL, "
+                "finished_at = ? WHERE job_id = ? AND owner = ?",
+                (self.DONE, json.dumps(result), time.time(), job_id, self.owner),
+            )
+
+    def backoff_seconds(self, attempts: int) -> float:
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def fail(self, job_id: str, attempts: int, error: str) -> Optional[float]:
+        """
+        실패 기록
+        재시도 횟수가 남았으면 백오프 후 다시 queued로 돌리고 대기 시간(초)을, 아니면 failed로 두고 None 반환
+        """
+        now = time.time()
+        with self._lock:
+            if attempts < self.max_attempts:
+                delay = self.backoff_seconds(attempts)
+                self._conn.execute(
+                    "UPDATE assign_job SET status = ?, error = ?, next_run_at = ?, lease_until = NULL, "
+                    "finished_at = ? WHERE job_id = ? AND owner = ?",
+                    (self.QUEUED, error, now + delay, now, job_id, self.owner),
+                )
+                return delay
+            self._conn.execute(
+                "UPDATE assign_job SET status = ?, error = ?, lease_until = NULL, finished_at = ? "
+                "WHERE job_id = ? AND owner = ?",
+                (self.FAILED, error, now, job_id, self.owner),
+            )
+            return None
+
+    def recover(self) -> int:
+        """
+        시작 시 중단된 작업 복구
+        이전에 이 호스트에서 실행되다 프로세스가 죽은 running 작업을 바로 다시 대기열에 넣습니다.
+        (다른 호스트의 작업은 리스가 만료되면 claim에서 다시 가져감)
+
+        Returns:
+            다시 대기열에 넣은 작업 수
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._transaction()
+            try:
+                rows = conn.execute(
+                    "SELECT job_id, owner FROM assign_job WHERE status = ?", (self.RUNNING,)
+                ).fetchall()
+                orphaned = [row["job_id"] for row in rows if not owner_alive(row["owner"]) or row["owner"] == self.owner]
+                conn.executemany(
+                    "UPDATE assign_job SET status = ?, next_run_at = ?, lease_until = NULL WHERE job_id = ?",
+                    [(self.QUEUED, now, job_id) for job_id in orphaned],
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        return len(orphaned)
+
+    def purge(self, older_than_seconds: float) -> int:
+        """끝난 지 older_than_seconds가 지난 done/failed 작업 삭제"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM assign_job WHERE status IN (?, ?) AND finished_at < ?",
+                (self.DONE, self.FAILED, time.time() - older_than_seconds),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """작업 상태 조회 (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM assign_job WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        queue_ms = run_ms = None
+        if row["started_at"] is not None:
+            queue_ms = (row["started_at"] - row["enqueued_at"]) * 1000
+            if row["finished_at"] is not None and row["status"] in (self.DONE, self.FAILED):
+                run_ms = (row["finished_at"] - row["started_at"]) * 1000
+        return {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "next_run_at": row["next_run_at"] if row["status"] == self.QUEUED else None,
+            "enqueued_at": row["enqueued_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "queue_ms": queue_ms,
+            "run_ms": run_ms,
+        }
+
+    def counts(self) -> dict:
+        """상태별 작업 수"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM assign_job GROUP BY status").fetchall()
+        counts = {self.QUEUED: 0, self.RUNNING: 0, self.DONE: 0, self.FAILED: 0}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,252 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional
+
+from job_queue import DurableJobQueue, JobQueueFull
+
+
+__all__ = ["JobManager", "JobQueueFull"]
+
+
+class JobManager:
+    """
+    백그라운드 배정 작업 관리자
+    webhook은 메시지를 저장한 뒤 작업을 디스크 대기열(DurableJobQueue)에 등록하고 바로 응답하며,
+    고정된 수의 작업 스레드가 대기열에서 작업을 꺼내 handler(payload)로 실행합니다.
+    handler가 예외를 던지면 대기열의 백오프 정책에 따라 재시도하고, 시작 시 이전 프로세스가
+    끝내지 못한 작업을 다시 실행합니다. 대기열이 가득 차면 등록을 거절(JobQueueFull)합니다.
+    단, force=True로 등록한 작업(이미 저장된 메시지)은 거절하지 않고, 대기열 파일 오류로 기록하지 못하면
+    메모리에 보관했다가 작업 스레드가 다시 등록합니다.
+    slot을 주면 작업 스레드는 slot()에 들어간 뒤 작업을 꺼냅니다. (동시 실행 한도를 기다리는 동안
+    리스가 흘러가 다른 작업 스레드가 같은 작업을 다시 가져가지 않도록, 자리를 잡은 뒤 claim)
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], object],
+        queue: DurableJobQueue,
+        workers: int = 4,
+        poll_interval: float = 1.0,
+        retention_seconds: float = 7 * 24 * 3600,
+        slot: Optional[Callable[[], ContextManager]] = None,
+    ) -> None:
+        self.handler = handler
+        self.slot = slot or nullcontext
+        self.queue = queue
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._last_purge = 0.0
+        self.counts = {
+            "submitted": 0, "rejected": 0, "forced": 0, "unqueued": 0,
+            "retried": 0, "done": 0, "failed": 0, "recovered": 0,
+        }
+        # 대기열에 기록하지 못한 작업 {job_id: (payload, 실행 시각)}
+        self._unqueued: "OrderedDict[str, tuple]" = OrderedDict()
+        self.total_queue_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.finished = 0
+
+        recovered = queue.recover()
+        if recovered:
+            print(f"[INFO] 중단된 배정 작업 {recovered}건을 다시 대기열에 넣었습니다.")
+        self.counts["recovered"] = recovered
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"assign-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def has_capacity(self) -> bool:
+        """새 작업을 받을 수 있는지 (메시지 저장 전에 부하를 덜어내는 용도)"""
+        if self.queue.has_capacity():
+            return True
+        with self._lock:
+            self.counts["rejected"] += 1
+        return False
+
+    def submit(self, job_id: str, payload: dict, delay_seconds: float = 0.0, force: bool = False) -> bool:
+        """
+        작업 등록 (대기열이 가득 차면 JobQueueFull, delay_seconds를 주면 그만큼 미뤄 실행)
+        같은 job_id가 이미 대기/실행 중이면 새로 등록하지 않고 False를 반환합니다.
+        force=True이면 대기열이 가득 차도 등록하고, 대기열 파일 오류가 나면 메모리에 보관했다가
+        다시 등록합니다. (예외를 던지지 않음, 메시지를 저장한 뒤 작업을 잃지 않기 위해 사용)
+        """
+        if self._closed:
+            raise RuntimeError("작업 관리자가 종료되었습니다.")
+        job_id = str(job_id)
+        try:
+            over_capacity = force and not self.queue.has_capacity()
+            created = self.queue.enqueue(job_id, payload, delay_seconds, force=force)
+        except JobQueueFull:
+            with self._lock:
+                self.counts["rejected"] += 1
+            raise
+        except Exception as e:
+            if not force:
+                raise
+            print(f"[ERROR] 배정 작업 등록 실패, 메모리에 보관 후 다시 등록합니다 (job_id: {job_id}): {e}")
+            with self._wakeup:
+                self._unqueued[job_id] = (payload, time.time() + delay_seconds)
+                self.counts["unqueued"] += 1
+            return True
+        with self._wakeup:
+            if created:
+                self.counts["submitted"] += 1
+                if over_capacity:
+                    self.counts["forced"] += 1
+            self._wakeup.notify()
+        return created
+
+    def _flush_unqueued(self) -> None:
+        # 메모리에 보관한 작업을 대기열에 다시 등록 (실패하면 남겨 두고 다음에 재시도)
+        with self._lock:
+            if not self._unqueued:
+                return
+            pending = list(self._unqueued.items())
+        now = time.time()
+        for job_id, (payload, run_at) in pending:
+            try:
+                self.queue.enqueue(job_id, payload, max(0.0, run_at - now), force=True)
+            except Exception as e:
+                print(f"[WARN] 보관 중인 배정 작업 재등록 실패 (job_id: {job_id}): {e}")
+                return
+            with self._lock:
+                self._unqueued.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """작업 상태 조회 (없으면 None, 대기열에 기록하지 못해 메모리에 보관 중이면 status: unqueued)"""
+        job_id = str(job_id)
+        with self._lock:
+            unqueued = job_id in self._unqueued
+        if unqueued:
+            return {"job_id": job_id, "status": "unqueued"}
+        return self.queue.get(job_id)
+
+    def retry_after(self) -> int:
+        """대기열이 찼을 때 클라이언트에 알려 줄 재시도 대기 시간 (초, 1~60)"""
+        with self._lock:
+            avg_run = self.total_run_seconds / self.finished if self.finished else 1.0
+        estimate = self.queue.depth() * avg_run / max(1, self.workers)
+        return int(min(60, max(1, math.ceil(estimate))))
+
+    def _wait(self) -> None:
+        # 다음 재시도 시각 또는 poll_interval까지 대기 (다른 프로세스가 넣은 작업/만료된 리스도 확인)
+        due_in = self.queue.next_due_in()
+        timeout = self.poll_interval if due_in is None else min(self.poll_interval, due_in)
+        with self._wakeup:
+            if not self._closed:
+                self._wakeup.wait(timeout)
+
+    def _purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < 3600:
+                return
+            self._last_purge = now
+        removed = self.queue.purge(self.retention_seconds)
+        if removed:
+            print(f"[INFO] 오래된 배정 작업 {removed}건 삭제")
+
+    def _run(self) -> None:
+        # 대기열(SQLite) 오류로 작업 스레드가 죽지 않도록 한 단계씩 보호
+        # (complete/fail 기록에 실패한 작업은 running으로 남아 리스가 만료되면 다시 실행됨)
+        while not self._closed:
+            try:
+                self._flush_unqueued()
+                with self.slot():
+                    job = self.queue.claim()
+                    if job is not None:
+                        self._execute(job)
+                if job is None:
+                    self._purge()
+                    self._wait()
+            except Exception as e:
+                print(f"[ERROR] 배정 작업 처리 실패: {e}")
+                self._pause()
+
+    def _pause(self) -> None:
+        # 오류 직후 바로 다시 시도하지 않도록 poll_interval만큼 대기 (종료 시 바로 깨어남)
+        with self._wakeup:
+            if not self._closed:
+                self._wakeup.wait(self.poll_interval)
+
+    def _execute(self, job: dict) -> None:
+        job_id = job["job_id"]
+        started_at = time.time()
+        try:
+            result = self.handler(job["payload"])
+        except Exception as e:
+            finished_at = time.time()
+            delay = self.queue.fail(job_id, job["attempts"], str(e))
+            if delay is None:
+                print(f"[ERROR] 배정 작업 실패 (job_id: {job_id}, 시도 {job['attempts']}회): {e}")
+            else:
+                print(f"[WARN] 배정 작업 실패, {delay:.1f}초 후 재시도 (job_id: {job_id}, 시도 {job['attempts']}회): {e}")
+            with self._lock:
+                self.counts["failed" if delay is None else "retried"] += 1
+                self._record(job, started_at, finished_at)
+            return
+        finished_at = time.time()
+        self.queue.complete(job_id, result)
+        with self._lock:
+            self.counts["done"] += 1
+            self._record(job, started_at, finished_at)
+
+    def _record(self, job: dict, started_at: float, finished_at: float) -> None:
+        # self._lock을 잡은 상태에서 호출 (대기 시간은 재시도 대기를 포함해 최초 등록 시점부터)
+        self.finished += 1
+        self.total_queue_seconds += started_at - job["enqueued_at"]
+        self.total_run_seconds += finished_at - started_at
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        실행 중인 작업이 끝날 때까지 기다린 뒤 작업 스레드 종료
+        남은 queued 작업은 디스크에 남아 다음 시작 시 이어서 처리됩니다.
+        """
+        if self._closed:
+            return
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        with self._lock:
+            unqueued = list(self._unqueued)
+        if unqueued:
+            # 메시지는 저장되어 있으므로 /assign-department/batch로 다시 배정할 수 있음
+            print(f"[WARN] 대기열에 등록하지 못한 배정 작업 {len(unqueued)}건이 남았습니다: {', '.join(unqueued)}")
+        if not any(thread.is_alive() for thread in self._threads):
+            self.queue.close()
+
+    def stats(self) -> dict:
+        queue_counts = self.queue.counts()
+        with self._lock:
+            counts = dict(self.counts)
+            finished = self.finished
+            queue_seconds = self.total_queue_seconds
+            run_seconds = self.total_run_seconds
+            unqueued = len(self._unqueued)
+        return {
+            **counts,
+            "queued": queue_counts[DurableJobQueue.QUEUED],
+            "deferred": self.queue.deferred(),
+            "unqueued_pending": unqueued,
+            "running": queue_counts[DurableJobQueue.RUNNING],
+            "stored_done": queue_counts[DurableJobQueue.DONE],
+            "stored_failed": queue_counts[DurableJobQueue.FAILED],
+            "workers": self.workers,
+            "max_depth": self.queue.max_depth,
+            "max_attempts": self.queue.max_attempts,
+            "avg_queue_ms": queue_seconds * 1000 / finished if finished else 0.0,
+            "avg_run_ms": run_seconds * 1000 / finished if finished else 0.0,
+        }
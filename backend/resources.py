@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _Resource:
+    """레지스트리에 등록된 리소스 한 개의 상태"""
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        closer: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        self.name = name
+        self.factory = factory
+        self.closer = closer
+        self.lock = threading.Lock()
+        self.value = None
+        self.initialized = False
+        self.build_count = 0
+        self.failure_count = 0
+        self.close_count = 0
+        self.last_build_seconds = None
+        self.last_built_at = None
+
+
+class ResourceRegistry:
+    """
+    무거운 리소스(모델, 외부 API 클라이언트 등)의 지연 초기화 레지스트리
+    리소스별 락으로 동시에 여러 스레드가 요청해도 factory는 한 번만 실행되며,
+    init/close로 수명 주기를 명시적으로 관리하고 생성 횟수를 집계합니다.
+    """
+
+    def __init__(self) -> None:
+        self._resources: Dict[str, _Resource] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        closer: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        """리소스 등록 (같은 이름으로 다시 등록하면 기존 값은 닫고 교체)"""
+        with self._lock:
+            previous = self._resources.get(name)
+            self._resources[name] = _Resource(name, factory, closer)
+        if previous is not None and previous.initialized:
+            self._close_resource(previous)
+
+    def _get_resource(self, name: str) -> _Resource:
+        resource = self._resources.get(name)
+        if resource is None:
+            raise KeyError(f"등록되지 않은 리소스입니다: {name}")
+        return resource
+
+    def get(self, name: str) -> Any:
+        """리소스 반환 (최초 호출 시 한 번만 생성)"""
+        resource = self._get_resource(name)
+        # 이미 초기화된 경우 락 없이 바로 반환
+        if resource.initialized:
+            return resource.value
+
+        with resource.lock:
+            if not resource.initialized:
+                started = time.perf_counter()
+                try:
+                    value = resource.factory()
+                except Exception:
+                    resource.failure_count += 1
+                    raise
+                resource.value = value
+                resource.build_count += 1
+                resource.last_build_seconds = time.perf_counter() - started
+                resource.last_built_at = time.time()
+                resource.initialized = True
+            return resource.value
+
+    def init(self, names: Optional[List[str]] = None) -> None:
+        """지정한 리소스(기본: 전체)를 미리 생성"""
+        for name in names or list(self._resources):
+            self.get(name)
+
+    def is_initialized(self, name: str) -> bool:
+        return self._get_resource(name).initialized
+
+    def _close_resource(self, resource: _Resource) -> None:
+        with resource.lock:
+            if not resource.initialized:
+                return
+            value = resource.value
+            resource.initialized = False
+            resource.value = None
+            resource.close_count += 1
+        if resource.closer is not None and value is not None:
+            try:
+                resource.closer(value)
+            except Exception as e:
+                print(f"리소스 종료 오류 ({resource.name}): {e}")
+
+    def close(self, name: Optional[str] = None) -> None:
+        """리소스 해제 (기본: 등록의 역순으로 전체 해제). 다음 get에서 다시 생성됩니다."""
+        if name is not None:
+            self._close_resource(self._get_resource(name))
+            return
+        for resource in reversed(list(self._resources.values())):
+            self._close_resource(resource)
+
+    def stats(self) -> Dict[str, dict]:
+        """리소스별 초기화 여부와 생성/실패/해제 횟수"""
+        return {
+            name: {
+                "initialized": resource.initialized,
+                "build_count": resource.build_count,
+                "failure_count": resource.failure_count,
+                "close_count": resource.close_count,
+                "last_build_seconds": resource.last_build_seconds,
+                "last_built_at": resource.last_built_at,
+            }
+            for name, resource in list(self._resources.items())
+        }
+
+
+# 프로세스 전역 레지스트리
+registry = ResourceRegistry()
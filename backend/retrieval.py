@@ -0,0 +1,441 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import VectorStore
+
+
+# (행 번호 배열, 유사도 배열) — 유사도 내림차순
+SearchResult = Tuple[np.ndarray, np.ndarray]
+
+BACKEND_META_FILE = "backend.json"
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """1차원 점수 배열에서 상위 k개의 위치를 점수 내림차순으로 반환"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class RetrievalBackend:
+    """
+    정규화된 임베딩 행렬에 대한 내적(=코사인) top-k 검색 백엔드 인터페이스
+    build로 색인을 만들고, search는 쿼리별 (행 번호, 유사도)를 반환합니다.
+    """
+
+    name = "base"
+    # 색인 구조와 무관한 검색 시점 파라미터 (저장된 색인을 재사용할 때 비교하지 않음)
+    search_params: Tuple[str, ...] = ()
+
+    def build(self, embeddings: np.ndarray) -> "RetrievalBackend":
+        raise NotImplementedError
+
+    def rebuild(self, embeddings: np.ndarray) -> "RetrievalBackend":
+        """임베딩이 바뀌었을 때 새 백엔드 반환 (기본: 같은 파라미터로 처음부터 생성)"""
+        return type(self)(**self.params()).build(embeddings)
+
+    def search(self, queries: np.ndarray, k: int) -> List[SearchResult]:
+        raise NotImplementedError
+
+    def params(self) -> dict:
+        return {}
+
+    def build_params(self) -> dict:
+        """색인 구조를 결정하는 파라미터 (search_params 제외)"""
+        return {key: value for key, value in self.params().items() if key not in self.search_params}
+
+    def matches(self, saved: dict) -> bool:
+        """저장된 backend.json({"name", "params"})이 이 백엔드로 재사용할 수 있는 색인인지 확인"""
+        if saved.get("name") != self.name:
+            return False
+        saved_params = saved.get("params") or {}
+        return {key: saved_params.get(key) for key in self.build_params()} == self.build_params()
+
+    def set_params(self, **params) -> None:
+        """검색 시점 파라미터(n_probe, ef_search 등) 변경"""
+        for key, value in params.items():
+            if key not in self.params():
+                raise ValueError(f"{self.name} 백엔드에 없는 파라미터입니다: {key}")
+            setattr(self, key, value)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, BACKEND_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "params": self.params()}, f)
+
+    def load(self, directory: str, embeddings: np.ndarray) -> bool:
+        """저장된 색인 로드 (없거나 맞지 않으면 False → 호출 측에서 build)"""
+        return False
+
+
+def _as_vectors(embeddings):
+    """VectorStore(float16/int8, mmap)는 그대로 두고 나머지는 float32 행렬로 변환"""
+    if isinstance(embeddings, VectorStore):
+        return embeddings
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class ExactBackend(RetrievalBackend):
+    """전수 검색: 행렬 곱 한 번 + argpartition (양자화된 VectorStore도 그대로 점수화)"""
+
+    name = "exact"
+
+    def __init__(self) -> None:
+        self.embeddings = VectorStore(np.zeros((0, 0), dtype=np.float32))
+
+    def build(self, embeddings) -> "ExactBackend":
+        embeddings = _as_vectors(embeddings)
+        self.embeddings = embeddings if isinstance(embeddings, VectorStore) else VectorStore(embeddings)
+        return self
+
+    def search(self, queries: np.ndarray, k: int) -> List[SearchResult]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.embeddings.shape[0] == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        scores = self.embeddings.score(queries)
+        results = []
+        for row_scores in scores:
+            top = _top_k(row_scores, k)
+            results.append((top, row_scores[top]))
+        return results
+
+    def load(self, directory: str, embeddings: np.ndarray) -> bool:
+        self.build(embeddings)
+        return True
+
+
+class IVFBackend(RetrievalBackend):
+    """
+    IVF (inverted file) 근사 검색 (NumPy 구현)
+    구면 k-means로 임베딩을 n_lists개 군집으로 나누고, 쿼리와 가까운 n_probe개 군집의 항목만 정확히 점수화합니다.
+    n_probe를 늘릴수록 recall이 오르고 지연이 늘어납니다.
+    """
+
+    name = "ivf"
+    search_params = ("n_probe",)
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        kmeans_iters: int = 15,
+        seed: int = 0,
+    ) -> None:
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.list_rows = np.zeros(0, dtype=np.int64)
+
+    def params(self) -> dict:
+        return {
+            "n_lists": self.n_lists,
+            "n_probe": self.n_probe,
+            "kmeans_iters": self.kmeans_iters,
+            "seed": self.seed,
+        }
+
+    def _train(self, embeddings: np.ndarray) -> np.ndarray:
+        n = embeddings.shape[0]
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(self.seed)
+        centroids = embeddings[rng.choice(n, size=n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assignments = np.argmax(embeddings @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, embeddings)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # 비어 있는 군집은 이전 중심을 유지
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def _assign(self, embeddings: np.ndarray) -> None:
+        assignments = np.argmax(embeddings @ self.centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.centroids.shape[0])
+        self.list_rows = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def build(self, embeddings, centroids: Optional[np.ndarray] = None) -> "IVFBackend":
+        # 후보 점수 계산은 VectorStore에서 필요한 행만 float32로 올려 수행
+        self.embeddings = _as_vectors(embeddings)
+        if self.embeddings.shape[0] == 0:
+            self.centroids = np.zeros((0, self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0), dtype=np.float32)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            self.list_rows = np.zeros(0, dtype=np.int64)
+            return self
+        dense = np.asarray(self.embeddings, dtype=np.float32)
+        self.centroids = centroids if centroids is not None else self._train(dense)
+        self._assign(dense)
+        return self
+
+    def rebuild(self, embeddings: np.ndarray) -> "IVFBackend":
+        """
+        증분 갱신용 재구성: 학습된 중심 벡터는 유지하고 목록만 다시 배정
+        (행 수가 크게 늘어 군집 수가 부족해지면 다시 학습)
+        """
+        backend = IVFBackend(**self.params())
+        n = len(embeddings)
+        target_lists = min(self.n_lists or max(1, int(np.sqrt(n))), n)
+        if self.centroids.shape[0] and self.centroids.shape[0] * 2 >= target_lists:
+            return backend.build(embeddings, centroids=self.centroids)
+        return backend.build(embeddings)
+
+    def search(self, queries: np.ndarray, k: int) -> List[SearchResult]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.embeddings.shape[0] == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        n_probe = max(1, min(self.n_probe, self.centroids.shape[0]))
+        centroid_scores = queries @ self.centroids.T
+        results = []
+        for query, scores in zip(queries, centroid_scores):
+            probes = _top_k(scores, n_probe)
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+            ])
+            candidate_scores = self.embeddings[candidates] @ query
+            top = _top_k(candidate_scores, k)
+            results.append((candidates[top], candidate_scores[top]))
+        return results
+
+    def save(self, directory: str) -> None:
+        super().save(directory)
+        with open(os.path.join(directory, "ivf.npz"), "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_offsets=self.list_offsets,
+                list_rows=self.list_rows,
+            )
+
+    def load(self, directory: str, embeddings: np.ndarray) -> bool:
+        path = os.path.join(directory, "ivf.npz")
+        if not os.path.exists(path):
+            return False
+        data = np.load(path)
+        if int(data["list_offsets"][-1]) != len(embeddings):
+            return False
+        self.embeddings = _as_vectors(embeddings)
+        self.centroids = data["centroids"]
+        self.list_offsets = data["list_offsets"]
+        self.list_rows = data["list_rows"]
+        return True
+
+
+class HNSWBackend(RetrievalBackend):
+    """
+    HNSW 그래프 근사 검색 (선택 의존성: hnswlib)
+    M/ef_construction은 색인 품질, ef_search는 검색 시 recall-지연 균형을 조절합니다.
+    """
+
+    name = "hnsw"
+    search_params = ("ef_search",)
+
+    def __init__(self, M: int = 16, ef_construction: int = 200, ef_search: int = 64) -> None:
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "HNSW 백엔드는 hnswlib 패키지가 필요합니다. `pip install hnswlib`로 설치해주세요."
+            )
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = None
+        self.count = 0
+
+    def params(self) -> dict:
+        return {"M": self.M, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+
+    def set_params(self, **params) -> None:
+        super().set_params(**params)
+        if self.index is not None:
+            self.index.set_ef(self.ef_search)
+
+    def build(self, embeddings: np.ndarray) -> "HNSWBackend":
+        import hnswlib
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.count = embeddings.shape[0]
+        if self.count == 0:
+            self.index = None
+            return self
+        self.index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+        self.index.init_index(max_elements=self.count, ef_construction=self.ef_construction, M=self.M)
+        self.index.add_items(embeddings, np.arange(self.count))
+        self.index.set_ef(self.ef_search)
+        return self
+
+    def search(self, queries: np.ndarray, k: int) -> List[SearchResult]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.index is None:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        k = min(k, self.count)
+        # ef는 build/load/set_params에서만 설정 (공유 색인을 검색마다 바꾸지 않음)
+        # hnswlib는 ef < k이면 max(ef, k)로 탐색하므로 k가 커도 결과 수는 보장됨
+        labels, distances = self.index.knn_query(queries, k=k)
+        # space="ip"의 거리는 1 - 내적
+        return [(rows.astype(np.int64), (1.0 - dists).astype(np.float32)) for rows, dists in zip(labels, distances)]
+
+    def save(self, directory: str) -> None:
+        super().save(directory)
+        if self.index is not None:
+            self.index.save_index(os.path.join(directory, "hnsw.bin"))
+
+    def load(self, directory: str, embeddings: np.ndarray) -> bool:
+        import hnswlib
+
+        path = os.path.join(directory, "hnsw.bin")
+        if not os.path.exists(path) or len(embeddings) == 0:
+            return False
+        index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+        index.load_index(path, max_elements=embeddings.shape[0])
+        if index.get_current_count() != embeddings.shape[0]:
+            return False
+        index.set_ef(self.ef_search)
+        self.index = index
+        self.count = embeddings.shape[0]
+        return True
+
+
+BACKENDS = {
+    ExactBackend.name: ExactBackend,
+    IVFBackend.name: IVFBackend,
+    HNSWBackend.name: HNSWBackend,
+}
+
+
+def create_backend(name: str = "exact", **params) -> RetrievalBackend:
+    """이름으로 검색 백엔드 생성 (exact / ivf / hnsw)"""
+    if name not in BACKENDS:
+        raise ValueError(f"지원하지 않는 검색 백엔드입니다: {name} (지원: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**params)
+
+
+def backend_from_env() -> RetrievalBackend:
+    """DEPT_INDEX_BACKEND / DEPT_INDEX_BACKEND_PARAMS(JSON) 환경변수로 백엔드 생성"""
+    name = os.getenv("DEPT_INDEX_BACKEND", "exact")
+    params = json.loads(os.getenv("DEPT_INDEX_BACKEND_PARAMS", "{}"))
+    return create_backend(name, **params)
+
+
+# ============================================================================
+# Recall 리포트
+# ============================================================================
+
+def recall_report(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    backend: RetrievalBackend,
+    k: int = 10,
+) -> dict:
+    """
+    전수 검색 대비 근사 검색의 recall@k와 쿼리당 지연 비교
+    웹훅처럼 쿼리가 하나씩 들어오는 상황을 가정하여 쿼리별로 따로 검색한 시간을 잽니다.
+    backend는 embeddings로 build된 상태여야 합니다.
+    """
+    exact = ExactBackend().build(embeddings)
+
+    started = time.perf_counter()
+    exact_results = [exact.search(query, k)[0] for query in queries]
+    exact_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ann_results = [backend.search(query, k)[0] for query in queries]
+    ann_seconds = time.perf_counter() - started
+
+    hits = 0
+    total = 0
+    for (exact_rows, _), (ann_rows, _) in zip(exact_results, ann_results):
+        hits += len(set(exact_rows.tolist()) & set(ann_rows.tolist()))
+        total += len(exact_rows)
+
+    n_queries = max(1, len(queries))
+    return {
+        "backend": backend.name,
+        "params": backend.params(),
+        "k": k,
+        "n_items": int(np.asarray(embeddings).shape[0]),
+        "n_queries": int(len(queries)),
+        "recall_at_k": hits / total if total else 1.0,
+        "exact_ms_per_query": exact_seconds * 1000 / n_queries,
+        "ann_ms_per_query": ann_seconds * 1000 / n_queries,
+        "speedup": exact_seconds / ann_seconds if ann_seconds > 0 else None,
+    }
+
+
+def _sample_queries(embeddings: np.ndarray, n_queries: int, noise: float, seed: int) -> np.ndarray:
+    """색인 항목에 잡음을 섞어 평가용 쿼리 생성"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(embeddings.shape[0], size=min(n_queries, embeddings.shape[0]), replace=False)
+    queries = embeddings[rows] + rng.normal(scale=noise, size=(len(rows), embeddings.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    사용 예:
+        python retrieval.py --index data/dept_index --backend ivf --param n_probe=1,4,16
+        python retrieval.py --random 50000 --backend hnsw --param ef_search=16,64,256
+    """
+    parser = argparse.ArgumentParser(description="검색 백엔드 recall/지연 리포트")
+    parser.add_argument("--index", help="embeddings.npy가 있는 부서 인덱스 디렉토리")
+    parser.add_argument("--random", type=int, default=0, help="인덱스 대신 사용할 임의 벡터 수")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--clusters", type=int, default=0, help="임의 벡터를 군집 구조로 생성할 때 군집 수")
+    parser.add_argument("--backend", default="ivf", choices=list(BACKENDS))
+    parser.add_argument("--param", action="append", default=[],
+                        help="검색 파라미터 스윕 (예: n_probe=1,4,16)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if args.index:
+        from dept_index import EMBEDDINGS_FILE, snapshot_dir
+        embeddings = VectorStore.load(os.path.join(snapshot_dir(args.index), EMBEDDINGS_FILE), mmap=False).to_float32()
+    else:
+        rng = np.random.default_rng(0)
+        n = args.random or 10000
+        embeddings = rng.normal(size=(n, args.dim)).astype(np.float32)
+        if args.clusters:
+            # 실제 부서/의도 임베딩처럼 주제별로 뭉친 분포
+            centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32) * 3
+            embeddings += centers[rng.integers(0, args.clusters, size=n)]
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    queries = _sample_queries(embeddings, args.queries, args.noise, seed=1)
+
+    started = time.perf_counter()
+    backend = create_backend(args.backend).build(embeddings)
+    print(f"{args.backend} 색인 생성: {time.perf_counter() - started:.2f}s (항목 수: {embeddings.shape[0]})")
+
+    sweeps = [{}]
+    for spec in args.param:
+        key, values = spec.split("=", 1)
+        sweeps = [{**sweep, key: int(value)} for sweep in sweeps for value in values.split(",")]
+
+    for sweep in sweeps:
+        backend.set_params(**sweep)
+        print(json.dumps(recall_report(embeddings, queries, backend, k=args.k), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
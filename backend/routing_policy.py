@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+
+# 직접 배정 기준
+# - off: 항상 LLM으로 부서 선택
+# - score: 1위 부서 유사도 >= min_score
+# - margin: 1위 - 2위 유사도 >= min_margin (후보가 1개면 1위 유사도를 margin으로 사용)
+# - prob: 후보 유사도의 softmax(similarity / temperature)에서 1위 확률 >= min_prob
+POLICY_MODES = ("off", "score", "margin", "prob")
+
+
+def softmax_top1(similarities: List[float], temperature: float) -> float:
+    """유사도 목록을 온도 softmax로 확률화했을 때 1위의 확률"""
+    scores = np.asarray(similarities, dtype=np.float64) / max(temperature, 1e-6)
+    scores = np.exp(scores - scores.max())
+    return float(scores.max() / scores.sum())
+
+
+def candidate_features(candidates: List[dict], temperature: float) -> dict:
+    """후보 부서 목록(유사도 내림차순)에서 정책 판단에 쓰는 값 계산"""
+    similarities = [float(dept["similarity"]) for dept in candidates]
+    top1 = similarities[0]
+    top2 = similarities[1] if len(similarities) > 1 else 0.0
+    return {
+        "top1_dept_id": candidates[0]["dept_id"],
+        "top1": top1,
+        "margin": top1 - top2,
+        "prob": softmax_top1(similarities, temperature),
+    }
+
+
+class ConfidencePolicy:
+    """
+    유사도 기반 직접 배정 정책
+    검색 결과의 1위 부서가 충분히 확실하면 부서 선택 LLM을 호출하지 않고 1위 부서에 바로 배정합니다.
+    애매한 경우만 LLM이 후보 중에서 고릅니다.
+
+    shadow_rate 비율만큼은 확실한 경우에도 LLM을 호출하고(배정은 LLM 결과),
+    정책 결정과 LLM 결정의 일치율을 집계합니다. 모든 결정은 log_path에 JSONL로 남길 수 있으며,
+    `python routing_policy.py --log ...`로 기준값별 직접 배정 비율/일치율을 확인합니다.
+    """
+
+    DIRECT = "direct"
+    SHADOW = "shadow"
+    LLM = "llm"
+
+    def __init__(
+        self,
+        mode: str = "off",
+        min_score: float = 0.65,
+        min_margin: float = 0.1,
+        min_prob: float = 0.8,
+        temperature: float = 0.05,
+        shadow_rate: float = 0.0,
+        log_path: Optional[str] = None,
+    ) -> None:
+        if mode not in POLICY_MODES:
+            raise ValueError(f"지원하지 않는 배정 정책입니다: {mode} (지원: {', '.join(POLICY_MODES)})")
+        self.mode = mode
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.min_prob = min_prob
+        self.temperature = temperature
+        self.shadow_rate = shadow_rate
+        self.log_path = log_path
+        self._log_file = None
+        self._lock = threading.Lock()
+        self.counts = {self.DIRECT: 0, self.SHADOW: 0, self.LLM: 0}
+        self.shadow_agree = 0
+        self.shadow_exact = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def is_confident(self, features: dict) -> bool:
+        if self.mode == "score":
+            return features["top1"] >= self.min_score
+        if self.mode == "margin":
+            return features["margin"] >= self.min_margin
+        if self.mode == "prob":
+            return features["prob"] >= self.min_prob
+        return False
+
+    def decide(self, candidates: List[dict]) -> dict:
+        """
+        후보 부서 목록으로 처리 경로 결정
+
+        Returns:
+            {"path": "direct" | "shadow" | "llm", "dept_ids": [1위 부서 ID], "features": {...}}
+            direct일 때만 dept_ids로 바로 배정하고, shadow/llm은 LLM 결과로 배정합니다.
+        """
+        features = candidate_features(candidates, self.temperature)
+        if not self.is_confident(features):
+            path = self.LLM
+        elif self.shadow_rate > 0 and random.random() < self.shadow_rate:
+            path = self.SHADOW
+        else:
+            path = self.DIRECT
+        return {"path": path, "dept_ids": [features["top1_dept_id"]], "features": features}
+
+    def record(
+        self,
+        decision: dict,
+        msg_id: Optional[str] = None,
+        llm_dept_ids: Optional[list] = None,
+        llm_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        결정 결과 집계 및 로그 기록
+        llm_dept_ids는 LLM이 고른 부서 (LLM을 호출하지 않았으면 None, 일반 채팅으로 판단했으면 [])
+        """
+        path = decision["path"]
+        top1 = decision["features"]["top1_dept_id"]
+        agree = exact = None
+        if llm_dept_ids is not None:
+            agree = top1 in llm_dept_ids
+            exact = list(llm_dept_ids) == [top1]
+
+        with self._lock:
+            self.counts[path] += 1
+            if llm_seconds is not None:
+                self.llm_calls += 1
+                self.llm_seconds += llm_seconds
+            if path == self.SHADOW and agree is not None:
+                self.shadow_agree += int(agree)
+                self.shadow_exact += int(exact)
+            if self.log_path:
+                self._write_log({
+                    "ts": time.time(),
+                    "msg_id": msg_id,
+                    "mode": self.mode,
+                    "path": path,
+                    **decision["features"],
+                    "llm_dept_ids": llm_dept_ids,
+                    "agree": agree,
+                    "exact": exact,
+                    "llm_ms": llm_seconds * 1000 if llm_seconds is not None else None,
+                })
+
+    def _write_log(self, entry: dict) -> None:
+        try:
+            if self._log_file is None:
+                directory = os.path.dirname(self.log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._log_file = open(self.log_path, "a", encoding="utf-8")
+            self._log_file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._log_file.flush()
+        except OSError as e:
+            print(f"배정 결정 로그 기록 실패: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            shadow_agree = self.shadow_agree
+            shadow_exact = self.shadow_exact
+            llm_calls = self.llm_calls
+            llm_seconds = self.llm_seconds
+        total = sum(counts.values())
+        avg_llm_ms = llm_seconds * 1000 / llm_calls if llm_calls else 0.0
+        return {
+            **counts,
+            "total": total,
+            "direct_rate": counts[self.DIRECT] / total if total else 0.0,
+            "shadow_agreement": shadow_agree / counts[self.SHADOW] if counts[self.SHADOW] else None,
+            "shadow_exact_match": shadow_exact / counts[self.SHADOW] if counts[self.SHADOW] else None,
+            "avg_llm_ms": avg_llm_ms,
+            # 직접 배정 건수 x 평균 LLM 지연
+            "estimated_saved_ms": counts[self.DIRECT] * avg_llm_ms,
+            "mode": self.mode,
+            "min_score": self.min_score,
+            "min_margin": self.min_margin,
+            "min_prob": self.min_prob,
+            "temperature": self.temperature,
+            "shadow_rate": self.shadow_rate,
+        }
+
+
+# ============================================================================
+# 결정 로그 리포트
+# ============================================================================
+
+def read_decision_log(path: str) -> List[dict]:
+    """JSONL 결정 로그 중 LLM 결과가 있는 행만 읽음 (기준값 평가용)"""
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("llm_dept_ids") is not None:
+                entries.append(entry)
+    return entries
+
+
+def threshold_report(entries: List[dict], mode: str, thresholds: List[float]) -> List[dict]:
+    """
+    기준값별로 직접 배정되었을 비율(coverage)과 그 중 LLM 결정과의 일치율 계산
+    prob는 로그에 기록된 온도로 계산된 값을 사용합니다.
+    """
+    key = {"score": "top1", "margin": "margin", "prob": "prob"}[mode]
+    reports = []
+    for threshold in thresholds:
+        covered = [entry for entry in entries if entry[key] >= threshold]
+        reports.append({
+            "mode": mode,
+            "threshold": threshold,
+            "coverage": len(covered) / len(entries) if entries else 0.0,
+            "agreement": sum(1 for entry in covered if entry["agree"]) / len(covered) if covered else None,
+            "exact_match": sum(1 for entry in covered if entry["exact"]) / len(covered) if covered else None,
+            "samples": len(covered),
+        })
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    사용 예:
+        python routing_policy.py --log data/routing_decisions.jsonl
+        python routing_policy.py --log data/routing_decisions.jsonl --mode margin --threshold 0.05 --threshold 0.1
+    """
+    parser = argparse.ArgumentParser(description="직접 배정 정책 기준값별 coverage/LLM 일치율 리포트")
+    parser.add_argument("--log", required=True, help="ROUTING_DECISION_LOG 경로")
+    parser.add_argument("--mode", action="append", choices=[mode for mode in POLICY_MODES if mode != "off"])
+    parser.add_argument("--threshold", action="append", type=float, help="평가할 기준값 (기본: 모드별 구간)")
+    args = parser.parse_args(argv)
+
+    entries = read_decision_log(args.log)
+    print(f"LLM 결과가 있는 결정 {len(entries)}건")
+    default_thresholds = {
+        "score": [0.5, 0.55, 0.6, 0.65, 0.7, 0.75],
+        "margin": [0.02, 0.05, 0.08, 0.1, 0.15, 0.2],
+        "prob": [0.5, 0.6, 0.7, 0.8, 0.9, 0.95],
+    }
+    for mode in args.mode or ["score", "margin", "prob"]:
+        for report in threshold_report(entries, mode, args.threshold or default_thresholds[mode]):
+            print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
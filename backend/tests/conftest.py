@@ -0,0 +1,47 @@
+import os
+import sys
+import hashlib
+
+import numpy as np
+import pytest
+
+
+# backend 모듈은 평평한 import(`from dept_index import ...`)를 사용하므로 backend 디렉토리를 경로에 추가
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def clustered_vectors(rng):
+    """주제별로 뭉친 정규화 벡터 (부서/문의 임베딩과 비슷한 분포)"""
+    centers = rng.normal(size=(20, 64)).astype(np.float32) * 3
+    labels = rng.integers(0, 20, size=2000)
+    return unit_rows(centers[labels] + rng.normal(size=(2000, 64)).astype(np.float32))
+
+
+@pytest.fixture
+def hash_encoder():
+    """텍스트마다 고정된 임의 벡터를 돌려주는 인코더 (호출 기록 포함)"""
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        vectors = [
+            np.random.default_rng(int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)).normal(size=16)
+            for text in texts
+        ]
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), 16)
+
+    encode.calls = calls
+    return encode
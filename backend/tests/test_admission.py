@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import AdmissionController, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", fake)
+    return fake
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.reserve(0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(0) is None
+
+    # 부족하면 토큰이 생길 시각까지의 대기 시간을 예약
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    clock.now += 10
+    assert bucket.reserve(0) == 0.0
+    assert bucket.tokens == pytest.approx(2.0)
+
+
+def test_admit_defers_then_skips_past_max_defer(clock):
+    controller = AdmissionController(rate=1.0, burst=1, max_defer_seconds=2.0)
+    assert controller.admit("a")["decision"] == AdmissionController.ADMIT
+    assert controller.admit("a") == {"decision": AdmissionController.DEFER, "delay": pytest.approx(1.0)}
+    assert controller.admit("a") == {"decision": AdmissionController.DEFER, "delay": pytest.approx(2.0)}
+    assert controller.admit("a") == {"decision": AdmissionController.SKIP, "delay": 0.0}
+    # 다른 채널은 영향을 받지 않음
+    assert controller.admit("b")["decision"] == AdmissionController.ADMIT
+    assert controller.stats()["top_throttled"] == {"a": 3}
+
+
+def test_skip_mode_never_defers(clock):
+    controller = AdmissionController(rate=1.0, burst=1, mode="skip")
+    controller.admit("a")
+    assert controller.admit("a")["decision"] == AdmissionController.SKIP
+
+
+def test_refund_returns_token(clock):
+    controller = AdmissionController(rate=1.0, burst=1, mode="skip")
+    controller.refund("a", controller.admit("a"))
+    assert controller.admit("a")["decision"] == AdmissionController.ADMIT
+    assert controller.stats()["refunded"] == 1
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        AdmissionController(mode="drop")
+
+
+def test_least_recently_used_buckets_evicted(clock):
+    controller = AdmissionController(rate=1.0, burst=1, max_buckets=2)
+    for key in ("a", "b", "c"):
+        controller.admit(key)
+    assert list(controller._buckets) == ["b", "c"]
+
+
+def test_try_acquire_respects_in_flight_limit():
+    controller = AdmissionController(max_in_flight=2)
+    assert controller.try_acquire() and controller.try_acquire()
+    assert not controller.try_acquire()
+    controller.release()
+    assert controller.try_acquire()
+    stats = controller.stats()
+    assert stats["in_flight"] == 2 and stats["in_flight_peak"] == 2 and stats["in_flight_full"] == 1
+
+
+def test_slot_waits_for_free_slot():
+    controller = AdmissionController(max_in_flight=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with controller.slot():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert max(peak) == 2
+    assert controller.in_flight == 0 and controller.in_flight_peak == 2
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+agent = pytest.importorskip("agent", reason="LangGraph/Supabase 의존성이 필요합니다.")
+
+from routing_policy import ConfidencePolicy
+
+
+CONFIDENT = [
+    {"dept_id": 3, "dept_name": "환불팀", "similarity": 0.92},
+    {"dept_id": 5, "dept_name": "배송팀", "similarity": 0.41},
+]
+UNSURE = [
+    {"dept_id": 3, "dept_name": "환불팀", "similarity": 0.52},
+    {"dept_id": 5, "dept_name": "배송팀", "similarity": 0.50},
+]
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    # 의도 분류기는 기본값(꺼짐) 그대로, 유사도 정책만 켬
+    monkeypatch.delenv("INTENT_GATE_ENABLED", raising=False)
+    monkeypatch.setenv("DECISION_CACHE_ENABLED", "false")
+    policy = ConfidencePolicy(mode="score", min_score=0.8)
+    monkeypatch.setattr(agent, "get_routing_policy", lambda: policy)
+    monkeypatch.setattr(agent, "get_dept_classifier", lambda: None)
+    monkeypatch.setattr(agent, "encode_query", lambda text: np.ones(4, dtype=np.float32))
+    return policy
+
+
+@pytest.mark.parametrize("candidates, expected", [(CONFIDENT, {"action": "assign", "dept_ids": [3]}), (UNSURE, None)])
+def test_single_call_policy_applies_without_intent_gate(policy, monkeypatch, candidates, expected):
+    monkeypatch.setattr(agent, "search_departments", lambda *args: (candidates, 1))
+    plan = agent.plan_single_call("m1", "환불 문의", 5)
+    assert plan["decision"] == expected
+    assert (plan["policy_decision"] is None) == (expected is not None)
+    assert policy.counts[ConfidencePolicy.DIRECT] == (1 if expected else 0)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    # m1은 유사도 정책으로 바로 배정되고, m2는 LLM(route_single_call)으로 넘어가는 배치
+    routed = []
+    index = SimpleNamespace(version=1, search_many=lambda embeddings, top_k: [CONFIDENT, UNSURE])
+    monkeypatch.setattr(agent, "get_message_contents", lambda ids: {"m1": "환불 문의", "m2": "배송 문의"})
+    monkeypatch.setattr(agent, "encode_queries", lambda texts: np.ones((len(texts), 4), dtype=np.float32))
+    monkeypatch.setattr(agent, "get_department_index", lambda tenant=None: index)
+    monkeypatch.setattr(agent, "save_assignments_bulk", lambda rows: rows)
+
+    def route(content, candidates):
+        routed.append(content)
+        return {"action": "assign", "dept_ids": [5]}
+
+    monkeypatch.setattr(agent, "route_single_call", route)
+    return routed
+
+
+def test_batch_policy_applies_without_intent_gate(policy, batch):
+    routed = batch
+    results = agent.assign_departments(["m1", "m2"])
+    assert [result["dept_ids"] for result in results] == [[3], [5]]
+    assert routed == ["배송 문의"]
+    assert policy.llm_calls == 1
+
+
+def test_batch_gate_counts_only_its_own_decisions(policy, batch, monkeypatch):
+    from intent_gate import IntentGate
+
+    # 모든 문의의 margin이 0이라 의도 분류기는 판단을 LLM에 넘김 (uncertain)
+    gate = IntentGate(np.eye(4, dtype=np.float32)[0], np.eye(4, dtype=np.float32)[1])
+    monkeypatch.setenv("INTENT_GATE_ENABLED", "true")
+    monkeypatch.setattr(agent, "get_intent_gate", lambda: gate)
+
+    results = agent.assign_departments(["m1", "m2"])
+    assert [result["dept_ids"] for result in results] == [[3], [5]]
+    # m1의 정책 직접 배정은 의도 분류기의 local_assign이 아님
+    assert gate.counts == {"local_chat": 0, "local_assign": 0, "llm": 2}
+    assert policy.counts[ConfidencePolicy.DIRECT] == 1
+
+
+class FakeClassifier:
+    min_confidence = 0.9
+
+    def __init__(self, dept_id, probability):
+        self.prediction = (dept_id, probability)
+        self.outcomes = []
+
+    def predict(self, embedding):
+        return self.prediction
+
+    def record(self, outcome):
+        self.outcomes.append(outcome)
+
+
+def test_classifier_applies_without_intent_gate(policy, monkeypatch):
+    classifier = FakeClassifier(5, 0.95)
+    monkeypatch.setattr(agent, "get_dept_classifier", lambda: classifier)
+    monkeypatch.setattr(agent, "search_departments", lambda *args: (UNSURE, 1))
+
+    plan = agent.plan_single_call("m1", "배송 문의", 5)
+    assert plan["decision"] == {"action": "assign", "dept_ids": [5]}
+    assert classifier.outcomes == ["local"]
+    assert policy.counts == {ConfidencePolicy.DIRECT: 0, ConfidencePolicy.SHADOW: 0, ConfidencePolicy.LLM: 0}
+
+
+def test_classifier_trained_on_other_embedding_is_not_loaded(monkeypatch, tmp_path):
+    from dept_classifier import DepartmentClassifier
+    from embedding_backend import embedding_identity
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "torch")
+    monkeypatch.delenv("EMBEDDING_SERVICE_URL", raising=False)
+    path = str(tmp_path / "dept_classifier.npz")
+    monkeypatch.setattr(agent, "DEFAULT_CLASSIFIER_PATH", path)
+    embeddings = np.eye(2, 4, dtype=np.float32)
+
+    DepartmentClassifier.fit(embeddings, [3, 5], model_name=embedding_identity(agent.EMBEDDING_MODEL_NAME)).save(path)
+    assert agent._create_dept_classifier().dept_ids == [3, 5]
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    assert agent._create_dept_classifier() is None
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+agent = pytest.importorskip("agent", reason="LangGraph/Supabase 의존성이 필요합니다.")
+
+from resources import registry
+
+
+@pytest.fixture
+def fresh_runtime():
+    # 다른 테스트가 만든 런타임을 쓰지 않도록 앞뒤로 해제
+    registry.close("agent_runtime")
+    yield
+    registry.close("agent_runtime")
+
+
+def test_graph_is_compiled_once_and_shared_across_threads(fresh_runtime, monkeypatch):
+    compiled = []
+    monkeypatch.setattr(agent, "build_agent_graph", lambda tools: compiled.append(tools) or object())
+
+    runtimes = []
+    threads = [threading.Thread(target=lambda: runtimes.append(agent.get_agent_runtime())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(compiled) == 1
+    assert all(runtime is runtimes[0] for runtime in runtimes)
+    assert runtimes[0].tools == [agent.assign_department_tool]
+
+
+class FakeModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, normalize_embeddings=False):
+        self.encoded.append(list(texts))
+
+
+@pytest.mark.parametrize("mode, compiles", [("graph", True), ("single_call", False)])
+def test_warmup_loads_model_index_and_graph_before_first_request(monkeypatch, mode, compiles):
+    model = FakeModel()
+    steps = []
+    monkeypatch.setenv("AGENT_MODE", mode)
+    monkeypatch.setenv("EMBEDDING_BATCHING_ENABLED", "false")
+    monkeypatch.delenv("INTENT_GATE_ENABLED", raising=False)
+    monkeypatch.delenv("DEPT_TENANT_COLUMN", raising=False)
+    monkeypatch.setattr(agent, "dept_classifier_enabled", lambda: False)
+    monkeypatch.setattr(agent.registry, "init", lambda names: steps.append(("init", tuple(names))))
+    monkeypatch.setattr(agent, "load_embedding_model", lambda: model)
+    monkeypatch.setattr(agent, "get_department_index", lambda tenant=None: steps.append("index"))
+    monkeypatch.setattr(agent, "get_agent_runtime", lambda: steps.append("graph"))
+
+    agent.warmup()
+
+    # 더미 인코딩으로 첫 forward pass 비용까지 미리 처리
+    assert len(model.encoded) == 1
+    assert steps[0] == ("init", ("supabase", "openai", "embedding_model"))
+    assert "index" in steps
+    assert ("graph" in steps) == compiles
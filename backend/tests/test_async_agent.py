@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+async_agent = pytest.importorskip("async_agent", reason="LangGraph/Supabase 비동기 의존성이 필요합니다.")
+
+import agent
+
+
+class FailingLLM:
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        raise TimeoutError("upstream timeout")
+
+
+class ClosableClient:
+    def __init__(self):
+        self.closed = []
+        self.postgrest = SimpleNamespace(aclose=self._closer("postgrest"))
+        self.auth = SimpleNamespace(close=self._closer("auth"))
+
+    def _closer(self, name):
+        async def close():
+            self.closed.append(name)
+        return close
+
+
+@pytest.fixture
+def runtime():
+    runtime = async_agent.AsyncAgentRuntime(encode_workers=1)
+    yield runtime
+    asyncio.run(runtime.close())
+
+
+def test_tool_error_is_retryable(runtime, monkeypatch):
+    def fail(*args):
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(agent, "search_departments", fail)
+    result = asyncio.run(runtime.assign_department_tool("환불 문의", "m1", 5))
+    assert result["retryable"] is True
+    assert result == agent.tool_error_result(ConnectionError("db down"))
+
+
+def test_chatbot_llm_error_raises_assignment_error(runtime, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(async_agent, "ChatOpenAI", lambda **kwargs: FailingLLM())
+    monkeypatch.setattr(agent, "local_intent_response", lambda text: None)
+    graph = runtime._build_graph()
+
+    with pytest.raises(agent.AssignmentError):
+        asyncio.run(graph.ainvoke({
+            "messages": [async_agent.HumanMessage(content="환불 문의")],
+            "msg_id": "m1",
+            "top_k": 5,
+        }))
+
+
+def test_single_call_reuses_agent_plan(runtime, monkeypatch):
+    saved, remembered, recorded = [], [], []
+    plan = {"decision": None, "candidates": [{"dept_id": 3}], "catalog_version": 7, "policy_decision": {"path": "llm"}}
+    monkeypatch.setattr(agent, "plan_single_call", lambda *args: plan)
+    monkeypatch.setattr(agent, "remember_decision", lambda *args: remembered.append(args))
+    monkeypatch.setattr(agent, "record_policy_comparison", lambda *args: recorded.append(args[:3]))
+
+    async def route(content, candidates):
+        return {"action": "assign", "dept_ids": [3]}
+
+    async def save(msg_id, dept_ids):
+        saved.append((msg_id, dept_ids))
+
+    monkeypatch.setattr(runtime, "route_single_call", route)
+    monkeypatch.setattr(runtime, "save_assignments", save)
+
+    assert asyncio.run(runtime._assign_single_call("m1", "환불 문의", 5, "t1")) == 1
+    assert saved == [("m1", [3])]
+    assert recorded == [({"path": "llm"}, "m1", [3])]
+    assert remembered == [("환불 문의", "t1", [3], 7, "m1")]
+
+
+def test_close_releases_supabase_client(runtime):
+    client = ClosableClient()
+    runtime.supabase = client
+    asyncio.run(runtime.close())
+    assert client.closed == ["postgrest", "auth"]
+    runtime.supabase = None
@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+agent = pytest.importorskip("agent", reason="LangGraph/Supabase 의존성이 필요합니다.")
+
+from routing_policy import ConfidencePolicy
+
+
+# batch 픽스처가 대역으로 바꾸기 전의 실제 upsert 함수
+save_assignments_bulk = agent.save_assignments_bulk
+
+CANDIDATES = [{"dept_id": 3, "dept_name": "환불팀", "similarity": 0.5}]
+CONTENTS = {"m1": "환불 문의", "m2": "안녕하세요", "m3": "오류 문의"}
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """LLM만 거치는 배치 (캐시/의도 분류기/부서 분류기/유사도 정책 끔)"""
+    state = SimpleNamespace(fetched=[], encoded=[], routed=[], saved=[])
+    monkeypatch.delenv("INTENT_GATE_ENABLED", raising=False)
+    monkeypatch.setenv("DECISION_CACHE_ENABLED", "false")
+    monkeypatch.setattr(agent, "get_routing_policy", lambda: ConfidencePolicy(mode="off"))
+    monkeypatch.setattr(agent, "get_dept_classifier", lambda: None)
+
+    def contents(ids):
+        state.fetched.append(list(ids))
+        return {msg_id: CONTENTS[msg_id] for msg_id in ids if msg_id in CONTENTS}
+
+    def encode(texts):
+        state.encoded.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def route(content, candidates):
+        state.routed.append(content)
+        if content == "오류 문의":
+            raise RuntimeError("rate limited")
+        if content == "안녕하세요":
+            return {"action": "chat"}
+        return {"action": "assign", "dept_ids": [3]}
+
+    def save(rows):
+        state.saved.append(rows)
+        return rows
+
+    index = SimpleNamespace(version=1, search_many=lambda embeddings, top_k: [CANDIDATES] * len(embeddings))
+    monkeypatch.setattr(agent, "get_message_contents", contents)
+    monkeypatch.setattr(agent, "encode_queries", encode)
+    monkeypatch.setattr(agent, "get_department_index", lambda tenant=None: index)
+    monkeypatch.setattr(agent, "route_single_call", route)
+    monkeypatch.setattr(agent, "save_assignments_bulk", save)
+    return state
+
+
+def test_results_follow_input_order_and_duplicates_run_once(batch):
+    results = agent.assign_departments(["m2", "m1", "missing", 1, "m1", "m3"])
+
+    assert [result["msg_id"] for result in results] == ["m2", "m1", "missing", "1", "m1", "m3"]
+    assert [(result["status"], result["dept_ids"]) for result in results] == [
+        (0, []), (1, [3]), (0, []), (0, []), (1, [3]), (0, []),
+    ]
+    assert "메시지를 찾을 수 없습니다" in results[2]["error"]
+    assert "rate limited" in results[5]["error"]
+
+    # 조회/임베딩/저장은 한 번씩, 중복 메시지는 LLM도 한 번
+    assert batch.fetched == [["m2", "m1", "missing", "1", "m3"]]
+    assert batch.encoded == [["안녕하세요", "환불 문의", "오류 문의"]]
+    assert sorted(batch.routed) == ["안녕하세요", "오류 문의", "환불 문의"]
+    assert batch.saved == [[{"msg_id": "m1", "dept_id": 3}]]
+
+
+def test_save_error_marks_assigned_messages_failed(batch, monkeypatch):
+    def broken(rows):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(agent, "save_assignments_bulk", broken)
+    results = agent.assign_departments(["m1", "m2"])
+
+    assert results[0]["status"] == 0 and "배정 저장 실패" in results[0]["error"]
+    # 채팅으로 처리된 메시지는 저장할 행이 없으므로 그대로
+    assert results[1] == {"msg_id": "m2", "status": 0, "dept_ids": [], "created_dept_ids": []}
+
+
+def test_empty_batch_does_no_work(batch):
+    assert agent.assign_departments([]) == []
+    assert batch.fetched == [] and batch.saved == []
+
+
+class FakeAssignedMessage:
+    """ON CONFLICT (msg_id, dept_id) DO NOTHING처럼 새로 생긴 행만 돌려주는 assigned_message 대역"""
+
+    def __init__(self) -> None:
+        self.keys = set()
+        self.upserts = []
+
+    def table(self, name):
+        assert name == "assigned_message"
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.upserts.append((rows, on_conflict, ignore_duplicates))
+        self.pending = rows
+        return self
+
+    def execute(self):
+        created = []
+        for row in self.pending:
+            key = (str(row["msg_id"]), row["dept_id"])
+            if key not in self.keys:
+                self.keys.add(key)
+                # msg_id는 bigint 컬럼이므로 정수로 반환됨
+                created.append({"msg_id": int(row["msg_id"]), "dept_id": row["dept_id"]})
+        return SimpleNamespace(data=created)
+
+
+def test_bulk_upsert_sends_unique_rows_once_and_returns_created_rows(monkeypatch):
+    db = FakeAssignedMessage()
+    db.keys.add(("7", 3))
+    monkeypatch.setattr(agent, "get_supabase_client", lambda: db)
+
+    created = save_assignments_bulk([
+        {"msg_id": "7", "dept_id": 3},
+        {"msg_id": "7", "dept_id": 5},
+        {"msg_id": 7, "dept_id": 5},
+    ])
+    # 같은 (msg_id, dept_id)는 한 행만, 이미 있던 행은 응답에서 빠짐
+    assert created == [{"msg_id": 7, "dept_id": 5}]
+    [(rows, on_conflict, ignore_duplicates)] = db.upserts
+    assert [(str(row["msg_id"]), row["dept_id"]) for row in rows] == [("7", 3), ("7", 5)]
+    assert (on_conflict, ignore_duplicates) == ("msg_id,dept_id", True)
+
+    assert save_assignments_bulk([]) == [] and len(db.upserts) == 1
+
+
+def test_save_assignments_reports_only_new_departments(monkeypatch):
+    db = FakeAssignedMessage()
+    db.keys.add(("7", 3))
+    monkeypatch.setattr(agent, "get_supabase_client", lambda: db)
+
+    assert agent.save_assignments("7", [3, 5, 5]) == [{"msg_id": 7, "dept_id": 5}]
+    assert agent.save_assignments("7", [3, 5]) == []
+    assert len(db.upserts) == 2
+
+
+def test_retried_batch_keeps_dept_ids_but_creates_nothing(batch, monkeypatch):
+    db = FakeAssignedMessage()
+    monkeypatch.setattr(agent, "get_supabase_client", lambda: db)
+    monkeypatch.setattr(agent, "save_assignments_bulk", save_assignments_bulk)
+    contents = {"101": "환불 문의", "102": "안녕하세요"}
+    monkeypatch.setattr(agent, "get_message_contents", lambda ids: {msg_id: contents[msg_id] for msg_id in ids})
+
+    first = agent.assign_departments(["101", "102"])
+    assert [(result["dept_ids"], result["created_dept_ids"]) for result in first] == [([3], [3]), ([], [])]
+
+    retried = agent.assign_departments(["101", "102"])
+    assert [(result["dept_ids"], result["created_dept_ids"]) for result in retried] == [([3], []), ([], [])]
+    assert retried[0]["status"] == 1
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from decision_cache import ScopedDecisionCache, SemanticDecisionCache
+
+
+@pytest.fixture
+def vector(rng):
+    return rng.normal(size=32).astype(np.float32)
+
+
+def test_hit_above_threshold_and_miss_below(vector, rng):
+    cache = SemanticDecisionCache(threshold=0.95)
+    cache.add(vector, [3], catalog_version=1, source_msg_id="m1")
+
+    hit = cache.lookup(vector * 2, catalog_version=1)
+    assert hit["dept_ids"] == [3] and hit["source_msg_id"] == "m1"
+    assert cache.lookup(rng.normal(size=32).astype(np.float32), catalog_version=1) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_catalog_version_change_invalidates(vector):
+    cache = SemanticDecisionCache()
+    cache.add(vector, [3], catalog_version=1)
+    assert cache.lookup(vector, catalog_version=2) is None
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+
+def test_ttl_expiry(vector, monkeypatch):
+    cache = SemanticDecisionCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr("decision_cache.time.time", lambda: now[0])
+    cache.add(vector, [3], catalog_version=1)
+    now[0] += 11
+    assert cache.lookup(vector, catalog_version=1) is None
+
+
+def test_ring_buffer_overwrites_oldest(rng):
+    cache = SemanticDecisionCache(max_entries=2)
+    vectors = rng.normal(size=(3, 32)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        cache.add(vector, [i], catalog_version=1)
+    assert len(cache) == 2
+    assert cache.lookup(vectors[0], catalog_version=1) is None
+    assert cache.lookup(vectors[2], catalog_version=1)["dept_ids"] == [2]
+
+
+def test_empty_dept_ids_not_cached(vector):
+    cache = SemanticDecisionCache()
+    cache.add(vector, [], catalog_version=1)
+    assert len(cache) == 0
+
+
+def test_scopes_are_isolated(vector):
+    cache = ScopedDecisionCache(threshold=0.9)
+    cache.for_scope("a").add(vector, [1], catalog_version=1)
+    assert cache.for_scope("b").lookup(vector, catalog_version=1) is None
+    assert cache.for_scope("a").lookup(vector, catalog_version=1)["dept_ids"] == [1]
+    assert cache.stats()["scopes"] == 2
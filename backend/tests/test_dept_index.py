@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from dept_index import DepartmentIndex
+
+
+@pytest.fixture(autouse=True)
+def exact_backend(monkeypatch):
+    monkeypatch.delenv("DEPT_INDEX_BACKEND", raising=False)
+    monkeypatch.delenv("DEPT_INDEX_BACKEND_PARAMS", raising=False)
+
+
+def _dept(dept_id, name, desc="설명"):
+    return {"dept_id": dept_id, "dept_name": name, "dept_desc": desc}
+
+
+DEPARTMENTS = [_dept(1, "결제팀", "환불 결제 오류"), _dept(2, "배송팀", "배송 지연 조회"), _dept(3, "회원팀", "로그인 계정")]
+
+
+def test_build_and_search_finds_same_text(hash_encoder):
+    index = DepartmentIndex.build(DEPARTMENTS, hash_encoder, model_name="m")
+    query = hash_encoder(["배송팀 배송 지연 조회"])[0]
+    result = index.search(query, 2)
+    assert result[0]["dept_id"] == 2
+    assert result[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+    assert len(result) == 2
+
+
+def test_upsert_embeds_only_changes_and_bumps_version(hash_encoder):
+    index = DepartmentIndex.build(DEPARTMENTS, hash_encoder)
+    hash_encoder.calls.clear()
+
+    assert index.upsert(DEPARTMENTS, hash_encoder) == {"added": 0, "updated": 0, "version": 0}
+    assert hash_encoder.calls == []
+
+    result = index.upsert([_dept(2, "배송팀", "반품 수거"), _dept(4, "제휴팀", "입점 문의")], hash_encoder)
+    assert result == {"added": 1, "updated": 1, "version": 1}
+    assert hash_encoder.calls == [["배송팀 반품 수거", "제휴팀 입점 문의"]]
+    assert len(index) == 4
+    assert index.search(hash_encoder(["제휴팀 입점 문의"])[0], 1)[0]["dept_id"] == 4
+    assert index.search(hash_encoder(["배송팀 반품 수거"])[0], 1)[0]["dept_id"] == 2
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_save_load_roundtrip_keeps_version(hash_encoder, tmp_path, monkeypatch, dtype):
+    monkeypatch.setattr("dept_index.STORAGE_DTYPE", dtype)
+    index = DepartmentIndex.build(DEPARTMENTS, hash_encoder, model_name="m")
+    index.upsert([_dept(5, "법무팀", "계약")], hash_encoder)
+    index.save(str(tmp_path))
+
+    assert DepartmentIndex.read_version(str(tmp_path)) == 1
+    loaded = DepartmentIndex.load(str(tmp_path))
+    assert loaded.version == 1 and loaded.model_name == "m" and len(loaded) == 4
+    query = hash_encoder(["법무팀 계약"])[0]
+    assert loaded.search(query, 1)[0]["dept_id"] == 5
+
+    # 로드한 (mmap) 인덱스도 upsert 가능
+    assert loaded.upsert([_dept(6, "보안팀", "해킹")], hash_encoder)["version"] == 2
+
+
+def test_load_missing_directory_returns_none(tmp_path):
+    assert DepartmentIndex.load(str(tmp_path / "none")) is None
+    assert DepartmentIndex.read_version(str(tmp_path / "none")) is None
+
+
+def test_mismatched_rows_rejected():
+    with pytest.raises(ValueError):
+        DepartmentIndex(DEPARTMENTS, np.ones((2, 4), dtype=np.float32))
+
+
+def test_load_rebuilds_backend_when_index_params_change(hash_encoder, tmp_path, monkeypatch):
+    monkeypatch.setenv("DEPT_INDEX_BACKEND", "ivf")
+    monkeypatch.setenv("DEPT_INDEX_BACKEND_PARAMS", '{"n_lists": 2, "n_probe": 1}')
+    DepartmentIndex.build(DEPARTMENTS, hash_encoder).save(str(tmp_path))
+    built = []
+    monkeypatch.setattr("retrieval.IVFBackend.build", lambda self, embeddings, centroids=None: built.append(self) or self)
+
+    # 검색 파라미터(n_probe)만 바뀌면 저장된 색인 재사용
+    monkeypatch.setenv("DEPT_INDEX_BACKEND_PARAMS", '{"n_lists": 2, "n_probe": 2}')
+    assert DepartmentIndex.load(str(tmp_path)).backend.n_probe == 2
+    assert built == []
+
+    # 색인 파라미터(n_lists)가 바뀌면 다시 생성
+    monkeypatch.setenv("DEPT_INDEX_BACKEND_PARAMS", '{"n_lists": 3, "n_probe": 2}')
+    assert DepartmentIndex.load(str(tmp_path)).backend.n_lists == 3
+    assert len(built) == 1
+
+
+def test_save_swaps_snapshot_pointer_and_keeps_previous_readable(hash_encoder, tmp_path, monkeypatch):
+    import os
+
+    import dept_index
+
+    monkeypatch.setattr("dept_index.STORAGE_DTYPE", "int8")
+    index = DepartmentIndex.build(DEPARTMENTS, hash_encoder, model_name="m")
+    index.save(str(tmp_path))
+    previous = dept_index.snapshot_dir(str(tmp_path))
+
+    index.upsert([_dept(4, "제휴팀", "입점")], hash_encoder)
+    index.save(str(tmp_path))
+    current = dept_index.snapshot_dir(str(tmp_path))
+    assert current != previous
+
+    # 교체 전에 경로를 읽은 워커는 이전 스냅샷을 그대로 읽음 (새 파일과 섞이지 않음)
+    assert len(DepartmentIndex.load(str(tmp_path))) == 4
+    monkeypatch.setattr("dept_index.snapshot_dir", lambda index_dir: previous)
+    assert len(DepartmentIndex.load(str(tmp_path))) == 3
+    monkeypatch.undo()
+
+    # 저장 도중 죽은 스냅샷은 version 파일이 가리키지 않으므로 무시
+    os.makedirs(os.path.join(str(tmp_path), dept_index.SNAPSHOTS_DIR, "9-partial"))
+    assert DepartmentIndex.load(str(tmp_path)).version == 1
+
+    for _ in range(dept_index.KEEP_SNAPSHOTS + 2):
+        index.save(str(tmp_path))
+    assert len(os.listdir(os.path.join(str(tmp_path), dept_index.SNAPSHOTS_DIR))) == dept_index.KEEP_SNAPSHOTS + 1
+
+
+def test_load_legacy_layout_without_snapshots(hash_encoder, tmp_path):
+    import json
+    import os
+
+    import dept_index
+    from vector_store import VectorStore
+
+    index = DepartmentIndex.build(DEPARTMENTS, hash_encoder, model_name="m")
+    VectorStore(index.embeddings).save(os.path.join(str(tmp_path), dept_index.EMBEDDINGS_FILE))
+    with open(os.path.join(str(tmp_path), dept_index.META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model_name": "m", "version": 5, "departments": DEPARTMENTS}, f)
+    with open(os.path.join(str(tmp_path), dept_index.VERSION_FILE), "w", encoding="utf-8") as f:
+        f.write("5")
+
+    assert DepartmentIndex.read_version(str(tmp_path)) == 5
+    assert len(DepartmentIndex.load(str(tmp_path))) == 3
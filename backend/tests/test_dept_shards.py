@@ -0,0 +1,126 @@
+import multiprocessing
+import sys
+
+import pytest
+
+from dept_index import DepartmentIndex
+from dept_shards import GLOBAL_SHARD, ShardedDepartmentIndex, shard_dir
+
+
+@pytest.fixture(autouse=True)
+def exact_backend(monkeypatch):
+    monkeypatch.delenv("DEPT_INDEX_BACKEND", raising=False)
+    monkeypatch.delenv("DEPT_INDEX_BACKEND_PARAMS", raising=False)
+
+
+def _dept(dept_id, name, desc="설명"):
+    return {"dept_id": dept_id, "dept_name": name, "dept_desc": desc}
+
+
+def make_shards(root, encoder, builds=None):
+    def build(tenant):
+        if builds is not None:
+            builds.append(tenant)
+        return DepartmentIndex.build([_dept(1, "결제팀", "환불")], encoder, model_name="m")
+
+    return ShardedDepartmentIndex(build, model_name="m", root_dir=str(root))
+
+
+def test_get_builds_once_then_loads_from_disk(tmp_path, hash_encoder):
+    builds = []
+    shards = make_shards(tmp_path, hash_encoder, builds)
+    index = shards.get("acme")
+    assert shards.get("acme") is index
+    assert builds == ["acme"] and index.version == 1
+
+    other = make_shards(tmp_path, hash_encoder, builds)
+    assert other.get("acme").version == 1
+    assert builds == ["acme"] and other.stats()["loads"] == 1
+
+
+def test_upsert_reloads_newer_shard_from_other_worker(tmp_path, hash_encoder):
+    first = make_shards(tmp_path, hash_encoder)
+    second = make_shards(tmp_path, hash_encoder)
+    first.get(GLOBAL_SHARD)
+    second.get(GLOBAL_SHARD)
+
+    assert first.upsert(GLOBAL_SHARD, [_dept(2, "배송팀")], hash_encoder)["version"] == 2
+    # second는 메모리에 version 1을 들고 있지만 디스크의 최신 샤드 위에 반영
+    assert second.upsert(GLOBAL_SHARD, [_dept(3, "회원팀")], hash_encoder)["version"] == 3
+    loaded = DepartmentIndex.load(shard_dir(GLOBAL_SHARD, str(tmp_path)))
+    assert sorted(dept["dept_id"] for dept in loaded.departments) == [1, 2, 3]
+
+
+def test_version_file_checked_once_per_interval(tmp_path, hash_encoder, monkeypatch):
+    import dept_shards
+
+    now = [100.0]
+    reads = []
+    read_version = DepartmentIndex.read_version
+    monkeypatch.setattr(dept_shards.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(DepartmentIndex, "read_version", staticmethod(lambda path: reads.append(path) or read_version(path)))
+
+    shards = make_shards(tmp_path, hash_encoder)
+    shards.get("acme")
+    reads.clear()
+    for _ in range(100):
+        shards.get("acme")
+    assert reads == []
+
+    # 다른 워커의 갱신은 확인 주기가 지난 뒤 반영
+    make_shards(tmp_path, hash_encoder).upsert("acme", [_dept(2, "배송팀")], hash_encoder)
+    assert shards.get("acme").version == 1
+    now[0] += 1.5
+    assert shards.get("acme").version == 2
+    assert shards.get("acme", refresh=True).version == 2
+
+
+def _upsert_worker(root, encoder, first_id, count, start):
+    shards = make_shards(root, encoder)
+    start.wait()
+    for dept_id in range(first_id, first_id + count):
+        shards.upsert("acme", [_dept(dept_id, f"부서{dept_id}")], encoder)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork와 fcntl 파일 잠금이 필요합니다.")
+def test_concurrent_upserts_from_processes_keep_every_change(tmp_path, hash_encoder):
+    make_shards(tmp_path, hash_encoder).get("acme")
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    workers = [
+        context.Process(target=_upsert_worker, args=(tmp_path, hash_encoder, first_id, 10, start))
+        for first_id in (100, 200)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    loaded = DepartmentIndex.load(shard_dir("acme", str(tmp_path)))
+    assert len(loaded) == 21
+    assert loaded.version == 21
+
+
+def test_empty_shard_is_persisted_and_newer_disk_version_wins(tmp_path, hash_encoder):
+    departments = {"T": []}
+    builds = []
+
+    def build(tenant):
+        builds.append(tenant)
+        return DepartmentIndex.build(departments[tenant], hash_encoder, model_name="m")
+
+    first = ShardedDepartmentIndex(build, model_name="m", root_dir=str(tmp_path))
+    second = ShardedDepartmentIndex(build, model_name="m", root_dir=str(tmp_path))
+
+    # 비어 있는 샤드도 저장된 것을 로드하고 다시 만들지 않음
+    assert len(second.get("T")) == 0 and second.get("T").version == 1
+    assert len(first.get("T")) == 0 and first.get("T").version == 1
+    assert builds == ["T"]
+
+    assert first.rebuild("T").version == 2
+    # second는 낡은 v1을 들고 있지만 디스크의 (비어 있는) v2 위에 반영하고 v3으로 저장
+    assert second.upsert("T", [_dept(2, "배송팀")], hash_encoder)["version"] == 3
+    assert [dept["dept_id"] for dept in first.get("T", refresh=True).departments] == [2]
+    assert first.get("T").version == 3
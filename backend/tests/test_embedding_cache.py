@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import QueryEmbeddingCache, normalize_query, query_cache_key
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(embedding_cache.time, "time", fake)
+    return fake
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_key_normalizes_text_and_includes_namespace():
+    assert normalize_query("  환불　 문의\n") == "환불 문의"
+    assert query_cache_key("환불  문의") == query_cache_key(" 환불 문의 ")
+    assert query_cache_key("환불 문의", "kure|torch") != query_cache_key("환불 문의", "kure|onnx-int8")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    assert cache.get("a") is not None
+    cache.put("c", vector(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expires_entries(clock):
+    cache = QueryEmbeddingCache(ttl_seconds=10)
+    cache.put("a", vector(1))
+    clock.now += 5
+    assert cache.get("a") is not None
+    clock.now += 6
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_evicted_entries_spill_to_disk_and_come_back(tmp_path):
+    cache = QueryEmbeddingCache(max_entries=1, disk_path=str(tmp_path / "cache.sqlite3"))
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    assert len(cache) == 1
+
+    assert cache.get("a")[0] == 1
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+
+def test_disk_entries_respect_ttl(tmp_path, clock):
+    cache = QueryEmbeddingCache(max_entries=1, ttl_seconds=10, disk_path=str(tmp_path / "cache.sqlite3"))
+    cache.put("a", vector(1))
+    cache.put("b", vector(2))
+    clock.now += 20
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_disk_store_not_shared_across_models(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    torch_cache = QueryEmbeddingCache(max_entries=1, disk_path=path, namespace="kure|torch")
+    torch_cache.put("a", vector(1))
+    torch_cache.put("b", vector(2))
+    torch_cache.close()
+
+    # 같은 파일이라도 다른 백엔드/임베딩 서버의 캐시는 이전 모델 임베딩을 돌려주지 않음
+    onnx_cache = QueryEmbeddingCache(max_entries=1, disk_path=path, namespace="kure|onnx-int8")
+    assert onnx_cache.get("a") is None
+    onnx_cache.close()
+    reopened = QueryEmbeddingCache(max_entries=1, disk_path=path, namespace="kure|torch")
+    assert reopened.get("a")[0] == 1
+    reopened.close()
+
+
+def test_get_or_encode_encodes_only_new_unique_queries(hash_encoder):
+    cache = QueryEmbeddingCache()
+    cache.put("환불 문의", hash_encoder(["환불 문의"])[0])
+    hash_encoder.calls.clear()
+
+    result = cache.get_or_encode(["환불 문의", "배송 조회", " 배송  조회 "], hash_encoder)
+    assert result.shape == (3, 16)
+    assert hash_encoder.calls == [["배송 조회"]]
+    np.testing.assert_array_equal(result[1], result[2])
+
+
+def test_embedding_identity_tracks_backend_and_service(monkeypatch):
+    from embedding_backend import embedding_identity
+
+    monkeypatch.delenv("EMBEDDING_SERVICE_URL", raising=False)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx-int8")
+    assert embedding_identity("kure") == "kure|onnx-int8"
+    monkeypatch.setenv("EMBEDDING_SERVICE_URL", "unix:///tmp/kure.sock")
+    assert embedding_identity("kure") == "kure|service|unix:///tmp/kure.sock"
@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_scheduler import EmbeddingQueueFull, EmbeddingScheduler
+
+
+class RecordingEncoder:
+    """배치별 입력을 기록하고 문장 길이를 1차원 임베딩으로 반환"""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.started = threading.Event()
+        self.gate = gate
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def schedulers():
+    created = []
+
+    def make(encoder, **kwargs):
+        scheduler = EmbeddingScheduler(encoder, **kwargs)
+        created.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in created:
+        scheduler.close(timeout=1)
+
+
+def test_concurrent_requests_share_one_batch(schedulers):
+    encoder = RecordingEncoder()
+    scheduler = schedulers(encoder, max_wait_ms=200, max_batch=32)
+    futures = [scheduler.submit(["a" * n, "b"]) for n in (1, 2, 3)]
+
+    results = [future.result(timeout=2) for future in futures]
+    assert encoder.batches == [["a", "b", "aa", "b", "aaa", "b"]]
+    assert [result[:, 0].tolist() for result in results] == [[1, 1], [2, 1], [3, 1]]
+    assert scheduler.stats()["batches"] == 1 and scheduler.stats()["avg_batch_size"] == 6
+
+
+def test_batch_flushes_at_max_batch_before_deadline(schedulers):
+    encoder = RecordingEncoder()
+    scheduler = schedulers(encoder, max_wait_ms=10_000, max_batch=4)
+    futures = [scheduler.submit(["x", "y"]) for _ in range(2)]
+
+    # 마감 시간(10초)을 기다리지 않고 문장 수가 max_batch에 도달하면 바로 처리
+    for future in futures:
+        future.result(timeout=2)
+    assert encoder.batches == [["x", "y", "x", "y"]]
+
+
+def test_batch_flushes_after_max_wait(schedulers):
+    encoder = RecordingEncoder()
+    scheduler = schedulers(encoder, max_wait_ms=20, max_batch=100)
+
+    assert scheduler.encode(["hello"], timeout=2)[0, 0] == 5
+    assert encoder.batches == [["hello"]]
+    assert scheduler.stats()["batch_size_histogram"]["1"] == 1
+
+
+def test_encode_error_propagates_to_every_future(schedulers):
+    error = ValueError("model failed")
+
+    def failing(texts):
+        raise error
+
+    scheduler = schedulers(failing, max_wait_ms=200, max_batch=32)
+    futures = [scheduler.submit([text]) for text in ("a", "b", "c")]
+    for future in futures:
+        assert future.exception(timeout=2) is error
+
+    # 실패 후에도 작업 스레드는 계속 동작
+    scheduler.encode_fn = RecordingEncoder()
+    assert scheduler.encode(["ok"], timeout=2)[0, 0] == 2
+
+
+def test_close_with_full_queue_does_not_block(schedulers):
+    gate = threading.Event()
+    encoder = RecordingEncoder(gate=gate)
+    scheduler = schedulers(encoder, max_wait_ms=0, max_batch=1, max_queue=1)
+    running = scheduler.submit(["a"])
+    assert encoder.started.wait(2)
+    queued = scheduler.submit(["bb"])
+    with pytest.raises(EmbeddingQueueFull):
+        scheduler.submit(["ccc"])
+
+    closer = threading.Thread(target=scheduler.close, kwargs={"timeout": 0.1})
+    closer.start()
+    closer.join(2)
+    assert not closer.is_alive()
+
+    # 종료 후에도 이미 받은 요청은 처리하고 작업 스레드가 끝남
+    gate.set()
+    assert running.result(timeout=2)[0, 0] == 1
+    assert queued.result(timeout=2)[0, 0] == 2
+    scheduler._worker.join(2)
+    assert not scheduler._worker.is_alive()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(["d"])
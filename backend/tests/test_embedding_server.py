@@ -0,0 +1,92 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("dotenv", reason="python-dotenv가 필요합니다.")
+
+from embedding_scheduler import EmbeddingScheduler
+from embedding_server import RemoteEmbeddingModel, create_server
+
+DIM = 3
+
+needs_unix_socket = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix 소켓이 필요합니다.")
+
+
+def encode_lengths(texts):
+    # 문장 길이를 담은 정규화되지 않은 벡터 (서버가 값을 그대로 전달하는지 확인)
+    return np.array([[len(text), 1.0, -0.5] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def serve():
+    started = []
+
+    def start(**kwargs):
+        scheduler = EmbeddingScheduler(encode_lengths, max_wait_ms=1, max_batch=32)
+        server = create_server(scheduler, dim=DIM, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        started.append((server, scheduler, thread))
+        return server
+
+    yield start
+    for server, scheduler, thread in started:
+        server.shutdown()
+        server.server_close()
+        scheduler.close(timeout=1)
+        thread.join(2)
+
+
+@needs_unix_socket
+def test_unix_socket_round_trip(serve, tmp_path):
+    socket_path = str(tmp_path / "kure.sock")
+    serve(socket_path=socket_path)
+    model = RemoteEmbeddingModel(f"unix://{socket_path}", timeout=5)
+    try:
+        embeddings = model.encode(["a", "abcd"])
+        assert embeddings.dtype == np.float32 and embeddings.shape == (2, DIM)
+        np.testing.assert_array_equal(embeddings, encode_lengths(["a", "abcd"]))
+
+        # 문자열 하나면 1차원, 빈 목록이면 (0, dim)
+        assert model.encode("abc").tolist() == [3.0, 1.0, -0.5]
+        assert model.encode([]).shape == (0, DIM)
+        assert model.health()["dim"] == DIM
+    finally:
+        model.close()
+
+
+def test_tcp_round_trip_and_errors(serve):
+    server = serve(host="127.0.0.1", port=0)
+    model = RemoteEmbeddingModel(f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+    try:
+        assert model.encode(["xy"])[0, 0] == 2
+
+        response, body = model._request("POST", "/encode", b'{"texts": "not a list"}')
+        assert response.status == 400
+
+        def failing(texts):
+            raise ValueError("model failed")
+
+        server.scheduler.encode_fn = failing
+        with pytest.raises(RuntimeError, match="500"):
+            model.encode(["xy"])
+    finally:
+        model.close()
+
+
+@needs_unix_socket
+def test_client_reconnects_after_server_restart(serve, tmp_path):
+    socket_path = str(tmp_path / "kure.sock")
+    first = serve(socket_path=socket_path)
+    model = RemoteEmbeddingModel(f"unix://{socket_path}", timeout=5)
+    try:
+        assert model.encode(["a"])[0, 0] == 1
+        # keep-alive 연결이 끊겨도 한 번 다시 연결
+        first.shutdown()
+        first.server_close()
+        serve(socket_path=socket_path)
+        assert model.encode(["ab"])[0, 0] == 2
+    finally:
+        model.close()
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import pytest
+
+import id_generator
+from id_generator import (
+    ID_EPOCH_MS,
+    MAX_SEQUENCE,
+    MAX_WORKER_ID,
+    SnowflakeGenerator,
+    claim_worker_id,
+    parse_id,
+)
+
+needs_flock = pytest.mark.skipif(id_generator.fcntl is None, reason="fcntl.flock이 필요합니다.")
+
+
+@pytest.fixture
+def frozen_time(monkeypatch):
+    now = [(ID_EPOCH_MS + 123) / 1000]
+    monkeypatch.setattr("id_generator.time.time", lambda: now[0])
+    return now
+
+
+def test_ids_increase_within_and_across_threads():
+    generator = SnowflakeGenerator(worker_id=7)
+    ids = [generator.next_id() for _ in range(10000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+    issued = []
+
+    def work():
+        local = [generator.next_id() for _ in range(2000)]
+        assert local == sorted(local)
+        issued.extend(local)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(issued)) == 8000 and min(issued) > ids[-1]
+
+
+def test_bit_layout_and_parse(frozen_time):
+    generator = SnowflakeGenerator(worker_id=MAX_WORKER_ID)
+    first, second = generator.next_id(), generator.next_id()
+
+    assert first == (123 << 22) | (MAX_WORKER_ID << 12)
+    assert parse_id(first) == {"timestamp_ms": ID_EPOCH_MS + 123, "worker_id": MAX_WORKER_ID, "sequence": 0}
+    assert parse_id(second)["sequence"] == 1
+    assert first.bit_length() <= 63
+
+
+def test_sequence_overflow_and_clock_rollback_stay_monotonic(frozen_time):
+    generator = SnowflakeGenerator(worker_id=1)
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 2)]
+    # 시퀀스를 다 쓰면 다음 ms를 미리 사용
+    assert parse_id(ids[-1]) == {"timestamp_ms": ID_EPOCH_MS + 124, "worker_id": 1, "sequence": 0}
+
+    frozen_time[0] -= 1
+    assert generator.next_id() > ids[-1]
+
+
+def test_rejects_out_of_range_worker_id():
+    with pytest.raises(ValueError):
+        SnowflakeGenerator(worker_id=MAX_WORKER_ID + 1)
+
+
+@needs_flock
+def test_claim_worker_id_is_unique_until_released(tmp_path):
+    lock_dir = str(tmp_path)
+    first_id, first_file = claim_worker_id(lock_dir)
+    second_id, second_file = claim_worker_id(lock_dir)
+    assert (first_id, second_id) == (0, 1)
+
+    first_file.close()
+    assert claim_worker_id(lock_dir)[0] == 0
+    second_file.close()
+
+
+@needs_flock
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork가 필요합니다.")
+def test_forked_child_closes_inherited_lock(tmp_path):
+    lock_dir = str(tmp_path)
+    generator = SnowflakeGenerator(lock_dir=lock_dir)
+    assert generator.worker_id == 0
+
+    ready_r, ready_w = os.pipe()
+    done_r, done_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # 자식: 부모의 잠금 파일은 닫히고, 새 워커 ID를 확보
+        try:
+            ok = generator._lock_file is None and generator.worker_id == 1
+            os.write(ready_w, b"1" if ok else b"0")
+            os.read(done_r, 1)
+        finally:
+            os._exit(0)
+
+    try:
+        assert os.read(ready_r, 1) == b"1"
+        # 자식이 살아 있어도 부모가 닫으면 워커 ID 0이 반환됨
+        generator.close()
+        worker_id, lock_file = claim_worker_id(lock_dir)
+        assert worker_id == 0
+        lock_file.close()
+    finally:
+        os.write(done_w, b"1")
+        os.waitpid(pid, 0)
+        for fd in (ready_r, ready_w, done_r, done_w):
+            os.close(fd)
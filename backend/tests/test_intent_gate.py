@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from intent_gate import IntentGate, evaluate, load_labeled_csv, recommend_margins
+
+
+@pytest.fixture
+def labeled(rng):
+    """일반 대화/업무 요청이 두 방향으로 나뉜 임베딩"""
+    chat_center = np.zeros(16, dtype=np.float32)
+    chat_center[0] = 1.0
+    assign_center = np.zeros(16, dtype=np.float32)
+    assign_center[1] = 1.0
+    chat = chat_center + rng.normal(scale=0.2, size=(100, 16))
+    assign = assign_center + rng.normal(scale=0.2, size=(100, 16))
+    return np.vstack([chat, assign]).astype(np.float32), ["chat"] * 100 + ["assign"] * 100
+
+
+def test_fit_and_classify(labeled):
+    embeddings, labels = labeled
+    gate = IntentGate.fit(embeddings, labels, chat_margin=0.2, assign_margin=0.2)
+    assert gate.classify(embeddings[0])[0] == IntentGate.CHAT
+    assert gate.classify(embeddings[150])[0] == IntentGate.ASSIGN
+
+    label, margin = gate.classify(gate.chat_centroid + gate.assign_centroid)
+    assert label == IntentGate.UNCERTAIN and margin == pytest.approx(0.0, abs=1e-5)
+
+
+def test_fit_requires_both_labels(labeled):
+    embeddings, _ = labeled
+    with pytest.raises(ValueError):
+        IntentGate.fit(embeddings, ["chat"] * len(embeddings))
+
+
+def test_save_load_roundtrip(labeled, tmp_path):
+    embeddings, labels = labeled
+    gate = IntentGate.fit(embeddings, labels)
+    path = str(tmp_path / "gate" / "intent_gate.npz")
+    gate.save(path)
+    loaded = IntentGate.load(path, chat_margin=0.3, assign_margin=0.1)
+    np.testing.assert_allclose(loaded.assign_centroid, gate.assign_centroid)
+    assert loaded.chat_margin == 0.3 and loaded.assign_margin == 0.1
+
+
+def test_evaluate_and_recommend_margins(labeled):
+    embeddings, labels = labeled
+    gate = IntentGate.fit(embeddings, labels)
+    # 경계에 가까운 문의의 라벨을 뒤집어 작은 margin에서는 precision이 떨어지게 함
+    queries = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = queries @ gate.assign_centroid - queries @ gate.chat_centroid
+    flipped = np.argsort(np.abs(scores))[:10]
+    noisy = list(labels)
+    for row in flipped:
+        noisy[row] = "assign" if noisy[row] == "chat" else "chat"
+    safe_margin = float(np.abs(scores[flipped]).max()) + 1e-3
+
+    report = evaluate(gate, embeddings, noisy, margins=(0.0, safe_margin, 5.0))
+    assert report["samples"] == 200
+    first, _, last = report["by_margin"]
+    assert first["chat_coverage"] + first["assign_coverage"] == pytest.approx(1.0)
+    assert min(first["chat_precision"], first["assign_precision"]) < 1.0
+    assert last["chat_coverage"] == 0.0 and last["chat_precision"] is None
+
+    assert recommend_margins(report, min_precision=1.0) == {"chat_margin": safe_margin, "assign_margin": safe_margin}
+    assert recommend_margins(evaluate(gate, embeddings, noisy, margins=(0.0,)), 1.0) == {
+        "chat_margin": None, "assign_margin": None
+    }
+
+
+def test_load_labeled_csv_skips_unknown_labels(tmp_path):
+    path = tmp_path / "labeled.csv"
+    path.write_text("text,label\n안녕하세요,chat\n환불 문의,ASSIGN\n기타,spam\n,chat\n", encoding="utf-8")
+    assert load_labeled_csv(str(path)) == (["안녕하세요", "환불 문의"], ["chat", "assign"])
+
+
+def test_intent_gate_disabled_by_default(monkeypatch):
+    agent = pytest.importorskip("agent", reason="에이전트 의존성이 필요합니다.")
+    monkeypatch.delenv("INTENT_GATE_ENABLED", raising=False)
+    assert not agent.intent_gate_enabled()
+    monkeypatch.setenv("INTENT_GATE_ENABLED", "true")
+    assert agent.intent_gate_enabled()
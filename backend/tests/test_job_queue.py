@@ -0,0 +1,139 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from job_queue import DurableJobQueue, JobQueueFull, owner_alive
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def dead_owner() -> str:
+    """이미 종료된 같은 호스트 프로세스의 owner 값"""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def test_enqueue_claim_complete(queue_path):
+    queue = DurableJobQueue(queue_path)
+    assert queue.enqueue("1", {"msg_id": 1})
+    assert not queue.enqueue("1", {"msg_id": 1})
+
+    job = queue.claim()
+    assert job["job_id"] == "1" and job["payload"] == {"msg_id": 1} and job["attempts"] == 1
+    assert queue.claim() is None
+
+    queue.complete("1", {"dept_ids": [2]})
+    stored = queue.get("1")
+    assert stored["status"] == DurableJobQueue.DONE and stored["result"] == {"dept_ids": [2]}
+    assert queue.enqueue("1", {"msg_id": 1})
+
+
+def test_delayed_job_not_claimed_early(queue_path):
+    queue = DurableJobQueue(queue_path)
+    queue.enqueue("1", {}, delay_seconds=60)
+    assert queue.claim() is None
+    assert 55 < queue.next_due_in() <= 60
+
+
+def test_backoff_until_max_attempts(queue_path):
+    queue = DurableJobQueue(queue_path, max_attempts=3, retry_base_seconds=10, retry_max_seconds=25)
+    queue.enqueue("1", {})
+
+    delays = []
+    for attempt in range(1, 4):
+        job = queue.claim()
+        assert job["attempts"] == attempt
+        delays.append(queue.fail("1", job["attempts"], "boom"))
+        if delays[-1] is not None:
+            assert queue.claim() is None
+            queue._conn.execute("UPDATE assign_job SET next_run_at = 0 WHERE job_id = '1'")
+
+    assert 8 <= delays[0] <= 12
+    assert 16 <= delays[1] <= 24
+    assert delays[2] is None
+    stored = queue.get("1")
+    assert stored["status"] == DurableJobQueue.FAILED and stored["error"] == "boom"
+    assert 0.8 * 25 <= queue.backoff_seconds(10) <= 1.2 * 25
+
+
+def test_max_depth_counts_unfinished_jobs(queue_path):
+    queue = DurableJobQueue(queue_path, max_depth=2)
+    queue.enqueue("1", {})
+    queue.enqueue("2", {})
+    assert not queue.has_capacity()
+    with pytest.raises(JobQueueFull):
+        queue.enqueue("3", {})
+
+    job = queue.claim()
+    assert queue.depth() == 2
+    queue.complete(job["job_id"])
+    assert queue.has_capacity()
+    assert queue.enqueue("3", {})
+
+
+def test_deferred_jobs_do_not_count_toward_depth(queue_path):
+    queue = DurableJobQueue(queue_path, max_depth=2)
+    for i in range(5):
+        queue.enqueue(f"deferred-{i}", {}, delay_seconds=60)
+    assert queue.depth() == 0 and queue.deferred() == 5
+    queue.enqueue("1", {})
+    queue.enqueue("2", {})
+    with pytest.raises(JobQueueFull):
+        queue.enqueue("3", {})
+
+    # 재시도 대기 중인 작업은 계속 포함
+    job = queue.claim()
+    queue.fail(job["job_id"], job["attempts"], "boom")
+    assert queue.depth() == 2 and queue.deferred() == 5
+
+
+def test_force_enqueue_ignores_max_depth(queue_path):
+    queue = DurableJobQueue(queue_path, max_depth=1)
+    queue.enqueue("1", {})
+    assert queue.enqueue("2", {}, force=True)
+    assert queue.depth() == 2
+
+
+def test_recover_requeues_jobs_of_dead_process(queue_path):
+    queue = DurableJobQueue(queue_path)
+    crashed = DurableJobQueue(queue_path)
+    crashed.owner = dead_owner()
+    remote = DurableJobQueue(queue_path)
+    remote.owner = "other-host:1"
+    assert not owner_alive(crashed.owner) and owner_alive(remote.owner)
+
+    queue.enqueue("1", {})
+    queue.enqueue("2", {})
+    crashed.claim()
+    remote.claim()
+
+    assert queue.recover() == 1
+    job = queue.claim()
+    assert job["job_id"] == "1" and job["attempts"] == 2
+    assert queue.get("2")["status"] == DurableJobQueue.RUNNING
+
+
+def test_expired_lease_is_reclaimed(queue_path):
+    queue = DurableJobQueue(queue_path, lease_seconds=0.05)
+    stalled = DurableJobQueue(queue_path, lease_seconds=0.05)
+    stalled.owner = "other-host:1"
+    queue.enqueue("1", {})
+    stalled.claim()
+    assert queue.claim() is None
+
+    time.sleep(0.1)
+    job = queue.claim()
+    assert job["job_id"] == "1" and job["attempts"] == 2
+
+    # 리스를 잃은 이전 소유자의 완료 기록은 무시
+    stalled.complete("1", "late")
+    assert queue.get("1")["status"] == DurableJobQueue.RUNNING
+    queue.complete("1", "ok")
+    assert queue.get("1")["result"] == "ok"
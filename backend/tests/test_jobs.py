@@ -0,0 +1,156 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from job_queue import DurableJobQueue, JobQueueFull
+from jobs import JobManager
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FlakyQueue(DurableJobQueue):
+    """complete 기록이 한 번 실패하는 대기열"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.complete_errors = 1
+
+    def complete(self, job_id, result=None) -> None:
+        if self.complete_errors:
+            self.complete_errors -= 1
+            raise sqlite3.OperationalError("database is locked")
+        super().complete(job_id, result)
+
+
+class BrokenEnqueueQueue(DurableJobQueue):
+    """enqueue 기록이 errors회 실패하는 대기열"""
+
+    def __init__(self, *args, errors: int = 1, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.enqueue_errors = errors
+
+    def enqueue(self, *args, **kwargs) -> bool:
+        if self.enqueue_errors:
+            self.enqueue_errors -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return super().enqueue(*args, **kwargs)
+
+
+def test_runs_submitted_jobs(tmp_path):
+    manager = JobManager(lambda payload: payload["value"] * 2, DurableJobQueue(str(tmp_path / "q.db")), workers=2, poll_interval=0.05)
+    try:
+        for i in range(5):
+            assert manager.submit(i, {"value": i})
+        assert wait_for(lambda: all((manager.get(i) or {}).get("status") == "done" for i in range(5)))
+        assert [manager.get(i)["result"] for i in range(5)] == [0, 2, 4, 6, 8]
+        assert manager.stats()["done"] == 5
+    finally:
+        manager.close()
+
+
+def test_failed_job_is_retried(tmp_path):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError("일시적 오류")
+        return "ok"
+
+    queue = DurableJobQueue(str(tmp_path / "q.db"), retry_base_seconds=0.01)
+    manager = JobManager(handler, queue, workers=1, poll_interval=0.02)
+    try:
+        manager.submit("1", {})
+        assert wait_for(lambda: manager.get("1")["status"] == "done")
+        assert len(calls) == 2 and manager.get("1")["attempts"] == 2
+        assert manager.stats()["retried"] == 1
+    finally:
+        manager.close()
+
+
+def test_worker_survives_queue_errors(tmp_path):
+    calls = []
+    queue = FlakyQueue(str(tmp_path / "q.db"), lease_seconds=0.1)
+    manager = JobManager(calls.append, queue, workers=1, poll_interval=0.02)
+    try:
+        manager.submit("1", {"n": 1})
+        # complete 기록 실패 후 리스가 만료되면 같은 작업을 다시 실행해 완료
+        assert wait_for(lambda: manager.get("1")["status"] == "done")
+        assert len(calls) == 2
+        manager.submit("2", {"n": 2})
+        assert wait_for(lambda: manager.get("2")["status"] == "done")
+        assert all(thread.is_alive() for thread in manager._threads)
+    finally:
+        manager.close()
+
+
+def test_close_leaves_queued_jobs_for_next_start(tmp_path):
+    path = str(tmp_path / "q.db")
+    release = threading.Event()
+    manager = JobManager(lambda payload: release.wait(5), DurableJobQueue(path), workers=1, poll_interval=0.02)
+    manager.submit("1", {})
+    manager.submit("2", {}, delay_seconds=60)
+    assert wait_for(lambda: manager.get("1")["status"] == "running")
+    release.set()
+    manager.close()
+
+    queue = DurableJobQueue(path)
+    assert queue.get("1")["status"] == "done"
+    assert queue.get("2")["status"] == "queued"
+
+
+def test_forced_submit_is_not_rejected(tmp_path):
+    manager = JobManager(lambda payload: None, DurableJobQueue(str(tmp_path / "q.db"), max_depth=1), workers=0)
+    manager.submit("1", {})
+    with pytest.raises(JobQueueFull):
+        manager.submit("2", {})
+    assert manager.submit("2", {}, force=True)
+    assert manager.get("2")["status"] == "queued"
+    stats = manager.stats()
+    assert stats["rejected"] == 1 and stats["forced"] == 1
+
+
+def test_forced_submit_keeps_job_when_queue_write_fails(tmp_path):
+    queue = BrokenEnqueueQueue(str(tmp_path / "q.db"), errors=2)
+    with pytest.raises(sqlite3.OperationalError):
+        JobManager(lambda payload: None, queue, workers=0).submit("0", {})
+
+    calls = []
+    manager = JobManager(calls.append, queue, workers=1, poll_interval=0.02)
+    try:
+        assert manager.submit("1", {"n": 1}, force=True)
+        assert manager.stats()["unqueued"] == 1
+        # 작업 스레드가 대기열에 다시 등록해 실행
+        assert wait_for(lambda: (manager.get("1") or {}).get("status") == "done")
+        assert calls == [{"n": 1}] and manager.stats()["unqueued_pending"] == 0
+    finally:
+        manager.close()
+
+
+def test_waits_for_slot_before_claiming(tmp_path):
+    from admission import AdmissionController
+
+    controller = AdmissionController(rate=0, max_in_flight=1)
+    queue = DurableJobQueue(str(tmp_path / "q.db"), lease_seconds=0.05)
+    calls = []
+    manager = JobManager(calls.append, queue, workers=2, poll_interval=0.02, slot=controller.slot)
+    try:
+        with controller.slot():
+            manager.submit("1", {"value": 1})
+            time.sleep(0.2)
+            # 자리를 기다리는 동안에는 꺼내지 않으므로 리스가 시작되지 않음
+            assert manager.get("1")["status"] == "queued" and manager.get("1")["attempts"] == 0
+        assert wait_for(lambda: (manager.get("1") or {}).get("status") == "done")
+        time.sleep(0.1)
+        assert calls == [{"value": 1}]
+    finally:
+        manager.close()
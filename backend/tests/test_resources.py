@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from resources import ResourceRegistry
+
+
+def test_concurrent_get_builds_once():
+    registry = ResourceRegistry()
+    builds = []
+
+    def factory():
+        builds.append(1)
+        time.sleep(0.05)  # 느린 모델 로드 동안 다른 스레드가 몰려옴
+        return object()
+
+    registry.register("model", factory)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(registry.get("model"))) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert all(value is values[0] for value in values)
+    assert registry.stats()["model"]["build_count"] == 1
+
+
+def test_failed_build_is_counted_and_retried():
+    registry = ResourceRegistry()
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model download failed")
+        return "model"
+
+    registry.register("model", factory)
+    with pytest.raises(RuntimeError):
+        registry.get("model")
+    assert not registry.is_initialized("model")
+
+    assert registry.get("model") == "model"
+    stats = registry.stats()["model"]
+    assert (stats["failure_count"], stats["build_count"]) == (1, 1)
+
+
+def test_close_runs_closers_in_reverse_order_and_rebuilds_on_next_get():
+    registry = ResourceRegistry()
+    closed = []
+    registry.register("client", lambda: "client", closer=closed.append)
+    registry.register("scheduler", lambda: "scheduler", closer=closed.append)
+    registry.register("unused", lambda: "unused", closer=closed.append)
+    registry.init(["client", "scheduler"])
+
+    registry.close()
+    # 초기화되지 않은 리소스는 닫지 않음
+    assert closed == ["scheduler", "client"]
+    assert not registry.is_initialized("client")
+
+    assert registry.get("client") == "client"
+    assert registry.stats()["client"]["build_count"] == 2
+    assert registry.stats()["client"]["close_count"] == 1
+
+
+def test_closer_error_does_not_stop_shutdown():
+    registry = ResourceRegistry()
+    closed = []
+
+    def broken(value):
+        raise OSError("already closed")
+
+    registry.register("first", lambda: "first", closer=closed.append)
+    registry.register("second", lambda: "second", closer=broken)
+    registry.init()
+
+    registry.close()
+    assert closed == ["first"]
+    assert not registry.is_initialized("second")
+
+
+def test_register_again_closes_previous_value():
+    registry = ResourceRegistry()
+    closed = []
+    registry.register("model", lambda: "old", closer=closed.append)
+    registry.get("model")
+
+    registry.register("model", lambda: "new", closer=closed.append)
+    assert closed == ["old"]
+    assert registry.get("model") == "new"
+
+
+def test_unknown_resource_raises_key_error():
+    with pytest.raises(KeyError):
+        ResourceRegistry().get("missing")
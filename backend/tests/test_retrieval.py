@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from retrieval import ExactBackend, IVFBackend, create_backend, recall_report
+
+from .conftest import unit_rows
+
+
+def _noisy_queries(vectors, rng, n=50, noise=0.05):
+    rows = rng.choice(vectors.shape[0], size=n, replace=False)
+    return unit_rows(vectors[rows] + rng.normal(scale=noise, size=(n, vectors.shape[1])))
+
+
+def test_exact_backend_returns_sorted_top_k(clustered_vectors, rng):
+    query = _noisy_queries(clustered_vectors, rng, n=1)
+    rows, scores = ExactBackend().build(clustered_vectors).search(query, 5)[0]
+    expected = np.argsort(-(clustered_vectors @ query[0]))[:5]
+    np.testing.assert_array_equal(rows, expected)
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_exact_backend_empty_index():
+    rows, scores = ExactBackend().search(np.ones((1, 4), dtype=np.float32), 3)[0]
+    assert rows.size == 0 and scores.size == 0
+
+
+def test_ivf_recall_against_exact(clustered_vectors, rng):
+    queries = _noisy_queries(clustered_vectors, rng)
+    backend = IVFBackend(n_lists=20, n_probe=4).build(clustered_vectors)
+    assert recall_report(clustered_vectors, queries, backend, k=10)["recall_at_k"] >= 0.9
+    backend.set_params(n_probe=20)
+    assert recall_report(clustered_vectors, queries, backend, k=10)["recall_at_k"] == 1.0
+
+
+def test_ivf_save_load_and_rebuild(clustered_vectors, tmp_path):
+    backend = IVFBackend(n_lists=16).build(clustered_vectors)
+    backend.save(str(tmp_path))
+    loaded = IVFBackend(n_lists=16)
+    assert loaded.load(str(tmp_path), clustered_vectors)
+    np.testing.assert_array_equal(loaded.list_rows, backend.list_rows)
+    # 행 수가 다르면 저장된 색인을 쓰지 않음
+    assert not IVFBackend(n_lists=16).load(str(tmp_path), clustered_vectors[:10])
+
+    grown = np.vstack([clustered_vectors, clustered_vectors[:5]])
+    rebuilt = backend.rebuild(grown)
+    np.testing.assert_array_equal(rebuilt.centroids, backend.centroids)
+    assert int(rebuilt.list_offsets[-1]) == grown.shape[0]
+
+
+def test_hnsw_recall_against_exact_with_k_above_ef(clustered_vectors, rng):
+    pytest.importorskip("hnswlib")
+    from retrieval import HNSWBackend
+
+    queries = _noisy_queries(clustered_vectors, rng)
+    backend = HNSWBackend(ef_search=8).build(clustered_vectors)
+    assert recall_report(clustered_vectors, queries, backend, k=10)["recall_at_k"] >= 0.9
+    # k > ef_search여도 공유 색인의 ef를 바꾸지 않고 k개를 반환
+    rows, scores = backend.search(queries[:1], 32)[0]
+    assert len(rows) == 32 and np.all(np.diff(scores) <= 1e-6)
+    assert backend.index.ef == 8
+
+
+def test_matches_compares_build_params_only():
+    saved = {"name": "ivf", "params": IVFBackend(n_lists=16, n_probe=4).params()}
+    assert IVFBackend(n_lists=16, n_probe=32).matches(saved)
+    assert not IVFBackend(n_lists=32, n_probe=4).matches(saved)
+    assert not ExactBackend().matches(saved)
+
+
+def test_create_backend_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        create_backend("faiss")
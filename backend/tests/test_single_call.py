@@ -0,0 +1,51 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+agent = pytest.importorskip("agent", reason="LangGraph/Supabase 의존성이 필요합니다.")
+
+
+CANDIDATES = [
+    {"dept_id": 3, "dept_name": "환불팀", "dept_desc": "결제 취소/환불", "similarity": 0.72},
+    {"dept_id": "cs-5", "dept_name": "배송팀", "dept_desc": "배송 조회/지연", "similarity": 0.61},
+]
+
+
+def test_request_limits_dept_ids_to_candidates():
+    request, id_map = agent.build_single_call_request("환불해 주세요", CANDIDATES)
+
+    assert id_map == {"3": 3, "cs-5": "cs-5"}
+    schema = request["response_format"]["json_schema"]
+    assert schema["strict"] is True
+    assert schema["schema"]["properties"]["dept_ids"]["items"]["enum"] == ["3", "cs-5"]
+    assert schema["schema"]["properties"]["action"]["enum"] == ["chat", "assign"]
+    assert "환불해 주세요" in request["messages"][-1]["content"]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    # 문자열 ID는 원래 타입으로, 후보 밖 ID와 중복은 제거
+    ({"action": "assign", "dept_ids": ["3", "99", "3", "cs-5"]}, {"action": "assign", "dept_ids": [3, "cs-5"]}),
+    ({"action": "chat", "dept_ids": []}, {"action": "chat"}),
+    # 배정이라고 했지만 유효한 부서가 없으면 채팅으로 처리
+    ({"action": "assign", "dept_ids": ["99"]}, {"action": "chat"}),
+    ({"action": "assign"}, {"action": "chat"}),
+])
+def test_parse_decision(raw, expected):
+    _, id_map = agent.build_single_call_request("문의", CANDIDATES)
+    assert agent.parse_single_call_decision(json.dumps(raw), id_map) == expected
+
+
+def test_route_single_call_makes_one_llm_request(monkeypatch):
+    requests = []
+
+    def create(**request):
+        requests.append(request)
+        content = json.dumps({"action": "assign", "dept_ids": ["cs-5"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(agent, "get_openai_client", lambda: client)
+
+    assert agent.route_single_call("배송이 안 와요", CANDIDATES) == {"action": "assign", "dept_ids": ["cs-5"]}
+    assert len(requests) == 1
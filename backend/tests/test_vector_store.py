@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from vector_store import VectorStore, quantize, scales_path
+
+from .conftest import unit_rows
+
+
+@pytest.fixture
+def matrix(rng):
+    return unit_rows(rng.normal(size=(300, 128)))
+
+
+@pytest.mark.parametrize("dtype, max_error", [("float32", 1e-6), ("float16", 1e-3), ("int8", 1e-2)])
+def test_score_error_within_bound(matrix, rng, dtype, max_error):
+    queries = unit_rows(rng.normal(size=(10, 128)))
+    store = VectorStore.from_array(matrix, dtype)
+    error = np.abs(store.score(queries) - queries @ matrix.T)
+    assert store.dtype == dtype
+    assert error.max() < max_error
+
+
+def test_int8_compression_and_scales(matrix):
+    data, scales = quantize(matrix, "int8")
+    assert data.dtype == np.int8
+    assert scales.shape == (matrix.shape[0],)
+    assert np.abs(data).max() == 127
+    store = VectorStore(data, scales)
+    assert store.nbytes < matrix.nbytes / 3
+
+
+def test_chunked_score_matches_single_block(matrix, rng):
+    store = VectorStore.from_array(matrix, "int8")
+    query = unit_rows(rng.normal(size=(1, 128)))
+    np.testing.assert_allclose(store.score(query, chunk_rows=7), store.score(query), rtol=1e-6, atol=1e-6)
+
+
+def test_save_and_mmap_load_roundtrip(matrix, tmp_path):
+    path = str(tmp_path / "embeddings.npy")
+    store = VectorStore.from_array(matrix, "int8")
+    store.save(path)
+    loaded = VectorStore.load(path, mmap=True)
+    assert loaded.dtype == "int8"
+    assert (tmp_path / "embeddings.scales.npy").exists() and scales_path(path).endswith(".scales.npy")
+    np.testing.assert_array_equal(loaded.to_float32(), store.to_float32())
+
+
+def test_rejects_unknown_dtype(matrix):
+    with pytest.raises(ValueError):
+        quantize(matrix, "bfloat16")
+
+
+def test_load_rejects_scales_from_other_save(matrix, tmp_path):
+    path = str(tmp_path / "embeddings.npy")
+    VectorStore.from_array(matrix, "int8").save(path)
+    VectorStore.from_array(matrix[:5], "int8").save(str(tmp_path / "other.npy"))
+    (tmp_path / "other.scales.npy").replace(scales_path(path))
+    with pytest.raises(ValueError):
+        VectorStore.load(path)
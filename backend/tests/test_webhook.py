@@ -0,0 +1,197 @@
+import importlib
+import itertools
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+server = pytest.importorskip("app", reason="Flask/에이전트 의존성이 필요합니다.")
+
+from admission import AdmissionController
+from dedup import WebhookDeduplicator
+from job_queue import DurableJobQueue
+from jobs import JobManager
+
+
+class FakeSupabase:
+    """message INSERT만 기록하는 Supabase 클라이언트 대역"""
+
+    def __init__(self) -> None:
+        self.rows = []
+        self.insert_error = None
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeQuery:
+    def __init__(self, db: FakeSupabase, name: str) -> None:
+        self.db = db
+        self.name = name
+        self.row = None
+
+    def insert(self, row):
+        self.row = row
+        return self
+
+    def execute(self):
+        if self.db.insert_error:
+            raise Exception(self.db.insert_error)
+        self.db.rows.append((self.name, self.row))
+        return SimpleNamespace(data=[self.row])
+
+
+class BrokenEnqueueQueue(DurableJobQueue):
+    def enqueue(self, *args, **kwargs) -> bool:
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+@pytest.fixture
+def webhook(tmp_path, monkeypatch):
+    """create_app 없이 임시 파일/대역으로 서버 리소스를 채운 테스트 클라이언트"""
+    db = FakeSupabase()
+    ids = itertools.count(1000)
+    assigned = []
+    writer = ThreadPoolExecutor(max_workers=2)
+    state = SimpleNamespace(db=db, assigned=assigned, client=server.app.test_client())
+
+    def use_queue(queue):
+        manager = JobManager(lambda payload: None, queue, workers=0)
+        monkeypatch.setattr(server, "job_manager", manager)
+        state.jobs = manager
+        return manager
+
+    state.use_queue = use_queue
+    use_queue(DurableJobQueue(str(tmp_path / "jobs.sqlite3")))
+    state.dedup = WebhookDeduplicator(path=str(tmp_path / "dedup.sqlite3"))
+    monkeypatch.setattr(server, "supabase", db)
+    monkeypatch.setattr(server, "webhook_dedup", state.dedup)
+    monkeypatch.setattr(server, "admission_control", AdmissionController(rate=0, max_in_flight=0))
+    monkeypatch.setattr(server, "_message_writer", writer)
+    monkeypatch.setattr(server, "next_message_id", lambda: next(ids))
+    monkeypatch.setattr(server, "assign_message", lambda msg_id, content, top_k=5, tenant=None: assigned.append(msg_id) or 1)
+    monkeypatch.setenv("WEBHOOK_ASYNC", "true")
+    yield state
+    writer.shutdown(wait=True)
+    state.dedup.close()
+
+
+def post(state, message_id="m1", text="환불 문의드립니다"):
+    return state.client.post(
+        "/webhook", json={"entity": {"id": message_id, "chatId": "c1", "plainText": text}}
+    )
+
+
+def test_async_webhook_queues_job_and_dedups_redelivery(webhook):
+    first = post(webhook)
+    assert first.status_code == 202
+    msg_id = first.get_json()["msg_id"]
+    assert webhook.jobs.get(msg_id)["status"] == "queued"
+
+    again = post(webhook)
+    assert again.status_code == 200 and again.get_json()["msg_id"] == msg_id
+    assert len(webhook.db.rows) == 1
+
+
+def test_full_queue_after_save_still_accepts(webhook, tmp_path, monkeypatch):
+    manager = webhook.use_queue(DurableJobQueue(str(tmp_path / "full.sqlite3"), max_depth=1))
+    manager.submit("other", {})
+    # 저장 전 확인은 통과했지만 저장하는 사이 대기열이 찬 경우
+    monkeypatch.setattr(manager, "has_capacity", lambda: True)
+
+    response = post(webhook)
+    assert response.status_code == 202
+    msg_id = response.get_json()["msg_id"]
+    assert manager.get(msg_id)["status"] == "queued"
+    assert manager.stats()["forced"] == 1
+
+
+def test_queue_write_error_after_save_still_accepts(webhook, tmp_path):
+    manager = webhook.use_queue(BrokenEnqueueQueue(str(tmp_path / "broken.sqlite3")))
+    response = post(webhook)
+    assert response.status_code == 202
+    assert manager.get(response.get_json()["msg_id"])["status"] == "unqueued"
+
+
+def test_full_queue_before_save_rejects_without_storing(webhook, tmp_path):
+    manager = webhook.use_queue(DurableJobQueue(str(tmp_path / "full.sqlite3"), max_depth=1))
+    manager.submit("other", {})
+    response = post(webhook)
+    assert response.status_code == 429 and "Retry-After" in response.headers
+    assert webhook.db.rows == []
+
+
+def test_redelivery_after_rejected_enqueue_is_processed(webhook, tmp_path):
+    manager = webhook.use_queue(DurableJobQueue(str(tmp_path / "full.sqlite3"), max_depth=1))
+    manager.submit("other", {})
+    assert post(webhook).status_code == 429
+
+    # 메시지를 저장하지 않았으므로 키를 남기지 않고, 자리가 나면 재전송을 처리
+    manager.queue.complete(manager.queue.claim()["job_id"])
+    again = post(webhook)
+    assert again.status_code == 202
+    assert manager.get(again.get_json()["msg_id"])["status"] == "queued"
+    assert len(webhook.db.rows) == 1
+
+
+def test_redelivery_after_save_failure_is_processed(webhook):
+    webhook.db.insert_error = "connection reset"
+    assert post(webhook).status_code == 500
+
+    webhook.db.insert_error = None
+    assert post(webhook).status_code == 202
+    assert len(webhook.db.rows) == 1
+
+
+def test_stored_message_keeps_key_when_sync_assignment_errors(webhook, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_ASYNC", "false")
+
+    def fail_assignment(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server, "run_webhook_assignment", fail_assignment)
+    first = post(webhook)
+    assert first.status_code == 500
+    msg_id = first.get_json()["msg_id"]
+
+    # INSERT는 성공했으므로 재전송은 같은 메시지로 응답하고 다시 저장하지 않음
+    again = post(webhook)
+    assert again.status_code == 200 and again.get_json()["msg_id"] == msg_id
+    assert len(webhook.db.rows) == 1
+
+
+def test_sync_webhook_assigns_inline(webhook, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_ASYNC", "false")
+    response = post(webhook)
+    assert response.status_code == 200
+    assert webhook.assigned == [str(response.get_json()["msg_id"])]
+    assert server.admission_control.in_flight == 0
+
+
+@pytest.mark.parametrize("async_mode", ["true", "false"])
+def test_failed_save_does_not_spend_channel_token(webhook, monkeypatch, async_mode):
+    monkeypatch.setenv("WEBHOOK_ASYNC", async_mode)
+    controller = AdmissionController(rate=0.001, burst=1, max_in_flight=0)
+    monkeypatch.setattr(server, "admission_control", controller)
+    webhook.db.insert_error = "connection reset"
+    assert post(webhook).status_code == 500
+
+    webhook.db.insert_error = None
+    response = post(webhook)
+    assert response.status_code in (200, 202)
+    assert response.get_json().get("admission", "admit") == AdmissionController.ADMIT
+    assert controller.stats()["admit"] - controller.stats()["refunded"] == 1
+
+
+def test_wsgi_entry_point_initializes_app(monkeypatch):
+    # gunicorn wsgi:app / flask run은 create_app()으로 초기화된 앱을 받아야 함
+    calls = []
+    monkeypatch.setattr(server, "create_app", lambda: calls.append(1) or server.app)
+    sys.modules.pop("wsgi", None)
+    try:
+        wsgi = importlib.import_module("wsgi")
+        assert wsgi.app is server.app and calls == [1]
+    finally:
+        sys.modules.pop("wsgi", None)
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Optional
+
+import numpy as np
+
+
+# 지원하는 저장 형식
+# - float32: 원본 그대로
+# - float16: 절반 크기, 점수 오차는 1e-5 수준 (NumPy의 float16 변환이 느려 점수 계산은 float32보다 느림)
+# - int8: 행별 scale을 둔 대칭 스칼라 양자화 (약 1/4 크기, 점수 오차는 1e-3 이하)
+DTYPES = ("float32", "float16", "int8")
+
+# 점수 계산 시 한 번에 float32로 올리는 행 수
+# (변환한 블록이 CPU 캐시에 머무는 크기일 때 가장 빠름, 1024 x 1024차원 = 4MB)
+SCORE_CHUNK_ROWS = 1024
+
+
+def scales_path(path: str) -> str:
+    """int8 저장 시 행별 scale 파일 경로 (embeddings.npy -> embeddings.scales.npy)"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.scales{ext}"
+
+
+def quantize(matrix: np.ndarray, dtype: str = "float32") -> tuple:
+    """
+    float32 행렬을 저장 형식으로 변환
+
+    Returns:
+        (data, scales) — int8이 아니면 scales는 None
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"지원하지 않는 벡터 저장 형식입니다: {dtype} (지원: {', '.join(DTYPES)})")
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+
+    # int8: 행마다 절댓값 최대치가 127이 되도록 scale
+    max_abs = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(matrix.shape[0], dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    data = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return data, scales
+
+
+class VectorStore:
+    """
+    디스크 저장용 임베딩 행렬
+    float32 / float16 / int8 형식으로 저장하고, 로드 시 읽기 전용 mmap으로 열어
+    fork된 여러 워커가 같은 페이지를 공유합니다.
+    점수 계산은 양자화된 데이터를 행 묶음 단위로 float32로 올려 바로 수행하므로
+    전체 float32 행렬을 메모리에 만들지 않습니다.
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None) -> None:
+        if data.ndim != 2:
+            raise ValueError("벡터 저장소는 2차원 행렬이어야 합니다.")
+        if data.dtype == np.int8 and (scales is None or scales.shape[0] != data.shape[0]):
+            raise ValueError("int8 벡터에는 행별 scale이 필요합니다.")
+        self.data = data
+        self.scales = scales if data.dtype == np.int8 else None
+
+    @classmethod
+    def from_array(cls, matrix, dtype: str = "float32") -> "VectorStore":
+        """행렬(또는 다른 VectorStore)을 지정한 형식으로 변환"""
+        if isinstance(matrix, VectorStore) and matrix.dtype == dtype:
+            return matrix
+        data, scales = quantize(np.asarray(matrix, dtype=np.float32), dtype)
+        return cls(data, scales)
+
+    @property
+    def dtype(self) -> str:
+        return str(self.data.dtype)
+
+    @property
+    def shape(self) -> tuple:
+        return self.data.shape
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """행 선택 결과를 float32로 반환"""
+        block = np.asarray(self.data[rows], dtype=np.float32)
+        if self.scales is not None:
+            scales = self.scales[rows]
+            block = block * (scales[..., None] if block.ndim == 2 else scales)
+        return block
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.to_float32()
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def to_float32(self) -> np.ndarray:
+        """전체를 float32 행렬로 복원 (색인 학습 등 일회성 작업용)"""
+        return self[:]
+
+    def score(self, queries: np.ndarray, chunk_rows: int = SCORE_CHUNK_ROWS) -> np.ndarray:
+        """
+        쿼리 행렬과의 내적 (n_queries, n_rows)
+        저장 형식 그대로 행 묶음씩 float32로 올려 계산합니다.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n = self.data.shape[0]
+        scores = np.empty((queries.shape[0], n), dtype=np.float32)
+        for start in range(0, n, chunk_rows):
+            end = min(start + chunk_rows, n)
+            block = scores[:, start:end]
+            np.matmul(queries, np.asarray(self.data[start:end], dtype=np.float32).T, out=block)
+            if self.scales is not None:
+                block *= self.scales[start:end]
+        return scores
+
+    def save(self, path: str) -> None:
+        """
+        npy 파일로 저장 (임시 파일에 쓴 뒤 교체하므로 mmap 중인 워커에 영향 없음)
+        int8은 데이터와 scale 두 파일이라 같은 경로를 덮어쓰면 교체 사이에 섞여 읽힐 수 있으므로,
+        여러 프로세스가 읽는 경로는 DepartmentIndex.save처럼 저장마다 새 디렉토리에 쓰세요.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.scales is not None:
+            with open(scales_path(path) + ".tmp", "wb") as f:
+                np.save(f, self.scales)
+            os.replace(scales_path(path) + ".tmp", scales_path(path))
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, self.data)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorStore":
+        """npy 파일 로드 (mmap=True면 읽기 전용 메모리 맵)"""
+        mmap_mode = "r" if mmap else None
+        data = np.load(path, mmap_mode=mmap_mode)
+        scales = np.load(scales_path(path), mmap_mode=mmap_mode) if data.dtype == np.int8 else None
+        if scales is not None and scales.shape[0] != data.shape[0]:
+            raise ValueError(f"scale 행 수가 데이터와 일치하지 않습니다: {scales.shape[0]} != {data.shape[0]}")
+        return cls(data, scales)
+
+
+# ============================================================================
+# 정확도/메모리 벤치마크
+# ============================================================================
+
+def benchmark(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    dtypes: tuple = DTYPES,
+) -> List[dict]:
+    """
+    저장 형식별 메모리, 쿼리당 점수 계산 시간, float32 대비 recall@k와 점수 오차 비교
+    matrix와 queries는 L2 정규화된 float32 행렬이어야 합니다.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    k = min(k, matrix.shape[0])
+    reference = queries @ matrix.T
+    reference_top = np.argpartition(-reference, k - 1, axis=1)[:, :k]
+
+    reports = []
+    for dtype in dtypes:
+        store = VectorStore.from_array(matrix, dtype)
+        started = time.perf_counter()
+        for query in queries:
+            store.score(query)
+        seconds = time.perf_counter() - started
+        scores = store.score(queries)
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        hits = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(reference_top, top))
+        error = np.abs(scores - reference)
+        reports.append({
+            "dtype": dtype,
+            "bytes": store.nbytes,
+            "compression": matrix.nbytes / store.nbytes if store.nbytes else 1.0,
+            "ms_per_query": seconds * 1000 / max(1, len(queries)),
+            "recall_at_k": hits / (k * len(queries)) if len(queries) else 1.0,
+            "mean_abs_score_error": float(error.mean()),
+            "max_abs_score_error": float(error.max()),
+        })
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    사용 예:
+        python vector_store.py --index data/dept_index
+        python vector_store.py --random 50000 --dim 1024
+    """
+    parser = argparse.ArgumentParser(description="벡터 저장 형식별 정확도/메모리 리포트")
+    parser.add_argument("--index", help="embeddings.npy가 있는 부서 인덱스 디렉토리")
+    parser.add_argument("--random", type=int, default=0, help="인덱스 대신 사용할 임의 벡터 수")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    if args.index:
+        from dept_index import EMBEDDINGS_FILE, snapshot_dir
+        matrix = VectorStore.load(os.path.join(snapshot_dir(args.index), EMBEDDINGS_FILE), mmap=False).to_float32()
+    else:
+        matrix = rng.normal(size=(args.random or 10000, args.dim)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    rows = rng.choice(matrix.shape[0], size=min(args.queries, matrix.shape[0]), replace=False)
+    queries = matrix[rows] + rng.normal(scale=0.05, size=(len(rows), matrix.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    for report in benchmark(matrix, queries, k=args.k):
+        print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
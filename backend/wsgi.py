@@ -0,0 +1,6 @@
+# WSGI 서버/flask run용 진입점 (gunicorn -b 0.0.0.0:8000 wsgi:app, FLASK_APP=wsgi.py flask run)
+# app.py의 app은 import만 해서는 서버 리소스가 초기화되지 않으므로, 서버를 실행하는 프로세스에서
+# 이 모듈을 import할 때 create_app()으로 초기화한 앱을 노출합니다.
+from app import create_app
+
+app = create_app()